@@ -16,6 +16,7 @@ from kivy.uix.camera import Camera
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.scrollview import ScrollView
 from kivy.clock import Clock
+from kivy.graphics import Color, Line
 from kivy.logger import Logger
 
 import os
@@ -39,6 +40,8 @@ try:
     import cv2
     import numpy as np
     from PIL import Image
+    from camera_helper import CAMERA_SETTINGS, STILL_SETTINGS, grab_still
+    from roi_helper import get_region_of_interest, preview_rect_in_frame
     CV2_AVAILABLE = True
 except ImportError:
     CV2_AVAILABLE = False
@@ -162,13 +165,23 @@ class CameraScreen(Screen):
         
         layout = BoxLayout(orientation='vertical')
         
-        # カメラウィジェット
+        # カメラウィジェット（プレビューは低解像度、撮影時だけ高解像度の静止画を撮る）
         if CV2_AVAILABLE:
             self.camera = Camera(
-                resolution=(640, 480),
+                resolution=(CAMERA_SETTINGS['width'], CAMERA_SETTINGS['height']),
                 play=True
             )
             layout.add_widget(self.camera)
+            
+            # ドラッグでOCR範囲を指定（タップで解除）。範囲は次回起動時にも引き継ぐ
+            self.roi = get_region_of_interest()
+            self._roi_start = None
+            self._roi_drag = None
+            self._capture_frame_rect = None
+            self.camera.bind(on_touch_down=self.on_camera_touch_down,
+                             on_touch_move=self.on_camera_touch_move,
+                             on_touch_up=self.on_camera_touch_up,
+                             pos=self.draw_roi, norm_image_size=self.draw_roi)
         else:
             # カメラが利用できない場合
             no_camera_label = Label(
@@ -206,26 +219,184 @@ class CameraScreen(Screen):
             return
         
         try:
-            # カメラから画像をキャプチャ
-            self.camera.export_to_png("temp_capture.png")
-            
-            # OCR実行
-            Clock.schedule_once(lambda dt: self.process_captured_image(), 1)
+            # OpenCVのカメラ（デスクトップ）なら同じデバイスから高解像度の静止画を撮る
+            device = getattr(getattr(self.camera, '_camera', None), '_device', None)
+            if device is not None:
+                # 撮影中はプレビューの更新を止める
+                self.camera.play = False
+                self._capture_frame_rect = None
+                # OCR範囲はプレビューに対する割合なので、静止画に換算するためにプレビューの大きさを渡す
+                preview_size = tuple(self.camera.texture_size)
+                thread = threading.Thread(target=self._still_capture_worker, args=(device, preview_size))
+                thread.daemon = True
+                thread.start()
+            else:
+                self.export_preview_and_ocr()
             
         except Exception as e:
             self.show_popup('エラー', f'撮影エラー: {str(e)}')
     
+    def export_preview_and_ocr(self):
+        """プレビューの画像を保存してOCR実行（静止画を撮れない環境用）"""
+        # 保存する画像に範囲の枠が写らないように一旦消す
+        self.camera.canvas.after.clear()
+        # カメラから画像をキャプチャ
+        self.camera.export_to_png("temp_capture.png")
+        self.draw_roi()
+        
+        # 保存した画像はウィジェット全体なので、映像が写っている範囲を記録しておく（上を原点とする）
+        x, y, w, h = self._image_rect()
+        self._capture_frame_rect = (x - self.camera.x, self.camera.top - (y + h), w, h)
+        
+        # OCR実行
+        Clock.schedule_once(lambda dt: self.process_captured_image(), 1)
+    
+    def _still_capture_worker(self, device, preview_size):
+        """高解像度の静止画を1枚撮って保存する（別スレッドで実行）"""
+        frame_rect = None
+        try:
+            ret, frame = grab_still(device, STILL_SETTINGS['width'], STILL_SETTINGS['height'])
+            if ret:
+                cv2.imwrite("temp_capture.png", frame)
+                Logger.info(f'OCR: 静止画を撮影しました: {frame.shape[1]}x{frame.shape[0]}')
+                frame_rect = preview_rect_in_frame(preview_size, (frame.shape[1], frame.shape[0]))
+        except Exception as e:
+            Logger.error(f'OCR: 静止画の撮影エラー: {e}')
+            ret = False
+        Clock.schedule_once(lambda dt: self._finish_still_capture(ret, frame_rect))
+    
+    def _finish_still_capture(self, captured, frame_rect=None):
+        """プレビューを再開してOCR実行"""
+        self.camera.play = True
+        if captured:
+            # 静止画の中でプレビューの視野が写っている範囲（縦横比が同じならNone）
+            self._capture_frame_rect = frame_rect
+            self.process_captured_image()
+        else:
+            self.export_preview_and_ocr()
+    
     def process_captured_image(self):
         """キャプチャした画像を処理"""
         try:
             if CV2_AVAILABLE:
-                result_text = self.perform_ocr("temp_capture.png")
-                self.show_ocr_result(result_text)
+                self.crop_capture_to_roi("temp_capture.png")
+                self.start_streaming_ocr("temp_capture.png")
             else:
                 self.show_popup('エラー', 'OCR機能が利用できません')
         except Exception as e:
             self.show_popup('エラー', f'OCR処理エラー: {str(e)}')
     
+    def crop_capture_to_roi(self, image_path):
+        """撮影した画像をOCR範囲だけに切り出して保存し直す"""
+        if not self.roi.active and self._capture_frame_rect is None:
+            return
+        img = cv2.imread(image_path)
+        if img is None:
+            return
+        region = self.roi.crop(img, self._capture_frame_rect)
+        cv2.imwrite(image_path, region)
+        Logger.info(f'OCR: OCR範囲を切り出しました: {region.shape[1]}x{region.shape[0]}')
+    
+    def _image_rect(self):
+        """カメラ映像が表示されている範囲 (x, y, w, h)（ウィジェット座標、左下が原点）"""
+        w, h = self.camera.norm_image_size
+        return self.camera.center_x - w / 2.0, self.camera.center_y - h / 2.0, w, h
+    
+    def _touch_to_ratio(self, touch):
+        """タッチ位置を映像に対する割合に変換（左上が原点）"""
+        x, y, w, h = self._image_rect()
+        if w <= 0 or h <= 0:
+            return 0.0, 0.0
+        return (touch.x - x) / float(w), 1.0 - (touch.y - y) / float(h)
+    
+    def on_camera_touch_down(self, camera, touch):
+        """OCR範囲のドラッグ開始"""
+        if not camera.collide_point(*touch.pos):
+            return False
+        self._roi_start = self._roi_drag = self._touch_to_ratio(touch)
+        self.draw_roi()
+        return True
+    
+    def on_camera_touch_move(self, camera, touch):
+        """ドラッグ中の範囲を表示"""
+        if self._roi_start is None:
+            return False
+        self._roi_drag = self._touch_to_ratio(touch)
+        self.draw_roi()
+        return True
+    
+    def on_camera_touch_up(self, camera, touch):
+        """ドラッグした範囲をOCR範囲にする（ドラッグしていないタップは範囲の解除）"""
+        if self._roi_start is None:
+            return False
+        start, self._roi_start = self._roi_start, None
+        end = self._touch_to_ratio(touch)
+        if self.roi.set_box(start[0], start[1], end[0], end[1]):
+            Logger.info(f'OCR: OCR範囲を設定しました: {self.roi.box}')
+        elif self.roi.active:
+            self.roi.clear()
+            Logger.info('OCR: OCR範囲を解除しました')
+        self.draw_roi()
+        return True
+    
+    def draw_roi(self, *args):
+        """OCR範囲の枠をカメラ映像の上に描画"""
+        self.camera.canvas.after.clear()
+        if self._roi_start is not None:
+            box = self._roi_start + self._roi_drag
+            color = (1, 0.8, 0, 1)
+        elif self.roi.active:
+            box = self.roi.box
+            color = (0, 1, 0, 1)
+        else:
+            return
+        x0, x1 = sorted((box[0], box[2]))
+        y0, y1 = sorted((box[1], box[3]))
+        x, y, w, h = self._image_rect()
+        with self.camera.canvas.after:
+            Color(*color)
+            Line(rectangle=(x + x0 * w, y + (1.0 - y1) * h, (x1 - x0) * w, (y1 - y0) * h), width=2)
+    
+    def start_streaming_ocr(self, image_path, camera=True):
+        """
+        結果画面に切り替え、認識できた行から順に表示する（OCRは別スレッドで実行）
+        camera=Falseの場合（選択したファイル）は処理時間の上限を設けず、文書全体を認識する
+        """
+        result_screen = self.manager.get_screen('result')
+        result_screen.start_stream()
+        self.manager.current = 'result'
+        
+        thread = threading.Thread(target=self._streaming_ocr_worker, args=(image_path, result_screen, camera))
+        thread.daemon = True
+        thread.start()
+    
+    def _streaming_ocr_worker(self, image_path, result_screen, camera=True):
+        """OCRワーカー（UIの更新はClockでメインスレッドに渡す）"""
+        try:
+            for line in self.iter_perform_ocr(image_path, camera):
+                Clock.schedule_once(lambda dt, line=line: result_screen.append_line(line))
+        except Exception as e:
+            Logger.error(f'OCR: OCR処理エラー: {e}')
+            message = f"OCR処理中にエラーが発生しました: {str(e)}"
+            Clock.schedule_once(lambda dt: result_screen.append_line(message))
+        Clock.schedule_once(lambda dt: result_screen.finish_stream())
+    
+    def iter_perform_ocr(self, image_path, camera=True):
+        """
+        OCR処理を実行し、認識できた行から順に返す
+        カメラの画像は処理時間の上限付きで認識し、選択したファイルは従来どおり画像全体を認識する
+        （処理時間の上限と文字領域の数の上限で、文書の後半が読み落とされないようにする）
+        """
+        if not camera:
+            for line in self.perform_ocr(image_path).splitlines():
+                yield line
+        elif ANDROID:
+            for line in self.android_ocr(image_path).splitlines():
+                yield line
+        else:
+            for line in self.desktop_ocr_stream(image_path):
+                yield line
+    
     def perform_ocr(self, image_path):
         """OCR処理を実行"""
         try:
@@ -261,11 +432,9 @@ class CameraScreen(Screen):
             if img is None:
                 return "画像の読み込みに失敗しました"
             
-            # グレースケール変換
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # 二値化
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # 前処理（設定ファイルで選択したカメラ用プリセット）
+            from preprocess_helper import preprocess_image
+            binary = preprocess_image(img, 'camera')
             
             # Tesseract OCR (利用可能な場合)
             try:
@@ -279,6 +448,28 @@ class CameraScreen(Screen):
             Logger.error(f'OCR: デスクトップOCR エラー: {e}')
             return f"デスクトップOCR エラー: {str(e)}"
     
+    def desktop_ocr_stream(self, image_path):
+        """
+        デスクトップ用OCR（カメラOCRと同じiter_ocr_frameで、認識できた行から返す）
+        処理時間の上限に間に合うティアを選び、結果はOCRキャッシュに保存される
+        """
+        img = cv2.imread(image_path)
+        if img is None:
+            yield "画像の読み込みに失敗しました"
+            return
+        
+        try:
+            from ocr_app_vision import iter_ocr_frame
+            from deadline_ocr_helper import CAMERA_OCR_DEADLINE_MS
+        except ImportError:
+            # OCRモジュールが使えない場合は画像全体を一度に認識
+            for line in self.desktop_ocr(image_path).splitlines():
+                yield line
+            return
+        
+        for line in iter_ocr_frame(img, deadline_ms=CAMERA_OCR_DEADLINE_MS):
+            yield line
+    
     def show_ocr_result(self, text):
         """OCR結果を表示"""
         result_screen = self.manager.get_screen('result')
@@ -346,10 +537,9 @@ class FileChooserScreen(Screen):
         if self.filechooser.selection:
             file_path = self.filechooser.selection[0]
             
-            # OCR実行
+            # OCR実行（結果は認識できた行から順に表示）
             camera_screen = self.manager.get_screen('camera')
-            result_text = camera_screen.perform_ocr(file_path)
-            camera_screen.show_ocr_result(result_text)
+            camera_screen.start_streaming_ocr(file_path, camera=False)
         else:
             self.show_popup('エラー', 'ファイルを選択してください')
     
@@ -448,6 +638,21 @@ class ResultScreen(Screen):
         self.result_label.text = text
         self.result_label.text_size = (400, None)  # 適切な幅を設定
     
+    def start_stream(self):
+        """逐次表示を開始（前回の結果を消して認識中と表示）"""
+        self.streamed_lines = []
+        self.set_result('認識中...')
+    
+    def append_line(self, line):
+        """認識できた1行を追加表示"""
+        self.streamed_lines.append(line)
+        self.set_result('\n'.join(self.streamed_lines))
+    
+    def finish_stream(self):
+        """逐次表示を終了"""
+        if not self.streamed_lines:
+            self.set_result('文字が検出されませんでした')
+    
     def speak_result(self, instance):
         """結果を音声で読み上げ"""
         if not hasattr(self, 'result_text') or not self.result_text:
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+自動キャプチャヘルパー
+ピントが合っていて静止したフレームが続いたときだけOCRを起動する
+"""
+import cv2
+import numpy as np
+
+
+class AutoCaptureTrigger:
+    """
+    フレームごとに鮮明度（ラプラシアン分散）と動き（前フレームとの差分）を評価し、
+    鮮明かつ静止した状態がstable_frames回続いたらOCRを発火する
+    一度発火した後は、シーンが変わるまで同じ内容で再発火しない
+    （フレームの大きさが変わった場合もシーンが変わったとみなす）
+    """
+
+    def __init__(self, stable_frames=8, sharpness_threshold=100.0, motion_threshold=4.0,
+                 change_threshold=12.0, analysis_width=320):
+        self.stable_frames = stable_frames
+        self.sharpness_threshold = sharpness_threshold
+        self.motion_threshold = motion_threshold
+        self.change_threshold = change_threshold
+        self.analysis_width = analysis_width
+        self.reset()
+
+    def reset(self):
+        """状態を初期化"""
+        self.previous = None
+        self.fired_reference = None
+        self.stable_count = 0
+        self.sharpness = 0.0
+        self.motion = 0.0
+
+    def _prepare(self, frame):
+        """解析用に縮小したグレースケール画像を作成"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        h, w = gray.shape[:2]
+        if w > self.analysis_width:
+            new_h = max(1, int(h * self.analysis_width / w))
+            gray = cv2.resize(gray, (self.analysis_width, new_h), interpolation=cv2.INTER_AREA)
+        return gray
+
+    @staticmethod
+    def _difference(a, b):
+        """2つのフレームの平均絶対差"""
+        return float(np.mean(cv2.absdiff(a, b)))
+
+    def update(self, frame):
+        """
+        新しいフレームを評価する
+
+        Args:
+            frame (numpy.ndarray): カメラのフレーム
+
+        Returns:
+            bool: OCRを実行すべきならTrue
+        """
+        small = self._prepare(frame)
+        # 大きさが変わった（OCR範囲が変わった）場合は別のシーンとして比較をやり直す
+        if self.previous is not None and self.previous.shape != small.shape:
+            self.reset()
+        self.sharpness = float(cv2.Laplacian(small, cv2.CV_64F).var())
+        self.motion = self._difference(small, self.previous) if self.previous is not None else 255.0
+        self.previous = small
+
+        # 前回発火したシーンから十分変化したら再び発火できるようにする
+        if self.fired_reference is not None:
+            if self._difference(small, self.fired_reference) > self.change_threshold:
+                self.fired_reference = None
+            else:
+                self.stable_count = 0
+                return False
+
+        if self.sharpness >= self.sharpness_threshold and self.motion <= self.motion_threshold:
+            self.stable_count += 1
+        else:
+            self.stable_count = 0
+
+        if self.stable_count >= self.stable_frames:
+            self.stable_count = 0
+            self.fired_reference = small
+            return True
+        return False
+
+    def status_text(self):
+        """画面表示用の状態文字列"""
+        if self.fired_reference is not None:
+            state = "captured"
+        else:
+            state = f"{self.stable_count}/{self.stable_frames}"
+        return f"AUTO {state} sharp:{self.sharpness:.0f} motion:{self.motion:.1f}"
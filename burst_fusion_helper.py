@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+マルチフレーム合成ヘルパー
+カメラで連続して撮った数枚のフレームを位置合わせ（位相相関またはECC）してから
+中央値（または平均）で合成し、ノイズを減らす
+暗い場所でのfastNlMeansDenoising（1枚に数秒かかる）の代わりに使う
+"""
+import time
+
+import cv2
+import numpy as np
+
+# 合成に使うフレーム数
+BURST_FRAME_COUNT = 5
+
+# 位置合わせの方法（'phase': 位相相関で平行移動のみ / 'ecc': ECCで平行移動+回転）
+BURST_ALIGN_METHOD = 'phase'
+
+# 合成方法（'median': 中央値、動く物や外れ値に強い / 'mean': 平均、より速い）
+BURST_FUSION_METHOD = 'median'
+
+# 位置合わせの推定に使う画像の長辺の上限（推定した移動量は元の大きさに換算する）
+BURST_ANALYSIS_SIDE = 640
+
+# 位相相関の応答がこれより低いフレームは位置合わせ失敗として合成に使わない
+BURST_MIN_RESPONSE = 0.05
+
+# 基準フレームからこれ以上ずれたフレーム（長辺に対する割合）は合成に使わない
+BURST_MAX_SHIFT = 0.1
+
+
+def _gray(image):
+    """グレースケール化"""
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _analysis_image(gray, ratio):
+    """位置合わせの推定用に縮小した浮動小数点画像"""
+    if ratio < 1.0:
+        h, w = gray.shape[:2]
+        gray = cv2.resize(gray, (max(1, int(w * ratio)), max(1, int(h * ratio))),
+                          interpolation=cv2.INTER_AREA)
+    return gray.astype(np.float32)
+
+
+def _estimate_phase(reference, moving, window):
+    """
+    位相相関で平行移動を推定する
+
+    Returns:
+        tuple: (2x3の変換行列, 応答) movingを基準に重ねる変換
+    """
+    (dx, dy), response = cv2.phaseCorrelate(reference, moving, window)
+    return np.float32([[1, 0, -dx], [0, 1, -dy]]), response
+
+
+def _estimate_ecc(reference, moving, iterations=50, eps=1e-4):
+    """
+    ECCで平行移動+回転を推定する
+
+    Returns:
+        tuple: (2x3の変換行列, 相関係数) movingを基準に重ねる変換
+    """
+    warp = np.eye(2, 3, dtype=np.float32)
+    criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, iterations, eps)
+    correlation, warp = cv2.findTransformECC(reference, moving, warp, cv2.MOTION_EUCLIDEAN,
+                                             criteria, None, 5)
+    # findTransformECCは基準→movingの変換なので逆変換にする
+    return cv2.invertAffineTransform(warp), correlation
+
+
+def align_frames(frames, method=BURST_ALIGN_METHOD, analysis_side=BURST_ANALYSIS_SIDE):
+    """
+    中央のフレームを基準に、各フレームを位置合わせする
+
+    Args:
+        frames (list): 同じ大きさのフレーム（BGRまたはグレースケール）
+        method (str): 'phase' または 'ecc'
+        analysis_side (int): 推定に使う画像の長辺の上限
+
+    Returns:
+        tuple: (位置合わせしたグレースケール画像のリスト, 各フレームの情報のリスト)
+               情報は index, shift（ピクセル）, score, used
+    """
+    grays = [_gray(frame) for frame in frames]
+    reference_index = len(grays) // 2
+    h, w = grays[reference_index].shape[:2]
+    ratio = min(1.0, analysis_side / float(max(h, w)))
+    reference = _analysis_image(grays[reference_index], ratio)
+    window = cv2.createHanningWindow(reference.shape[::-1], cv2.CV_32F) if method == 'phase' else None
+
+    aligned = []
+    details = []
+    for index, gray in enumerate(grays):
+        if gray.shape != grays[reference_index].shape:
+            details.append({'index': index, 'shift': None, 'score': None, 'used': False})
+            continue
+        if index == reference_index:
+            aligned.append(gray)
+            details.append({'index': index, 'shift': (0.0, 0.0), 'score': 1.0, 'used': True})
+            continue
+        moving = _analysis_image(gray, ratio)
+        try:
+            if method == 'ecc':
+                matrix, score = _estimate_ecc(reference, moving)
+            else:
+                matrix, score = _estimate_phase(reference, moving, window)
+        except cv2.error as e:
+            # ECCが収束しなかった場合など
+            print(f"フレーム{index}の位置合わせに失敗しました: {e}")
+            details.append({'index': index, 'shift': None, 'score': None, 'used': False})
+            continue
+
+        # 縮小画像で推定した移動量を元の大きさに換算
+        matrix[:, 2] /= ratio
+        shift = (float(matrix[0, 2]), float(matrix[1, 2]))
+        used = (score >= BURST_MIN_RESPONSE
+                and max(abs(shift[0]), abs(shift[1])) <= BURST_MAX_SHIFT * max(h, w))
+        if used:
+            # 端は隣の画素で埋める（黒い帯が合成結果に混ざらないように）
+            aligned.append(cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                                          borderMode=cv2.BORDER_REPLICATE))
+        details.append({'index': index, 'shift': shift, 'score': float(score), 'used': used})
+    return aligned, details
+
+
+def fuse_frames(frames, method=BURST_FUSION_METHOD):
+    """
+    位置合わせ済みのグレースケール画像を1枚に合成する
+
+    Args:
+        frames (list): 同じ大きさのグレースケール画像
+        method (str): 'median' または 'mean'
+
+    Returns:
+        numpy.ndarray: 合成したグレースケール画像（uint8）
+    """
+    if len(frames) == 1:
+        return frames[0]
+    if method == 'mean':
+        total = np.zeros(frames[0].shape, dtype=np.float32)
+        for frame in frames:
+            cv2.accumulate(frame, total)
+        return cv2.convertScaleAbs(total, alpha=1.0 / len(frames))
+    return np.median(np.stack(frames), axis=0).astype(np.uint8)
+
+
+def fuse_burst(frames, align=BURST_ALIGN_METHOD, fusion=BURST_FUSION_METHOD):
+    """
+    連続フレームを位置合わせして合成する
+
+    Args:
+        frames (list): 連続して撮ったフレーム（BGRまたはグレースケール）
+        align (str): 位置合わせの方法（'phase' / 'ecc'）
+        fusion (str): 合成方法（'median' / 'mean'）
+
+    Returns:
+        tuple: (合成画像, 情報)
+               合成画像は入力がカラーの場合もBGR（合成したグレースケールを3チャンネルに戻したもの）
+               情報は frames, used, align, fusion, details, elapsed_ms
+    """
+    start = time.perf_counter()
+    aligned, details = align_frames(frames, method=align)
+    fused = fuse_frames(aligned, method=fusion)
+    if frames[0].ndim == 3:
+        fused = cv2.cvtColor(fused, cv2.COLOR_GRAY2BGR)
+    info = {
+        'frames': len(frames),
+        'used': len(aligned),
+        'align': align,
+        'fusion': fusion,
+        'details': details,
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+    }
+    return fused, info
+
+
+def format_burst_info(info):
+    """合成結果の表示用の文字列"""
+    return (f"マルチフレーム合成: {info['used']}/{info['frames']}枚を使用"
+            f"（{info['align']}・{info['fusion']}、{info['elapsed_ms']:.0f}ms）")
+
+
+def capture_fused(camera, count=BURST_FRAME_COUNT, align=BURST_ALIGN_METHOD, fusion=BURST_FUSION_METHOD):
+    """
+    ThreadedCameraで連写したフレームを合成する
+
+    Args:
+        camera (ThreadedCamera): 開いているカメラ
+
+    Returns:
+        tuple: (合成画像, 情報) 撮影できなかった場合は (None, None)
+    """
+    frames = camera.capture_burst(count)
+    if not frames:
+        return None, None
+    fused, info = fuse_burst(frames, align=align, fusion=fusion)
+    print(format_burst_info(info))
+    return fused, info
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+カメラ入力ヘルパー
+別スレッドでカメラから常にフレームを読み出し、最新の1枚だけを保持する
+（OCRの処理中にドライバーのバッファに溜まった古いフレームを読まないようにする）
+プレビューは低解像度で読み、OCRのときだけ高解像度の静止画を撮る
+"""
+import time
+import threading
+
+import cv2
+
+# 起動時に要求するプレビュー用のカメラ設定（対応していない値はドライバーが近い値に変更する）
+CAMERA_SETTINGS = {
+    'width': 640,
+    'height': 480,
+    'fps': 30,
+    'fourcc': 'MJPG',
+}
+
+# OCR用の静止画の解像度（SPACEキーを押したときだけこの解像度で1枚撮る）
+# プレビューと同じ4:3にする（16:9などにするとセンサーの切り出し方が変わり、写る範囲がプレビューとずれる）
+STILL_SETTINGS = {
+    'width': 1280,
+    'height': 960,
+}
+
+# 縦横比が同じとみなす差の上限
+ASPECT_TOLERANCE = 0.02
+
+# 解像度を切り替えた直後に捨てるフレーム数（露出・フォーマットが安定するまで）
+STILL_WARMUP_FRAMES = 2
+
+
+def aspect_differs(size_a, size_b, tolerance=ASPECT_TOLERANCE):
+    """2つの大きさ (width, height) の縦横比が異なるか"""
+    (wa, ha), (wb, hb) = size_a, size_b
+    if not (wa and ha and wb and hb):
+        return False
+    return abs(wa / float(ha) - wb / float(hb)) > tolerance * (wb / float(hb))
+
+
+def grab_burst(cap, count, width=STILL_SETTINGS['width'], height=STILL_SETTINGS['height'],
+               warmup=STILL_WARMUP_FRAMES):
+    """
+    開いているcv2.VideoCaptureを一時的に高解像度に切り替えて連続でcount枚撮り、元の解像度に戻す
+
+    Args:
+        cap (cv2.VideoCapture): 開いているカメラ（他のスレッドから読まれていないこと）
+        count (int): 撮影する枚数
+        width, height (int): 静止画の解像度
+        warmup (int): 切り替え後に捨てるフレーム数
+
+    Returns:
+        list: 撮影できたフレーム（途中で失敗した場合はそれまでのフレーム）
+    """
+    preview_width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+    preview_height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    switched = (int(preview_width), int(preview_height)) != (width, height)
+    frames = []
+    if switched:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        for _ in range(warmup):
+            cap.grab()
+    try:
+        for _ in range(count):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        if switched and frames:
+            # ドライバーが要求と違う解像度にした場合は、実際の解像度と視野のずれを知らせる
+            h, w = frames[0].shape[:2]
+            if (w, h) != (width, height):
+                print(f"静止画の解像度が要求と異なります: 要求 {width}x{height} / 実際 {w}x{h}")
+            if aspect_differs((w, h), (preview_width, preview_height)):
+                print(f"静止画（{w}x{h}）とプレビュー（{int(preview_width)}x{int(preview_height)}）の"
+                      f"縦横比が異なるため、写る範囲がずれる可能性があります")
+    finally:
+        if switched:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, preview_width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, preview_height)
+    return frames
+
+
+def grab_still(cap, width=STILL_SETTINGS['width'], height=STILL_SETTINGS['height'],
+               warmup=STILL_WARMUP_FRAMES):
+    """
+    開いているcv2.VideoCaptureを一時的に高解像度に切り替えて1枚撮り、元の解像度に戻す
+
+    Returns:
+        tuple: (ret, frame) 撮影できなかった場合は (False, None)
+    """
+    frames = grab_burst(cap, 1, width, height, warmup)
+    if not frames:
+        return False, None
+    return True, frames[0]
+
+
+def _fourcc_to_str(value):
+    """CAP_PROP_FOURCCの数値を文字列に変換"""
+    value = int(value)
+    if value <= 0:
+        return ''
+    return ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+class ThreadedCamera:
+    """
+    cv2.VideoCaptureをバックグラウンドスレッドで読み続けるカメラ
+    read()はcv2.VideoCapture.read()と同じ (ret, frame) を返し、常に最新のフレームを渡す
+    読まれずに上書きされたフレームはdropped_framesとして数える
+    プレビューは低解像度で流し、capture_still()でOCR用の高解像度の静止画を1枚撮る
+    """
+
+    def __init__(self, device=0, width=CAMERA_SETTINGS['width'], height=CAMERA_SETTINGS['height'],
+                 fps=CAMERA_SETTINGS['fps'], fourcc=CAMERA_SETTINGS['fourcc'],
+                 still_size=(STILL_SETTINGS['width'], STILL_SETTINGS['height'])):
+        self.device = device
+        self.cap = cv2.VideoCapture(device)
+        self.settings = {}
+        self.still_size = still_size
+        self.last_still_ms = None
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.dropped_frames = 0
+        self.read_failures = 0
+
+        self._frame = None
+        self._sequence = 0
+        self._delivered_sequence = 0
+        self._condition = threading.Condition()
+        # デバイスの読み出しと解像度の切り替えが重ならないようにする
+        self._device_lock = threading.Lock()
+        self._running = False
+        self._started_at = None
+        self.thread = None
+
+        if self.cap.isOpened():
+            self._negotiate(width, height, fps, fourcc)
+            self.start()
+
+    def _negotiate(self, width, height, fps, fourcc):
+        """解像度・FPS・FOURCCを要求し、実際に適用された値を記録する"""
+        # FOURCCは解像度より先に設定しないと反映されないドライバーがある
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        # ドライバー側のバッファを最小にする（対応していない環境では無視される）
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.settings = {
+            'width': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': round(self.cap.get(cv2.CAP_PROP_FPS), 1),
+            'fourcc': _fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+        }
+
+    def isOpened(self):
+        """カメラが開けているか（cv2.VideoCaptureと同じ名前）"""
+        return self.cap.isOpened()
+
+    def start(self):
+        """読み出しスレッドを開始"""
+        if self._running:
+            return
+        self._running = True
+        self._started_at = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name="ThreadedCamera", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """読み出しスレッド本体: デバイスからフレームを取り出し続ける"""
+        while self._running:
+            with self._device_lock:
+                ret, frame = self.cap.read()
+            with self._condition:
+                if not ret:
+                    self.read_failures += 1
+                    if self.read_failures >= 30:
+                        # カメラが切断された
+                        self._running = False
+                    self._condition.notify_all()
+                    continue
+                self.read_failures = 0
+                if self._sequence > self._delivered_sequence:
+                    # 前のフレームは誰にも読まれずに上書きされる
+                    self.dropped_frames += 1
+                self._frame = frame
+                self._sequence += 1
+                self.frames_captured += 1
+                self._condition.notify_all()
+            if not ret:
+                time.sleep(0.01)
+
+    def read(self, timeout=1.0):
+        """
+        最新のフレームを取得する（前回読んだフレームより新しいものが届くまで待つ）
+
+        Args:
+            timeout (float): 新しいフレームを待つ最大時間（秒）
+
+        Returns:
+            tuple: (ret, frame) 新しいフレームが無い場合は直近のフレーム、一度も届いていなければ (False, None)
+                   frameは呼び出し側専用のコピー（直接描画しても保持中のフレームは変わらない）
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence > self._delivered_sequence or not self._running,
+                                     timeout=timeout)
+            if self._frame is None:
+                return False, None
+            if self._sequence == self._delivered_sequence and not self._running:
+                return False, None
+            if self._sequence > self._delivered_sequence:
+                self._delivered_sequence = self._sequence
+                self.frames_delivered += 1
+            # タイムアウト時は同じフレームを再び渡すため、呼び出し側が描画しても共有の画像を汚さないようコピーする
+            return True, self._frame.copy()
+
+    def capture_still(self):
+        """
+        OCR用の高解像度の静止画を1枚撮る（撮影中はプレビューの読み出しを止める）
+        still_sizeがNoneか、ドライバーが高解像度に対応していない場合は最新のプレビューフレームを返す
+
+        Returns:
+            tuple: (ret, frame)
+        """
+        if not self.still_size or not self._running:
+            return self.read()
+        start = time.perf_counter()
+        with self._device_lock:
+            ret, frame = grab_still(self.cap, *self.still_size)
+        self.last_still_ms = (time.perf_counter() - start) * 1000
+        if not ret:
+            print("静止画を撮影できなかったため、プレビューのフレームを使用します")
+            return self.read()
+        h, w = frame.shape[:2]
+        print(f"静止画: {w}x{h}（{self.last_still_ms:.0f}ms）")
+        return True, frame
+
+    def capture_burst(self, count):
+        """
+        マルチフレーム合成用に高解像度で連続してcount枚撮る
+        高解像度で撮れない場合はプレビューの連続したフレームを使う
+
+        Returns:
+            list: フレームのリスト（カメラが止まっている場合は空）
+        """
+        frames = []
+        if self.still_size and self._running:
+            start = time.perf_counter()
+            with self._device_lock:
+                frames = grab_burst(self.cap, count, *self.still_size)
+            self.last_still_ms = (time.perf_counter() - start) * 1000
+            if frames:
+                h, w = frames[0].shape[:2]
+                print(f"連写: {w}x{h} {len(frames)}枚（{self.last_still_ms:.0f}ms）")
+        while len(frames) < count:
+            ret, frame = self.read()
+            if not ret:
+                break
+            frames.append(frame)
+        return frames
+
+    def stats(self):
+        """
+        統計情報
+
+        Returns:
+            dict: settings, captured, delivered, dropped, capture_fps, last_still_ms
+        """
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            'settings': dict(self.settings),
+            'captured': self.frames_captured,
+            'delivered': self.frames_delivered,
+            'dropped': self.dropped_frames,
+            'capture_fps': round(self.frames_captured / elapsed, 1) if elapsed > 0 else 0.0,
+            'last_still_ms': self.last_still_ms,
+        }
+
+    def describe(self):
+        """起動時に表示するカメラ設定の文字列"""
+        s = self.settings
+        still = f" / 静止画 {self.still_size[0]}x{self.still_size[1]}" if self.still_size else ""
+        return (f"カメラ設定: {s.get('width')}x{s.get('height')} {s.get('fps')}fps "
+                f"{s.get('fourcc') or '-'}{still}")
+
+    def release(self):
+        """スレッドを止めてカメラを解放する"""
+        self._running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.cap.release()
+        stats = self.stats()
+        print(f"カメラ統計: 取得 {stats['captured']}フレーム / 使用 {stats['delivered']}フレーム / "
+              f"破棄 {stats['dropped']}フレーム（{stats['capture_fps']}fps）")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
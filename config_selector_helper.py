@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+前処理×psm設定の自動選択ヘルパー
+ocr_improvedの探索結果（どの組み合わせが何%の信頼度だったか）を、
+コントラスト・文字密度・縦横比などの軽い特徴量とともに記録し、
+新しい画像に対して最も良さそうな1つの組み合わせを予測する
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# 学習結果の保存ファイル
+SELECTOR_MODEL_FILE = "ocr_selector_model.json"
+
+# 予測した組み合わせを採用する最低信頼度（%）。下回った場合は全探索する
+SELECTOR_ACCEPT_CONFIDENCE = 60
+
+# 予測があっても全探索する割合（予測した組み合わせ以外の信頼度も更新し続けるため）
+SELECTOR_EXPLORE_RATE = 0.1
+
+# 特徴量の区切り（各値がどの区間に入るかでバケットを決める）
+CONTRAST_BINS = (30, 60)
+DENSITY_BINS = (0.05, 0.15, 0.3)
+ASPECT_BINS = (0.8, 1.6, 4.0)
+BRIGHTNESS_BINS = (85, 170)
+
+
+def image_features(image_np, analysis_side=256):
+    """
+    縮小したグレースケール画像から軽い特徴量を計算する
+
+    Returns:
+        dict: contrast（輝度の標準偏差）, brightness（平均輝度）,
+              density（文字画素の割合）, aspect（幅/高さ）
+    """
+    gray = cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY) if image_np.ndim == 3 else image_np
+    h, w = gray.shape[:2]
+    ratio = min(1.0, analysis_side / max(h, w))
+    if ratio < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * ratio)), max(1, int(h * ratio))),
+                          interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    foreground = float(np.count_nonzero(binary)) / binary.size
+    return {
+        'contrast': float(gray.std()),
+        'brightness': float(gray.mean()),
+        # 少ない方の画素を文字とみなす（白黒反転した画像にも対応）
+        'density': min(foreground, 1.0 - foreground),
+        'aspect': w / float(max(1, h)),
+    }
+
+
+def _bin(value, edges):
+    """値が入る区間の番号"""
+    return sum(1 for edge in edges if value >= edge)
+
+
+def feature_bucket(image_class, features):
+    """画像の種類と特徴量の区間からバケット名を作る"""
+    return (f"{image_class}|c{_bin(features['contrast'], CONTRAST_BINS)}"
+            f"|d{_bin(features['density'], DENSITY_BINS)}"
+            f"|a{_bin(features['aspect'], ASPECT_BINS)}"
+            f"|b{_bin(features['brightness'], BRIGHTNESS_BINS)}")
+
+
+def combo_key(preprocess_name, config_index):
+    """組み合わせ名（例: 'otsu:3'）"""
+    return f"{preprocess_name}:{config_index}"
+
+
+class ConfigSelector:
+    """
+    バケット（画像の種類×特徴量の区間）ごとに、組み合わせ別の平均信頼度と勝利回数を保持する
+    バケット数はmax_bucketsまで（使われていない順に削除）で、保存ファイルの大きさも上限がある
+    """
+
+    def __init__(self, model_file=SELECTOR_MODEL_FILE, max_buckets=200, max_combos=32,
+                 max_count=50, min_samples=3, save_every=10):
+        self.model_file = model_file
+        self.max_buckets = max_buckets
+        self.max_combos = max_combos
+        # 平均の重みの上限（古い結果の影響が徐々に薄れる）
+        self.max_count = max_count
+        self.min_samples = min_samples
+        self.save_every = save_every
+        self._buckets = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """保存ファイルを読み込む"""
+        try:
+            if self.model_file and os.path.exists(self.model_file):
+                with open(self.model_file, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                for name, combos in loaded.get('buckets', {}).items():
+                    self._buckets[name] = {key: list(stats) for key, stats in combos.items()}
+                self._trim()
+        except Exception as e:
+            print(f"設定選択モデルの読み込みエラー: {e}")
+
+    def save(self):
+        """保存ファイルに書き込む"""
+        if not self.model_file:
+            return
+        with self._lock:
+            data = {'version': 1, 'buckets': {name: {key: [stats[0], round(stats[1], 2), stats[2]]
+                                                      for key, stats in combos.items()}
+                                               for name, combos in self._buckets.items()}}
+            self._unsaved = 0
+        try:
+            temp_file = self.model_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.model_file)
+        except Exception as e:
+            print(f"設定選択モデルの保存エラー: {e}")
+
+    def _trim(self):
+        """バケット数・組み合わせ数を上限に収める"""
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        for combos in self._buckets.values():
+            if len(combos) > self.max_combos:
+                keep = sorted(combos, key=lambda key: combos[key][0], reverse=True)[:self.max_combos]
+                for key in list(combos):
+                    if key not in keep:
+                        del combos[key]
+
+    def _update(self, bucket_name, results, winner):
+        """1つのバケットに結果を反映（ロック取得済みで呼ぶ）"""
+        combos = self._buckets.pop(bucket_name, {})
+        self._buckets[bucket_name] = combos
+        for key, confidence in results:
+            # stats = [回数, 平均信頼度, 勝利回数]
+            stats = combos.setdefault(key, [0, 0.0, 0])
+            stats[0] = min(stats[0] + 1, self.max_count)
+            stats[1] += (confidence - stats[1]) / stats[0]
+            if key == winner:
+                stats[2] = min(stats[2] + 1, self.max_count)
+
+    def record(self, image_class, features, results):
+        """
+        OCRの結果を記録する
+
+        Args:
+            image_class (str): 画像の種類
+            features (dict): image_featuresの結果
+            results (list): (前処理名, 設定のインデックス, 信頼度) のリスト
+        """
+        if not results:
+            return
+        scored = [(combo_key(name, config), float(confidence)) for name, config, confidence in results]
+        winner = max(scored, key=lambda item: item[1])[0]
+        with self._lock:
+            self._update(feature_bucket(image_class, features), scored, winner)
+            # 画像の種類全体のバケット（特徴量のバケットに履歴が無い場合に使う）
+            self._update(f"{image_class}|*", scored, winner)
+            self._trim()
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def predict(self, image_class, features):
+        """
+        最も良さそうな組み合わせを予測する
+
+        Returns:
+            dict or None: preprocess（前処理名）, config（設定のインデックス）,
+                          confidence（予測信頼度）, samples, bucket
+                          履歴が足りない場合はNone
+        """
+        with self._lock:
+            for bucket_name in (feature_bucket(image_class, features), f"{image_class}|*"):
+                combos = self._buckets.get(bucket_name)
+                if not combos:
+                    continue
+                candidates = [(key, stats) for key, stats in combos.items() if stats[0] >= self.min_samples]
+                if not candidates:
+                    continue
+                self._buckets.move_to_end(bucket_name)
+                key, stats = max(candidates, key=lambda item: item[1][1])
+                name, config = key.rsplit(':', 1)
+                return {'preprocess': name, 'config': int(config), 'confidence': stats[1],
+                        'samples': stats[0], 'bucket': bucket_name}
+        return None
+
+
+_selector = None
+_selector_lock = threading.Lock()
+
+
+def get_config_selector():
+    """共通の設定選択モデルを取得"""
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = ConfigSelector()
+        return _selector
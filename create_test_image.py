@@ -1,5 +1,17 @@
 
-from PIL import Image, ImageDraw, ImageFont
+"""
+テスト画像・ベンチマーク用コーパスの生成
+  python create_test_image.py                          # test_image_jp.png を1枚作成
+  python create_test_image.py corpus <出力フォルダ> [--count N] [--seed S]
+コーパスでは画像ごとに正解テキスト（.gt.txt）を保存し、生成条件をmanifest.jsonlにまとめる
+"""
+import os
+import sys
+import json
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
 
 # 画像サイズ
 width = 400
@@ -14,29 +26,202 @@ font_color = "black"
 
 # Windowsに標準で入っている日本語フォントを指定
 # フォントファイルが見つからない場合は、'C:\Windows\Fonts\' などで探してください
-font_path = "C:\\Windows\\Fonts\\msgothic.ttc" 
-try:
-    font = ImageFont.truetype(font_path, 32)
-except IOError:
-    print(f"フォントが見つかりません: {font_path}")
-    # 代替フォントとしてデフォルトフォントを試みる
-    try:
-        font = ImageFont.load_default()
-        print("デフォルトフォントを使用します。日本語は表示されない可能性があります。")
-    except Exception as e:
-        print(f"デフォルトフォントの読み込みに失敗しました: {e}")
-        font = None
-
-# 画像を生成
-if font:
-    image = Image.new("RGB", (width, height), background_color)
+font_path = "C:\\Windows\\Fonts\\msgothic.ttc"
+
+# コーパスで使う日本語フォントの候補（見つかったものをすべて使う）
+FONT_CANDIDATES = [
+    "C:\\Windows\\Fonts\\msgothic.ttc",
+    "C:\\Windows\\Fonts\\msmincho.ttc",
+    "C:\\Windows\\Fonts\\meiryo.ttc",
+    "C:\\Windows\\Fonts\\YuGothM.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSerifCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/usr/share/fonts/truetype/fonts-japanese-mincho.ttf",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/System/Library/Fonts/ヒラギノ明朝 ProN.ttc",
+]
+
+# 正解テキストの素材（値札・ラベル・文書を想定）
+CORPUS_PHRASES = [
+    "こんにちは、世界！", "本日のおすすめ", "特価品", "税込価格", "賞味期限",
+    "原材料名", "内容量", "保存方法", "直射日光を避けて保存してください",
+    "お一人様一点限り", "ポイント五倍", "新商品", "数量限定", "送料無料",
+    "東京都千代田区", "営業時間", "定休日", "お問い合わせ", "取扱説明書",
+    "ご注意ください", "メルカリ", "楽天市場", "中古品", "未開封",
+]
+
+# 生成条件の範囲
+CORPUS_FONT_SIZES = (14, 18, 24, 32, 48, 64)
+CORPUS_MAX_ROTATION = 5.0
+CORPUS_MAX_BLUR = 1.5
+CORPUS_MAX_NOISE = 20.0
+
+
+def find_fonts(candidates=FONT_CANDIDATES):
+    """存在するフォントファイルの一覧"""
+    return [path for path in candidates if os.path.exists(path)]
+
+
+def random_text(rng):
+    """1〜3行の正解テキストを作る"""
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.random()
+        if kind < 0.5:
+            lines.append(rng.choice(CORPUS_PHRASES))
+        elif kind < 0.8:
+            lines.append(f"{rng.choice(CORPUS_PHRASES)} {rng.randint(1, 99999):,}円")
+        else:
+            lines.append(f"{rng.randint(2020, 2030)}年{rng.randint(1, 12)}月{rng.randint(1, 28)}日")
+    return '\n'.join(lines)
+
+
+def render_text(text_value, font, margin=20, line_spacing=8):
+    """テキストを白背景に描画した画像を作る（大きさはテキストに合わせる）"""
+    probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox((0, 0), text_value, font=font,
+                                                        spacing=line_spacing)
+    image = Image.new("L", (right - left + margin * 2, bottom - top + margin * 2), 255)
     draw = ImageDraw.Draw(image)
+    draw.multiline_text((margin - left, margin - top), text_value, font=font, fill=0,
+                        spacing=line_spacing)
+    return image
+
+
+def apply_distortions(image, rng, rotation=0.0, blur=0.0, noise=0.0, brightness=1.0,
+                      contrast=1.0, gradient=0.0):
+    """
+    回転・ぼかし・ノイズ・照明ムラを加える
+
+    Args:
+        image (PIL.Image): グレースケール画像
+        rng (random.Random): 乱数生成器
+        gradient (float): 照明ムラの強さ（0で無効、横方向に暗くなる）
+
+    Returns:
+        PIL.Image: 加工した画像
+    """
+    if rotation:
+        image = image.rotate(rotation, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if brightness != 1.0:
+        image = ImageEnhance.Brightness(image).enhance(brightness)
+    if contrast != 1.0:
+        image = ImageEnhance.Contrast(image).enhance(contrast)
+
+    pixels = np.asarray(image, dtype=np.float32)
+    if gradient:
+        ramp = np.linspace(1.0, 1.0 - gradient, pixels.shape[1], dtype=np.float32)
+        if rng.random() < 0.5:
+            ramp = ramp[::-1]
+        pixels = pixels * ramp[np.newaxis, :]
+    if noise:
+        noise_rng = np.random.default_rng(rng.randrange(2 ** 32))
+        pixels = pixels + noise_rng.normal(0.0, noise, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def random_conditions(rng, fonts):
+    """1枚分の生成条件をランダムに決める"""
+    return {
+        'font': rng.choice(fonts),
+        'font_size': rng.choice(CORPUS_FONT_SIZES),
+        'rotation': round(rng.uniform(-CORPUS_MAX_ROTATION, CORPUS_MAX_ROTATION), 2),
+        'blur': round(rng.uniform(0.0, CORPUS_MAX_BLUR), 2) if rng.random() < 0.5 else 0.0,
+        'noise': round(rng.uniform(0.0, CORPUS_MAX_NOISE), 1) if rng.random() < 0.5 else 0.0,
+        'brightness': round(rng.uniform(0.7, 1.1), 2),
+        'contrast': round(rng.uniform(0.5, 1.0), 2),
+        'gradient': round(rng.uniform(0.0, 0.5), 2) if rng.random() < 0.3 else 0.0,
+    }
+
+
+def generate_corpus(output_dir, count=1000, seed=0, fonts=None):
+    """
+    正解テキスト付きの画像コーパスを生成する
+
+    Args:
+        output_dir (str): 出力フォルダ
+        count (int): 画像の枚数
+        seed (int): 乱数シード（同じシードなら同じコーパスになる）
+        fonts (list): 使用するフォントファイル（Noneの場合は候補から検索）
+
+    Returns:
+        str: manifest.jsonl のパス
+    """
+    fonts = fonts or find_fonts()
+    if not fonts:
+        raise RuntimeError("日本語フォントが見つかりません。FONT_CANDIDATESにパスを追加してください")
+
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    manifest_path = os.path.join(output_dir, "manifest.jsonl")
+    font_cache = {}
+
+    with open(manifest_path, 'w', encoding='utf-8') as manifest:
+        for index in range(count):
+            conditions = random_conditions(rng, fonts)
+            ground_truth = random_text(rng)
+
+            key = (conditions['font'], conditions['font_size'])
+            if key not in font_cache:
+                font_cache[key] = ImageFont.truetype(*key)
+            image = render_text(ground_truth, font_cache[key])
+            image = apply_distortions(image, rng, **{name: conditions[name] for name in
+                                                     ('rotation', 'blur', 'noise', 'brightness',
+                                                      'contrast', 'gradient')})
+
+            name = f"{index:05d}"
+            image.save(os.path.join(output_dir, name + ".png"))
+            with open(os.path.join(output_dir, name + ".gt.txt"), 'w', encoding='utf-8') as f:
+                f.write(ground_truth)
+
+            record = {'image': name + ".png", 'text': ground_truth}
+            record.update(conditions)
+            manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+            if (index + 1) % 100 == 0:
+                print(f"{index + 1}/{count}枚を生成しました")
+
+    return manifest_path
+
+
+def create_single_test_image():
+    """従来のテスト画像 test_image_jp.png を作成"""
+    try:
+        font = ImageFont.truetype(font_path, 32)
+    except IOError:
+        print(f"フォントが見つかりません: {font_path}")
+        # 代替フォントとしてデフォルトフォントを試みる
+        try:
+            font = ImageFont.load_default()
+            print("デフォルトフォントを使用します。日本語は表示されない可能性があります。")
+        except Exception as e:
+            print(f"デフォルトフォントの読み込みに失敗しました: {e}")
+            font = None
+
+    # 画像を生成
+    if font:
+        image = Image.new("RGB", (width, height), background_color)
+        draw = ImageDraw.Draw(image)
+
+        # テキストを描画
+        draw.text((10, 10), text, font=font, fill=font_color)
+
+        # ファイルに保存
+        image.save("test_image_jp.png")
+        print("テスト画像 'test_image_jp.png' を作成しました。")
+    else:
+        print("フォントの準備ができなかったため、画像を作成できませんでした。")
 
-    # テキストを描画
-    draw.text((10, 10), text, font=font, fill=font_color)
 
-    # ファイルに保存
-    image.save("test_image_jp.png")
-    print("テスト画像 'test_image_jp.png' を作成しました。")
-else:
-    print("フォントの準備ができなかったため、画像を作成できませんでした。")
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "corpus":
+        args = sys.argv[3:]
+        count = int(args[args.index('--count') + 1]) if '--count' in args else 1000
+        seed = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+        path = generate_corpus(sys.argv[2], count=count, seed=seed)
+        print(f"コーパスを作成しました: {path}")
+    else:
+        create_single_test_image()
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+締め切り付きOCRヘルパー
+ティア（大津の二値化+Tesseract / ocr_improvedの複数設定探索 / Google Vision）ごとの
+処理時間の履歴から、締め切りに間に合う最も高精度なティアを選ぶ
+選んだティアが間に合わなければ、途中結果または安いティアの結果を返す
+履歴の無いティアはバックグラウンドで一度は実行して処理時間を測る（既定の見積もりだけで選ばれなくなるのを防ぐ）
+"""
+import os
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+
+from preprocess_helper import preprocess_image
+from tesseract_helper import recognize_data
+from ocr_cache_helper import get_ocr_cache, make_cache_key
+
+# 処理時間の履歴ファイル
+LATENCY_HISTORY_FILE = "ocr_latency_history.json"
+
+# カメラのボタン操作に対する処理時間の上限（ミリ秒）
+CAMERA_OCR_DEADLINE_MS = 500
+
+# マルチフレーム合成時の処理時間の上限（ミリ秒）
+# 連写だけで数百ミリ秒かかり、暗い場所での精度のために選ぶモードなので、
+# burst_improved_tier（既定の見積もり1500ms）が選ばれる長さにする
+BURST_OCR_DEADLINE_MS = 2000
+
+# 選んだティアが間に合わなかった場合に、最も安いティアの結果を締め切り後も待つ時間（ミリ秒）
+FALLBACK_GRACE_MS = 500
+
+# 締め切りに間に合わないと見積もられたティアを、バックグラウンドで測り直す割合
+PROBE_RATE = 0.05
+
+# バックグラウンドで測るときの処理時間の上限（締め切りに対する倍率）
+# 打ち切られたティアは推定した全体の処理時間を記録するため、最後まで実行する必要はない
+PROBE_BUDGET_FACTOR = 4
+
+# 履歴が無いティアの想定処理時間（ミリ秒）
+DEFAULT_TIER_LATENCY_MS = {
+    'fast': 300.0,
+    'fast_regions': 300.0,
+    'improved': 3000.0,
+    'improved_burst': 1500.0,
+    'vision': 800.0,
+}
+
+
+class LatencyHistory:
+    """
+    ティアごとの直近の処理時間を保持し、パーセンタイルで見積もる
+    履歴はJSONファイルに保存され、次回起動時にも使われる
+    """
+
+    def __init__(self, history_file=LATENCY_HISTORY_FILE, window=50, save_every=10):
+        self.history_file = history_file
+        self.window = window
+        self.save_every = save_every
+        self._samples = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """履歴ファイルを読み込む"""
+        try:
+            if self.history_file and os.path.exists(self.history_file):
+                with open(self.history_file, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                for tier, samples in loaded.items():
+                    self._samples[tier] = deque((float(ms) for ms in samples), maxlen=self.window)
+        except Exception as e:
+            print(f"処理時間履歴の読み込みエラー: {e}")
+
+    def save(self):
+        """履歴ファイルに保存"""
+        if not self.history_file:
+            return
+        with self._lock:
+            data = {tier: [round(ms, 1) for ms in samples] for tier, samples in self._samples.items()}
+            self._unsaved = 0
+        try:
+            temp_file = self.history_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_file, self.history_file)
+        except Exception as e:
+            print(f"処理時間履歴の保存エラー: {e}")
+
+    def record(self, tier, elapsed_ms):
+        """処理時間を1件記録する"""
+        with self._lock:
+            self._samples.setdefault(tier, deque(maxlen=self.window)).append(float(elapsed_ms))
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def has_samples(self, tier):
+        """ティアの処理時間が1件以上記録されているか"""
+        with self._lock:
+            return bool(self._samples.get(tier))
+
+    def estimate(self, tier, percentile=90):
+        """
+        ティアの処理時間を見積もる（直近の履歴のパーセンタイル）
+
+        Returns:
+            float: 見積もり（ミリ秒）
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(tier, ()))
+        if not samples:
+            return DEFAULT_TIER_LATENCY_MS.get(tier, 1000.0)
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_latency_history():
+    """共通の処理時間履歴を取得"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = LatencyHistory()
+        return _history
+
+
+def camera_deadline_ms(fused=False):
+    """カメラのOCRの処理時間の上限（ミリ秒）。マルチフレーム合成済みの場合は長くする"""
+    return BURST_OCR_DEADLINE_MS if fused else CAMERA_OCR_DEADLINE_MS
+
+
+def _remaining(deadline, minimum=0.05):
+    """締め切りまでの残り時間（秒）。締め切りが無ければNone"""
+    if deadline is None:
+        return None
+    return max(minimum, deadline - time.perf_counter())
+
+
+def fast_tier(image_np, deadline=None):
+    """最も安いティア: 大津の二値化 + Tesseract 1回（締め切りでTesseractを打ち切る）"""
+    from ocr_improved import text_from_data, mean_confidence
+    data = recognize_data(preprocess_image(image_np, 'camera'), lang='jpn', timeout=_remaining(deadline))
+    return {'text': text_from_data(data), 'confidence': mean_confidence(data)}
+
+
+def improved_tier(image_np, deadline=None, image_class='improved'):
+    """ocr_improvedの複数設定探索（締め切りまでに終わった候補から最良のものを選ぶ）"""
+    from ocr_improved import search_best_config, OCR_CONFIGS
+    from preprocess_helper import get_pipeline
+    result = search_best_config(image_np, image_class=image_class, deadline=deadline)
+    tier_result = {
+        'text': result['text'] if result['candidates'] else None,
+        'confidence': result['confidence'],
+        'partial': result['partial'],
+    }
+    if result['partial']:
+        # 打ち切られた場合は全候補を実行した場合の処理時間を推定して履歴に残す
+        total = len(get_pipeline(image_class).outputs) * len(OCR_CONFIGS)
+        tier_result['projected_ms'] = result['elapsed'] * 1000 * total / max(1, len(result['candidates']))
+    return tier_result
+
+
+def burst_improved_tier(image_np, deadline=None):
+    """
+    マルチフレーム合成済みの画像用のimproved_tier
+    合成でノイズが減っているため、fastNlMeansDenoisingを省いた前処理（'burst'）で探索する
+    """
+    return improved_tier(image_np, deadline, image_class='burst')
+
+
+# 処理時間の履歴はティア名ではなくこの名前で記録する（同じティアでも処理時間が大きく違うため）
+burst_improved_tier.history_key = 'improved_burst'
+
+
+def improved_cache_key(image_np, fused=False, **settings):
+    """improved_tier（fusedの場合はburst_improved_tier）の結果のOCRキャッシュのキー"""
+    from ocr_improved import OCR_CONFIGS
+    from preprocess_helper import preset_signature
+    return make_cache_key(image_np, engine='tesseract', lang='jpn', tier='improved',
+                          preprocess=preset_signature('burst' if fused else 'improved'),
+                          configs=OCR_CONFIGS, **settings)
+
+
+def _history_key(tiers, tier):
+    """ティアの処理時間を記録する履歴の名前"""
+    return getattr(tiers[tier], 'history_key', tier)
+
+
+# 精度の低い順
+TIER_ORDER = ('fast', 'improved', 'vision')
+
+# 各ティアは締め切り（最も安いティアは締め切り+FALLBACK_GRACE_MS）で打ち切られるため、
+# 締め切りを過ぎた処理が溜まり続けることはない
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="DeadlineOCR")
+
+# 処理時間を測るためのバックグラウンド実行（同時に1つまで）
+_probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DeadlineOCRProbe")
+_probing = set()
+_probing_lock = threading.Lock()
+
+
+def choose_tier(tiers, deadline_ms, history=None):
+    """
+    締め切りに間に合うと見込まれる最も高精度なティアを選ぶ（無ければ最も安いティア）
+    履歴の無いティアは既定の見積もりで判断する。見積もりが締め切りを超えるティアは
+    probe_tiersがバックグラウンドで測り、実際の処理時間が間に合えば以後選ばれる
+
+    Args:
+        tiers (dict): ティア名 -> 関数
+        deadline_ms (float): 処理時間の上限（ミリ秒）
+    """
+    history = history or get_latency_history()
+    available = [tier for tier in TIER_ORDER if tier in tiers]
+    for tier in reversed(available):
+        if history.estimate(_history_key(tiers, tier)) <= deadline_ms:
+            return tier
+    return available[0]
+
+
+def _run_tier(history, key, func, image_np, deadline, cache_key=None):
+    """
+    ティアを実行し、処理時間を履歴に記録する（締め切り後に終わった場合も記録）
+    途中で打ち切ったティアは推定した全体の処理時間（projected_ms）を記録する
+    cache_keyを指定した場合は、打ち切られずに得られた空でない結果をOCRキャッシュに保存する
+    """
+    start = time.perf_counter()
+    result = None
+    try:
+        result = func(image_np, deadline)
+        if (cache_key and result and result.get('text') and result['text'].strip()
+                and not result.get('partial')):
+            get_ocr_cache().put(cache_key, result['text'])
+        return result
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if result and result.get('projected_ms'):
+            elapsed_ms = max(elapsed_ms, result['projected_ms'])
+        history.record(key, elapsed_ms)
+
+
+def _probe(history, key, func, image_np, deadline_ms, cache_key):
+    """バックグラウンドでティアを1回実行して処理時間を記録する"""
+    try:
+        _run_tier(history, key, func, image_np,
+                  time.perf_counter() + deadline_ms * PROBE_BUDGET_FACTOR / 1000.0, cache_key)
+    except Exception as e:
+        print(f"処理時間の計測（{key}）でエラーが発生しました: {e}")
+    finally:
+        with _probing_lock:
+            _probing.discard(key)
+
+
+def probe_tiers(image_np, tiers, chosen, deadline_ms, history=None, cache_keys=None):
+    """
+    選ばれなかったティアの処理時間をバックグラウンドで測る（高精度のティアから順に1つだけ）
+    履歴の無いティアは必ず、それ以外はPROBE_RATEの割合で測り直す
+    最も安いティアは選んだティアの代わりとして常に実行されるため測らない
+    （同時に測るのは1つまで。測定中は新しく投入しない）
+    """
+    history = history or get_latency_history()
+    available = [tier for tier in TIER_ORDER if tier in tiers]
+    for tier in reversed(available[1:]):
+        if tier == chosen:
+            continue
+        key = _history_key(tiers, tier)
+        if history.has_samples(key) and random.random() >= PROBE_RATE:
+            continue
+        with _probing_lock:
+            if _probing:
+                return
+            _probing.add(key)
+        _probe_executor.submit(_probe, history, key, tiers[tier], image_np, deadline_ms,
+                               (cache_keys or {}).get(tier))
+        return
+
+
+def cached_tier_result(tiers, cache_keys, min_tier=None):
+    """
+    キャッシュにあるティアの結果を精度の高い順に探す
+
+    Args:
+        tiers (dict): ティア名 -> 関数
+        cache_keys (dict): ティア名 -> OCRキャッシュのキー
+        min_tier (str): これより精度の低いティアの結果は使わない
+
+    Returns:
+        tuple: (ティア名, テキスト) 見つからなければ (None, None)
+    """
+    if not cache_keys:
+        return None, None
+    available = [tier for tier in TIER_ORDER if tier in tiers]
+    if min_tier in available:
+        available = available[available.index(min_tier):]
+    cache = get_ocr_cache()
+    for tier in reversed(available):
+        key = cache_keys.get(tier)
+        text = cache.get(key) if key else None
+        if text is not None:
+            return tier, text
+    return None, None
+
+
+def _usable(future):
+    """完了していて、テキストが得られた結果か"""
+    if not future.done() or future.exception() is not None:
+        return False
+    result = future.result()
+    return result is not None and result.get('text') is not None
+
+
+def ocr_with_deadline(image_np, deadline_ms, tiers, history=None, cache_keys=None):
+    """
+    締め切り内で最良のOCR結果を返す
+
+    選んだティアが最も安いティアでなければ、安いティアも同時に実行しておき、
+    選んだティアが締め切りに間に合わない・失敗した場合はそちらの結果を返す
+    安いティアも締め切り+FALLBACK_GRACE_MSまでに終わらなければ空の結果を返す
+
+    Args:
+        image_np (numpy.ndarray): 画像
+        deadline_ms (float): 処理時間の上限（ミリ秒）
+        tiers (dict): ティア名 -> func(image_np, deadline) 。funcはtext, confidenceを持つ辞書を返す
+        history (LatencyHistory): 処理時間の履歴（Noneの場合は共通の履歴）
+        cache_keys (dict): ティア名 -> OCRキャッシュのキー（指定したティアは結果を再利用・保存する）
+
+    Returns:
+        dict: text, confidence, tier, partial, elapsed_ms, cached
+    """
+    history = history or get_latency_history()
+    start = time.perf_counter()
+    deadline = start + deadline_ms / 1000.0
+    cache_keys = cache_keys or {}
+    chosen = choose_tier(tiers, deadline_ms, history)
+    cheapest = next(tier for tier in TIER_ORDER if tier in tiers)
+
+    # 選んだティア以上の精度の結果がキャッシュにあればそのまま使う
+    cached_tier, cached_text = cached_tier_result(tiers, cache_keys, min_tier=chosen)
+    if cached_tier is not None:
+        return {'text': cached_text, 'confidence': None, 'tier': cached_tier, 'partial': False,
+                'elapsed_ms': (time.perf_counter() - start) * 1000, 'cached': True}
+
+    probe_tiers(image_np, tiers, chosen, deadline_ms, history, cache_keys)
+
+    futures = {chosen: _executor.submit(_run_tier, history, _history_key(tiers, chosen), tiers[chosen],
+                                        image_np, deadline, cache_keys.get(chosen))}
+    fallback_text = None
+    if chosen != cheapest:
+        fallback_text = get_ocr_cache().get(cache_keys[cheapest]) if cache_keys.get(cheapest) else None
+        if fallback_text is None:
+            # 安いティアには締め切り後の猶予まで与える
+            futures[cheapest] = _executor.submit(_run_tier, history, _history_key(tiers, cheapest),
+                                                 tiers[cheapest], image_np,
+                                                 deadline + FALLBACK_GRACE_MS / 1000.0,
+                                                 cache_keys.get(cheapest))
+
+    # 締め切りまで選んだティアを待つ（先に失敗した場合は待たない）
+    pending = set(futures.values())
+    while futures[chosen] in pending:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        _, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    if _usable(futures[chosen]):
+        result = futures[chosen].result()
+        tier = chosen
+    elif fallback_text is not None:
+        result = {'text': fallback_text, 'confidence': None}
+        tier = cheapest
+    else:
+        # 安いティアの結果は締め切りを過ぎても無いよりはましなので、猶予の間だけ待つ
+        tier = cheapest
+        grace_end = deadline + FALLBACK_GRACE_MS / 1000.0
+        try:
+            result = futures[cheapest].result(timeout=max(0.0, grace_end - time.perf_counter()))
+        except FuturesTimeoutError:
+            print(f"OCR（{cheapest}）が締め切り後の猶予（{FALLBACK_GRACE_MS}ms）内に終わりませんでした")
+            result = None
+        except Exception as e:
+            print(f"OCR（{cheapest}）でエラーが発生しました: {e}")
+            result = None
+        if result is None or result.get('text') is None:
+            return {'text': '', 'confidence': 0, 'tier': None, 'partial': True,
+                    'elapsed_ms': (time.perf_counter() - start) * 1000, 'cached': False}
+
+    return {
+        'text': result['text'],
+        'confidence': result.get('confidence'),
+        'tier': tier,
+        'partial': tier != chosen or bool(result.get('partial')),
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+        'cached': False,
+    }
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+複数ページ文書の入力ヘルパー
+PDFと複数フレームのTIFFを1ページずつ必要になった時点でラスタライズする
+（数百ページの文書でも全ページを同時にメモリへ展開しない）
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# PDFのラスタライズ（PyMuPDFを優先し、無ければpdf2image/popplerを使用）
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+
+PDF_EXTENSIONS = ('.pdf',)
+MULTIFRAME_EXTENSIONS = ('.tif', '.tiff')
+# PDFをラスタライズする解像度
+PDF_DPI = 300
+
+
+def is_pdf(path):
+    """PDFファイルか"""
+    return path.lower().endswith(PDF_EXTENSIONS)
+
+
+def page_count(path):
+    """
+    文書のページ数を取得する（画像はデコードしない）
+
+    Returns:
+        int: ページ数（通常の画像は1）
+    """
+    if is_pdf(path):
+        if PYMUPDF_AVAILABLE:
+            with fitz.open(path) as doc:
+                return doc.page_count
+        if PDF2IMAGE_AVAILABLE:
+            return int(pdfinfo_from_path(path)['Pages'])
+        raise RuntimeError("PDFを読み込むにはPyMuPDFまたはpdf2imageが必要です")
+
+    if path.lower().endswith(MULTIFRAME_EXTENSIONS):
+        with Image.open(path) as img:
+            return getattr(img, 'n_frames', 1)
+    return 1
+
+
+def is_multipage_document(path):
+    """ページ単位で処理する文書（PDF・複数フレームのTIFF）か"""
+    if is_pdf(path):
+        return True
+    if path.lower().endswith(MULTIFRAME_EXTENSIONS):
+        try:
+            return page_count(path) > 1
+        except Exception:
+            return False
+    return False
+
+
+def _pixmap_to_array(pixmap):
+    """PyMuPDFのPixmapをグレースケールのNumPy配列に変換"""
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width).copy()
+
+
+def load_page(path, page, dpi=PDF_DPI):
+    """
+    指定したページだけをラスタライズする
+
+    Args:
+        path (str): PDFまたはTIFFのパス
+        page (int): ページ番号（1始まり）
+        dpi (int): PDFのラスタライズ解像度
+
+    Returns:
+        numpy.ndarray: グレースケール画像
+    """
+    if is_pdf(path):
+        if PYMUPDF_AVAILABLE:
+            with fitz.open(path) as doc:
+                return _pixmap_to_array(doc[page - 1].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY))
+        if PDF2IMAGE_AVAILABLE:
+            images = convert_from_path(path, dpi=dpi, first_page=page, last_page=page, grayscale=True)
+            return np.array(images[0])
+        raise RuntimeError("PDFを読み込むにはPyMuPDFまたはpdf2imageが必要です")
+
+    with Image.open(path) as img:
+        img.seek(page - 1)
+        return np.array(img.convert('L'))
+
+
+def iter_pages(path, dpi=PDF_DPI):
+    """
+    文書のページを1枚ずつラスタライズして返す
+
+    Yields:
+        tuple: (ページ番号, グレースケール画像)
+    """
+    if is_pdf(path) and PYMUPDF_AVAILABLE:
+        with fitz.open(path) as doc:
+            for index in range(doc.page_count):
+                pixmap = doc[index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                yield index + 1, _pixmap_to_array(pixmap)
+        return
+
+    if is_pdf(path):
+        for page in range(1, page_count(path) + 1):
+            yield page, load_page(path, page, dpi=dpi)
+        return
+
+    with Image.open(path) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            img.seek(index)
+            yield index + 1, np.array(img.convert('L'))
+
+
+def iter_document_ocr(path, ocr_func, max_workers=2, dpi=PDF_DPI):
+    """
+    ページを順にラスタライズしながら並列にOCRし、ページ順に結果を返す
+    展開済みのページはmax_workers + 1枚までに抑える
+
+    Args:
+        path (str): PDFまたはTIFFのパス
+        ocr_func (callable): 画像を受け取り結果を返す関数
+        max_workers (int): 並列にOCRするページ数
+
+    Yields:
+        tuple: (ページ番号, ocr_funcの結果)
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page, image in iter_pages(path, dpi=dpi):
+            # 処理中のページ（max_workers枚）と今ラスタライズしたページの合計をmax_workers + 1枚に抑える
+            if len(pending) >= max_workers:
+                done_page, future = pending.popleft()
+                yield done_page, future.result()
+            pending.append((page, executor.submit(ocr_func, image)))
+            del image
+        while pending:
+            done_page, future = pending.popleft()
+            yield done_page, future.result()
+
+
+def iter_page_tasks(paths):
+    """
+    ファイル一覧をページ単位のタスクに展開する（ページ数の取得のみでラスタライズはしない）
+
+    Yields:
+        tuple: (パス, ページ番号) 通常の画像はページ番号None
+    """
+    for path in paths:
+        if is_multipage_document(path):
+            try:
+                count = page_count(path)
+            except Exception:
+                # 読み込めない文書はエラーとして記録させるため1タスクにする
+                yield path, None
+                continue
+            for page in range(1, count + 1):
+                yield path, page
+        else:
+            yield path, None
+
+
+def task_key(path, page):
+    """処理済み判定に使うキー"""
+    return path if page is None else f"{path}#{page}"
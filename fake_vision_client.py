@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+オフライン用の疑似Google Vision APIクライアント
+バッチ分割・リトライ・順序保証の確認やベンチマークに使う（課金・ネットワーク不要）
+"""
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+# 実際のAPIと同じ制限値
+FAKE_MAX_IMAGES_PER_REQUEST = 16
+FAKE_MAX_REQUEST_BYTES = 10 * 1024 * 1024
+
+
+class FakeVisionError(Exception):
+    """一時的なサーバーエラーを模した例外"""
+    pass
+
+
+def _request_content(request):
+    """AnnotateImageRequest / dict のどちらからでも画像バイトを取り出す"""
+    if isinstance(request, dict):
+        return request['image']['content']
+    return request.image.content
+
+
+class FakeImageAnnotatorClient:
+    """
+    ImageAnnotatorClientの代わりに使う疑似クライアント
+    画像の内容から決まるテキストを返すので、結果の順序を検証できる
+    answersに画像バイトのSHA-1と正解テキストの対応を渡すと、その画像には正解テキストを返す
+    （ベンチマークで文字誤り率を計算する場合）
+    """
+
+    def __init__(self, latency=0.05, per_image_latency=0.005, failure_rate=0.0, seed=None,
+                 answers=None):
+        self.latency = latency
+        self.answers = answers or {}
+        self.per_image_latency = per_image_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.image_count = 0
+        self.failure_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def expected_text(content):
+        """指定した画像バイトに対して返すテキスト"""
+        return f"fake-{hashlib.sha1(content).hexdigest()[:12]}"
+
+    def _annotate(self, content):
+        """1画像分のレスポンスを作成"""
+        text = self.answers.get(hashlib.sha1(content).hexdigest())
+        if text is None:
+            text = self.expected_text(content)
+        annotation = SimpleNamespace(description=text)
+        return SimpleNamespace(
+            error=SimpleNamespace(message=''),
+            text_annotations=[annotation]
+        )
+
+    def text_detection(self, image, timeout=None):
+        """単一画像のテキスト検出（timeoutは本物のクライアントと同じ引数。偽物では無視する）"""
+        content = image['content'] if isinstance(image, dict) else image.content
+        time.sleep(self.latency + self.per_image_latency)
+        with self._lock:
+            self.request_count += 1
+            self.image_count += 1
+        return self._annotate(content)
+
+    def batch_annotate_images(self, requests):
+        """
+        バッチでのテキスト検出
+
+        Raises:
+            ValueError: APIの制限を超えたリクエスト
+            FakeVisionError: failure_rateに従った一時的エラー
+        """
+        contents = [_request_content(request) for request in requests]
+        if len(contents) > FAKE_MAX_IMAGES_PER_REQUEST:
+            raise ValueError(f"too many images in request: {len(contents)}")
+        total_bytes = sum(len(content) for content in contents)
+        if total_bytes > FAKE_MAX_REQUEST_BYTES:
+            raise ValueError(f"request payload too large: {total_bytes} bytes")
+
+        with self._lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.random.random() < self.failure_rate
+        try:
+            time.sleep(self.latency + self.per_image_latency * len(contents))
+            if fail:
+                with self._lock:
+                    self.failure_count += 1
+                raise FakeVisionError("503 Service Unavailable (fake)")
+            with self._lock:
+                self.image_count += len(contents)
+            return SimpleNamespace(responses=[self._annotate(content) for content in contents])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
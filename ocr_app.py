@@ -2,8 +2,21 @@ import pytesseract
 from PIL import Image, ImageEnhance
 import sys
 import os
+import time
 import cv2  # OpenCVをインポート
 import numpy as np
+from preprocess_helper import preprocess_image, preset_signature, get_pipeline, normalize_text_height
+from camera_helper import ThreadedCamera
+from tesseract_helper import recognize_text, recognize_data
+from ocr_improved import text_from_data, mean_confidence
+from ocr_batch_helper import run_batch_ocr, parse_batch_args, print_batch_summary
+from auto_capture_helper import AutoCaptureTrigger
+from ocr_cache_helper import get_ocr_cache, make_cache_key, PerceptualHashCache
+from tiled_ocr_helper import is_large_image, ocr_image_tiled
+from deadline_ocr_helper import (ocr_with_deadline, fast_tier, improved_tier, burst_improved_tier,
+                                 improved_cache_key, camera_deadline_ms)
+from burst_fusion_helper import capture_fused
+from document_input_helper import is_multipage_document, iter_document_ocr, load_page
 
 # --- 設定 ---
 # ここにTesseract-OCRのインストールパスを指定してください
@@ -22,20 +35,34 @@ def ocr_image(image_path):
         str: 抽出されたテキスト
     """
     try:
+        # PDF・複数フレームのTIFFはページごとの結果を連結
+        if is_multipage_document(image_path):
+            return '\n\n'.join(record['text'] for record in iter_ocr_document(image_path))
+
+        # 大きなスキャン画像はタイルに分割して並列に処理
+        if is_large_image(image_path):
+            return ocr_image_tiled(image_path)['text']
+
         # 画像を開く
         img = Image.open(image_path)
         
         # PIL ImageをOpenCV形式に変換
         cv_img = np.array(img)
         
+        # 同じ画素・設定の結果がキャッシュにあれば再利用
+        cache = get_ocr_cache()
+        cache_key = make_cache_key(cv_img, engine='tesseract', lang='jpn',
+                                   preprocess=preset_signature('default'))
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+        
         # 高精度前処理を適用
         processed_img_np = enhance_image_for_ocr(cv_img)
         
-        # NumPy配列からPIL Imageに変換
-        processed_img = Image.fromarray(processed_img_np)
-
-        # OCRの実行（日本語を指定）
-        text = pytesseract.image_to_string(processed_img, lang='jpn')
+        # OCRの実行（常駐エンジンにNumPy配列を直接渡す）
+        text = recognize_text(processed_img_np, lang='jpn')
+        cache.put(cache_key, text)
         
         return text
 
@@ -46,46 +73,149 @@ def ocr_image(image_path):
         print(f"OCR処理中にエラーが発生しました: {e}", file=sys.stderr)
         return ""
 
-def enhance_image_for_ocr(image_np):
+def ocr_image_record(image_path):
+    """
+    バッチ処理用に、テキスト・平均信頼度・処理時間をまとめて返す
+
+    Args:
+        image_path (str): 画像ファイルのパス
+
+    Returns:
+        dict: text, confidence, engine, timings
+    """
+    if is_large_image(image_path):
+        result = ocr_image_tiled(image_path)
+        return {
+            'text': result['text'],
+            'confidence': result['confidence'],
+            'engine': 'tesseract',
+            'tiles': result['tiles'],
+            'timings': result['timings']
+        }
+
+    timings = {}
+    start = time.perf_counter()
+    img = Image.open(image_path)
+    cv_img = np.array(img)
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return ocr_array_record(cv_img, timings)
+
+def ocr_page_record(document_path, page):
+    """
+    PDF・TIFFの1ページだけをラスタライズしてOCRする（バッチ処理用）
+
+    Args:
+        document_path (str): PDFまたはTIFFのパス
+        page (int): ページ番号（1始まり）
+
+    Returns:
+        dict: text, confidence, engine, page, timings
+    """
+    timings = {}
+    start = time.perf_counter()
+    page_img = load_page(document_path, page)
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    record = ocr_array_record(page_img, timings)
+    record['page'] = page
+    return record
+
+def iter_ocr_document(document_path, max_workers=2):
+    """
+    PDF・TIFFを1ページずつラスタライズしながらOCRし、ページ順に結果を返す
+
+    Yields:
+        dict: text, confidence, engine, page, timings
     """
-    OCR精度向上のためのシンプルな画像前処理
+    for page, record in iter_document_ocr(document_path, ocr_array_record, max_workers=max_workers):
+        record['page'] = page
+        yield record
+
+def ocr_array_record(image_np, timings=None):
+    """
+    デコード済みの画像をOCRし、テキスト・平均信頼度・処理時間をまとめて返す
+
+    Args:
+        image_np (numpy.ndarray): 画像
+        timings (dict): 計測済みの処理時間（デコード時間など）
+
+    Returns:
+        dict: text, confidence, engine, timings
+    """
+    timings = dict(timings or {})
+    start = time.perf_counter()
+    pipeline = get_pipeline('default')
+    outputs, stage_timings = pipeline.run(image_np)
+    processed_img_np = outputs[pipeline.outputs[0]]
+    timings['preprocess_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    timings['preprocess_stages'] = {name: round(ms, 1) for name, ms in stage_timings.items()}
+
+    start = time.perf_counter()
+    data = recognize_data(processed_img_np, lang='jpn')
+    timings['ocr_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    return {
+        'text': text_from_data(data),
+        'confidence': round(mean_confidence(data), 1),
+        'engine': 'tesseract',
+        'timings': timings
+    }
+
+def enhance_image_for_ocr(image_np, image_class='default'):
+    """
+    OCR精度向上のための画像前処理（設定ファイルで選択したプリセットを適用）
     
     Args:
         image_np (numpy.ndarray): 入力画像
+        image_class (str): 画像の種類（'default', 'camera' など）またはプリセット名
     
     Returns:
         numpy.ndarray: 前処理済み画像
     """
-    # グレースケール化
-    if len(image_np.shape) == 3:
-        gray = cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image_np.copy()
-    
-    # 大津の二値化（元の方法を使用）
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    return binary
+    return preprocess_image(image_np, image_class)
 
-def ocr_frame(frame_np):
+def ocr_frame(frame_np, deadline_ms=None, fused=False):
     """
     OpenCVのフレーム（NumPy配列）から文字を読み取り、テキストを返す
 
     Args:
         frame_np (numpy.ndarray): OpenCVのフレーム（NumPy配列）
+        deadline_ms (float): 処理時間の上限（ミリ秒）。指定した場合は処理時間の履歴から
+                             大津の二値化とocr_improvedの探索のうち間に合う方を選ぶ
+        fused (bool): マルチフレーム合成済みのフレームか（ocr_improvedの探索でノイズ除去を省く）
 
     Returns:
         str: 抽出されたテキスト
     """
     try:
-        # 高精度前処理を適用
-        processed_frame = enhance_image_for_ocr(frame_np)
+        if deadline_ms is not None:
+            # ティアごとにキャッシュのキーを分ける（結果の精度が違うため）
+            cache_keys = {
+                'fast': make_cache_key(frame_np, engine='tesseract', lang='jpn', tier='fast',
+                                       preprocess=preset_signature('camera')),
+                'improved': improved_cache_key(frame_np, fused=fused),
+            }
+            result = ocr_with_deadline(frame_np, deadline_ms,
+                                       {'fast': fast_tier,
+                                        'improved': burst_improved_tier if fused else improved_tier},
+                                       cache_keys=cache_keys)
+            print(f"{result['tier']} ティアを使用（{result['elapsed_ms']:.0f}ms / 上限{deadline_ms}ms"
+                  f"{'、キャッシュ' if result['cached'] else ''}）")
+            return result['text']
+
+        # 同じ画素・設定の結果がキャッシュにあれば再利用
+        cache = get_ocr_cache()
+        cache_key = make_cache_key(frame_np, engine='tesseract', lang='jpn',
+                                   preprocess=preset_signature('camera'))
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
 
-        # NumPy配列からPIL Imageに変換
-        pil_img = Image.fromarray(processed_frame)
+        # 高精度前処理を適用
+        processed_frame = enhance_image_for_ocr(frame_np, 'camera')
 
-        # シンプルなOCR実行（日本語を指定）
-        text = pytesseract.image_to_string(pil_img, lang='jpn')
+        # シンプルなOCR実行（常駐エンジンにNumPy配列を直接渡す）
+        text = recognize_text(processed_frame, lang='jpn')
+        cache.put(cache_key, text)
         
         return text
 
@@ -93,18 +223,31 @@ def ocr_frame(frame_np):
         print(f"OCRフレーム処理中にエラーが発生しました: {e}", file=sys.stderr)
         return ""
 
-def capture_and_ocr_from_camera():
+def capture_and_ocr_from_camera(auto_mode=False, burst_mode=False):
     """
     カメラを起動し、キャプチャした画像から文字を読み取る
+
+    Args:
+        auto_mode (bool): 鮮明・静止したフレームが続いたら自動的にOCRを実行する
+        burst_mode (bool): 連写したフレームを位置合わせ・合成してノイズを減らす（暗い場所向け）
     """
-    cap = cv2.VideoCapture(0)
+    # 別スレッドで最新フレームを保持するカメラ（OCR後に古いフレームを読まない）
+    cap = ThreadedCamera(0)
     if not cap.isOpened():
         print("エラー: カメラを開けません。")
         return
+    print(cap.describe())
 
     print("カメラを起動しました。")
     print("SPACEキーを押すとOCRを実行します。")
     print("'q'キーを押すと終了します。")
+    if auto_mode:
+        print("自動キャプチャ: 鮮明で静止した状態が続くとOCRを実行します。")
+    if burst_mode:
+        print("マルチフレーム合成: 連写した画像を合成してからOCRを実行します。")
+    auto_trigger = AutoCaptureTrigger() if auto_mode else None
+    # 同じシーンの再OCRを省くための知覚ハッシュキャッシュ
+    scene_cache = PerceptualHashCache()
 
     while True:
         ret, frame = cap.read()
@@ -115,26 +258,44 @@ def capture_and_ocr_from_camera():
         # 画面にフレームを表示
         cv2.imshow('Camera', frame)
 
+        # 自動キャプチャの判定（毎フレーム評価）
+        auto_fire = auto_trigger.update(frame) if auto_trigger else False
+
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):  # 'q'キーが押されたら
             break
-        elif key == ord(' '):  # SPACEキーが押されたら
+        elif key == ord(' ') or auto_fire:  # SPACEキーが押されたら（または自動キャプチャ）
             # ウィンドウタイトルを変更して処理中であることを示す
             cv2.setWindowTitle('Camera', 'Camera - Processing...')
-            print("\n手動キャプチャ: 画像を処理します...")
+            print("\n自動キャプチャ: 画像を処理します..." if auto_fire and key != ord(' ')
+                  else "\n手動キャプチャ: 画像を処理します...")
+
+            extracted_text = scene_cache.lookup(frame)
+            if extracted_text is not None:
+                print("前回と同じシーンのため認識結果を再利用します。")
+            else:
+                # プレビューは低解像度なので、OCR用に高解像度の静止画を撮る
+                # （マルチフレーム合成では連写して合成し、ノイズ除去の代わりにする）
+                if burst_mode:
+                    still, _ = capture_fused(cap)
+                else:
+                    _, still = cap.capture_still()
+                fused = burst_mode and still is not None
+                still = still if still is not None else frame
 
-            # --- 画像のリサイズ処理 ---
-            h, w, _ = frame.shape
-            resize_w = 1280
-            resize_h = int(h * (resize_w / w))
-            resized_frame = cv2.resize(frame, (resize_w, resize_h))
-            print(f"画像をリサイズしました: ({w}x{h}) -> ({resize_w}x{resize_h})")
-            # --------------------------
+                # --- 文字の高さに合わせたリサイズ処理 ---
+                h, w, _ = still.shape
+                resized_frame, scale, text_height = normalize_text_height(still)
+                resize_h, resize_w = resized_frame.shape[:2]
+                print(f"画像をリサイズしました: ({w}x{h}) -> ({resize_w}x{resize_h})"
+                      f" 文字高さ推定: {text_height or 0:.0f}px 倍率: {scale:.2f}")
+                # --------------------------
 
-            # OCRを実行
-            print("OCRを実行中...")
-            extracted_text = ocr_frame(resized_frame) # ocr_frameを呼び出す
-            print("OCR処理が完了しました。")
+                # OCRを実行
+                print("OCRを実行中...")
+                extracted_text = ocr_frame(resized_frame, deadline_ms=camera_deadline_ms(fused), fused=fused)
+                scene_cache.add(frame, extracted_text)
+                print("OCR処理が完了しました。")
 
             print("--- 読み取り結果 ---")
             if extracted_text and not extracted_text.isspace():
@@ -153,7 +314,16 @@ def capture_and_ocr_from_camera():
 if __name__ == "__main__":
     # 引数に応じて処理を分岐
     if len(sys.argv) > 1 and sys.argv[1] == "camera":
-        capture_and_ocr_from_camera()
+        capture_and_ocr_from_camera(auto_mode="auto" in sys.argv[2:], burst_mode="burst" in sys.argv[2:])
+    elif len(sys.argv) > 2 and sys.argv[1] == "batch":
+        inputs, options = parse_batch_args(sys.argv[2:])
+        summary = run_batch_ocr(inputs, module_name='ocr_app', **options)
+        print_batch_summary(summary)
+    elif len(sys.argv) > 1 and is_multipage_document(sys.argv[1]):
+        # ページごとに読み取り次第表示（後続の要約などを待たせない）
+        for record in iter_ocr_document(sys.argv[1]):
+            print(f"--- ページ {record['page']} ---")
+            print(record['text'], flush=True)
     elif len(sys.argv) > 1:
         input_path = sys.argv[1]
         # OCRを実行して結果を表示
@@ -162,5 +332,7 @@ if __name__ == "__main__":
     else:
         print("使用法:")
         print("  画像ファイルから読み取る場合: python ocr_app.py <画像ファイルのパス>")
-        print("  カメラから読み取る場合:      python ocr_app.py camera")
+        print("  PDF・TIFFから読み取る場合:   python ocr_app.py <文書ファイルのパス>")
+        print("  カメラから読み取る場合:      python ocr_app.py camera [auto] [burst]")
+        print("  フォルダを一括処理する場合:  python ocr_app.py batch <フォルダ> [--output 出力.jsonl] [--workers N]")
         sys.exit(1)
@@ -5,6 +5,28 @@ import os
 import cv2
 import numpy as np
 import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from preprocess_helper import preprocess_image, preset_signature, get_pipeline, normalize_text_height
+from camera_helper import ThreadedCamera
+from tesseract_helper import recognize_text
+from ocr_cache_helper import get_ocr_cache, make_cache_key, make_file_cache_key
+from image_encode_helper import encode_for_upload
+from text_region_helper import detect_text_regions, recognize_regions, iter_recognize_regions, union_box
+from tiled_ocr_helper import is_large_image, ocr_image_tiled
+from deadline_ocr_helper import (ocr_with_deadline, fast_tier, improved_tier, burst_improved_tier,
+                                 improved_cache_key, choose_tier, probe_tiers, cached_tier_result,
+                                 get_latency_history, camera_deadline_ms)
+from burst_fusion_helper import capture_fused
+from document_input_helper import (is_multipage_document, iter_document_ocr, iter_page_tasks,
+                                   load_page, task_key)
+from tesseract_helper import recognize_data
+from ocr_improved import text_from_data, mean_confidence
+from ocr_batch_helper import (collect_image_paths, load_done_paths, open_jsonl_output,
+                              write_jsonl_record, run_batch_ocr, parse_batch_args,
+                              print_batch_summary)
 
 # Google Vision API imports
 try:
@@ -12,7 +34,18 @@ try:
     GOOGLE_VISION_AVAILABLE = True
 except ImportError:
     GOOGLE_VISION_AVAILABLE = False
-    print("Google Cloud Vision not installed. Using Tesseract only.")
+    # 標準出力はバッチのJSONLや読み取り結果に使うため、状態の表示は標準エラーに出す
+    print("Google Cloud Vision not installed. Using Tesseract only.", file=sys.stderr)
+
+# 再試行する一時的なエラー（認証・権限・不正な引数などは再試行しても成功しない）
+from fake_vision_client import FakeVisionError
+try:
+    from google.api_core import exceptions as google_exceptions
+    TRANSIENT_VISION_ERRORS = (google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded,
+                               google_exceptions.ResourceExhausted, google_exceptions.InternalServerError,
+                               FakeVisionError)
+except ImportError:
+    TRANSIENT_VISION_ERRORS = (FakeVisionError,)
 
 # --- 設定 ---
 tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -21,6 +54,26 @@ pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 # Google Vision API設定
 GOOGLE_KEY_PATH = "google-vision-key.json"
 
+# フレームをVisionへ送る際のエンコード設定（アップロード量を削減）
+VISION_UPLOAD_SETTINGS = {
+    'fmt': 'jpeg',
+    'quality': 85,
+    'max_side': 1600,
+    'target_text_height': 32,
+    'grayscale': True,
+}
+
+# フレームOCRで文字領域だけを切り出して認識するか
+USE_TEXT_REGIONS = True
+
+# バッチ処理の制限（batch_annotate_imagesは1リクエスト16画像・10MBまで）
+VISION_BATCH_MAX_IMAGES = 16
+VISION_BATCH_MAX_BYTES = 10 * 1024 * 1024
+
+# プロセス共通のVisionクライアント（gRPCチャネルを使い回す）
+_vision_client = None
+_vision_client_lock = threading.Lock()
+
 def setup_google_vision():
     """Google Vision APIの設定を行う"""
     if not GOOGLE_VISION_AVAILABLE:
@@ -37,12 +90,80 @@ def setup_google_vision():
         client = vision.ImageAnnotatorClient()
         return client
     except Exception as e:
-        print(f"Google Vision API setup error: {e}")
+        print(f"Google Vision API setup error: {e}", file=sys.stderr)
         return None
 
+def get_google_vision_client():
+    """
+    プロセス共通のVisionクライアントを取得する
+    初回呼び出し時のみキーファイルを読み込んでクライアントを生成する
+    """
+    global _vision_client
+    if _vision_client is not None:
+        return _vision_client
+    
+    with _vision_client_lock:
+        if _vision_client is None:
+            _vision_client = setup_google_vision()
+        return _vision_client
+
+def reset_google_vision_client():
+    """共通クライアントを破棄し、次回呼び出し時に再生成させる"""
+    global _vision_client
+    with _vision_client_lock:
+        client = _vision_client
+        _vision_client = None
+    if client is not None:
+        try:
+            client.transport.close()
+        except Exception:
+            pass
+
+def check_google_vision_health(timeout=5.0):
+    """
+    共通クライアントのgRPCチャネルが接続可能か確認する（APIリクエストは送らない）
+    
+    Returns:
+        bool: 接続可能ならTrue
+    """
+    client = get_google_vision_client()
+    if not client:
+        return False
+    
+    try:
+        import grpc
+        channel = client.transport.grpc_channel
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+        return True
+    except Exception as e:
+        print(f"Google Vision API health check error: {e}", file=sys.stderr)
+        return False
+
+def warm_up_google_vision(timeout=5.0):
+    """
+    クライアント生成とTLS接続を事前に済ませ、最初のOCRの待ち時間を減らす
+    
+    Returns:
+        bool: Vision APIが利用可能ならTrue
+    """
+    if not GOOGLE_VISION_AVAILABLE:
+        return False
+    
+    if check_google_vision_health(timeout=timeout):
+        return True
+    
+    # 接続できない場合はクライアントを作り直して再確認
+    reset_google_vision_client()
+    return check_google_vision_health(timeout=timeout)
+
+def _handle_google_vision_error():
+    """API呼び出し失敗時、チャネルが壊れていればクライアントを破棄する"""
+    if not check_google_vision_health(timeout=1.0):
+        reset_google_vision_client()
+
 def ocr_with_google_vision(image_path):
     """Google Vision APIを使用したOCR"""
-    client = setup_google_vision()
+    client = get_google_vision_client()
     if not client:
         return None
     
@@ -63,25 +184,32 @@ def ocr_with_google_vision(image_path):
             return ""
     
     except Exception as e:
-        print(f"Google Vision API error: {e}")
+        print(f"Google Vision API error: {e}", file=sys.stderr)
+        _handle_google_vision_error()
         return None
 
-def ocr_frame_with_google_vision(frame_np):
-    """Google Vision APIを使用したフレームOCR"""
-    client = setup_google_vision()
+def ocr_frame_with_google_vision(frame_np, timeout=None):
+    """Google Vision APIを使用したフレームOCR（timeoutはAPI呼び出しの最大時間（秒））"""
+    client = get_google_vision_client()
     if not client:
         return None
     
     try:
-        # NumPy配列を画像バイトに変換
-        _, encoded_image = cv2.imencode('.png', frame_np)
-        content = encoded_image.tobytes()
+        # NumPy配列を縮小・圧縮して画像バイトに変換
+        content, stats = encode_for_upload(frame_np, **VISION_UPLOAD_SETTINGS)
         
         image = vision.Image(content=content)
         
         # テキスト検出を実行
-        response = client.text_detection(image=image)
+        start = time.perf_counter()
+        if timeout is not None:
+            response = client.text_detection(image=image, timeout=timeout)
+        else:
+            response = client.text_detection(image=image)
         texts = response.text_annotations
+        print(f"[Vision] {stats['format']} {stats['encoded_size'][0]}x{stats['encoded_size'][1]}, "
+              f"{stats['bytes'] / 1024:.1f}KB, エンコード {stats['encode_ms']:.0f}ms, "
+              f"API {(time.perf_counter() - start) * 1000:.0f}ms", file=sys.stderr)
         
         if texts:
             return texts[0].description
@@ -89,39 +217,70 @@ def ocr_frame_with_google_vision(frame_np):
             return ""
     
     except Exception as e:
-        print(f"Google Vision API frame error: {e}")
+        print(f"Google Vision API frame error: {e}", file=sys.stderr)
+        _handle_google_vision_error()
         return None
 
-def enhance_image_for_ocr(image_np):
-    """OCR精度向上のためのシンプルな画像前処理"""
-    # グレースケール化
-    if len(image_np.shape) == 3:
-        gray = cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image_np.copy()
+def enhance_image_for_ocr(image_np, image_class='default'):
+    """
+    OCR精度向上のための画像前処理（設定ファイルで選択したプリセットを適用）
     
-    # 大津の二値化（元の方法を使用）
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    Args:
+        image_np (numpy.ndarray): 入力画像
+        image_class (str): 画像の種類（'default', 'camera' など）またはプリセット名
     
-    return binary
+    Returns:
+        numpy.ndarray: 前処理済み画像
+    """
+    return preprocess_image(image_np, image_class)
 
 def ocr_image(image_path):
     """画像ファイルから文字を読み取り、テキストを返す"""
     try:
-        # まずGoogle Vision APIを試行
-        if GOOGLE_VISION_AVAILABLE:
+        # PDF・複数フレームのTIFFはページごとの結果を連結
+        if is_multipage_document(image_path):
+            return '\n\n'.join(record['text'] or '' for record in iter_ocr_document(image_path))
+
+        # 大きなスキャン画像は全体をデコードせずにタイル分割で処理する
+        large = is_large_image(image_path)
+
+        # ファイルのバイト列からキャッシュキーを作成（Vision利用時はVisionの結果のみ再利用）
+        cache = get_ocr_cache()
+        if GOOGLE_VISION_AVAILABLE and not large:
+            vision_key = make_file_cache_key(image_path, engine='google_vision', lang='jpn')
+            cached_text = cache.get(vision_key)
+            if cached_text is not None:
+                print("[OK] キャッシュ済みの結果を使用")
+                return cached_text
+
+            # まずGoogle Vision APIを試行
             google_result = ocr_with_google_vision(image_path)
             if google_result is not None:
                 print("[OK] Google Vision API を使用")
+                cache.put(vision_key, google_result)
                 return google_result
-        
+
+        tesseract_key = make_file_cache_key(image_path, engine='tesseract', lang='jpn',
+                                            preprocess=preset_signature('document' if large else 'default'),
+                                            tiled=large)
+        cached_text = cache.get(tesseract_key)
+        if cached_text is not None:
+            print("[OK] キャッシュ済みの結果を使用")
+            return cached_text
+
+        if large:
+            # 大きなスキャン画像はタイルに分割して並列に処理
+            print("[OK] Tesseract（タイル分割）を使用")
+            text = ocr_image_tiled(image_path)['text']
+            cache.put(tesseract_key, text)
+            return text
+
         print("[OK] Tesseract を使用")
         # Google Vision APIが使えない場合はTesseractを使用
-        img = Image.open(image_path)
-        cv_img = np.array(img)
+        cv_img = np.array(Image.open(image_path))
         processed_img_np = enhance_image_for_ocr(cv_img)
-        processed_img = Image.fromarray(processed_img_np)
-        text = pytesseract.image_to_string(processed_img, lang='jpn')
+        text = recognize_text(processed_img_np, lang='jpn')
+        cache.put(tesseract_key, text)
         return text
 
     except FileNotFoundError:
@@ -131,40 +290,493 @@ def ocr_image(image_path):
         print(f"OCR処理中にエラーが発生しました: {e}", file=sys.stderr)
         return ""
 
-def ocr_frame(frame_np):
-    """OpenCVのフレーム（NumPy配列）から文字を読み取り、テキストを返す"""
+def _vision_frame_key(frame_np, use_text_regions):
+    """フレームのGoogle Vision APIの結果のキャッシュキー"""
+    return make_cache_key(frame_np, engine='google_vision', lang='jpn',
+                          upload=VISION_UPLOAD_SETTINGS, regions=use_text_regions)
+
+def _tesseract_frame_key(frame_np, use_text_regions):
+    """フレームのTesseract（'camera'の前処理）の結果のキャッシュキー"""
+    return make_cache_key(frame_np, engine='tesseract', lang='jpn',
+                          preprocess=preset_signature('camera'), regions=use_text_regions)
+
+def frame_tiers(frame_np, use_text_regions=USE_TEXT_REGIONS, fused=False):
+    """
+    ocr_frameの締め切り付き処理のティアを作る
+    文字領域の検出は最初に必要になったティアで1回だけ行い、各ティアで共有する
+    （fast: 文字行ごとのTesseract、improved・vision: 文字領域を含む範囲だけを処理）
+    
+    Returns:
+        tuple: (ティア名 -> func(image_np, deadline) の辞書, ティア名 -> キャッシュキーの辞書)
+               fastティアの関数のiter_lines(deadline)は認識できた行から順に返すジェネレーター
+    """
+    regions = {}
+    regions_lock = threading.Lock()
+    
+    def get_boxes():
+        with regions_lock:
+            if 'boxes' not in regions:
+                regions['boxes'] = detect_text_regions(frame_np) if use_text_regions else []
+                if regions['boxes']:
+                    print(f"文字領域: {len(regions['boxes'])}行")
+            return regions['boxes']
+    
+    def text_crop():
+        boxes = get_boxes()
+        if not boxes:
+            return frame_np
+        x, y, w, h = union_box(boxes)
+        return frame_np[y:y + h, x:x + w]
+    
+    def iter_fast(deadline=None):
+        # 文字行ごとに認識できた順に返す（文字領域が無ければフレーム全体を一括で認識）
+        boxes = get_boxes()
+        if not boxes:
+            for line in fast_tier(frame_np, deadline)['text'].splitlines():
+                yield line
+            return
+        for _, line in iter_recognize_regions(frame_np, boxes, lang='jpn', deadline=deadline,
+                                              preprocess=lambda crop: enhance_image_for_ocr(crop, 'camera')):
+            if line:
+                yield line
+    
+    def fast(image_np, deadline=None):
+        text = '\n'.join(iter_fast(deadline))
+        # 締め切りを過ぎた後に始まる行は読まないため、締め切りを過ぎていれば途中結果とみなす
+        return {'text': text, 'confidence': None,
+                'partial': deadline is not None and time.perf_counter() >= deadline}
+    fast.history_key = 'fast_regions' if use_text_regions else 'fast'
+    # iter_ocr_frameで1行ずつ表示するために使う
+    fast.iter_lines = iter_fast
+    
+    improved_func = burst_improved_tier if fused else improved_tier
+    def improved(image_np, deadline=None):
+        return improved_func(text_crop(), deadline)
+    improved.history_key = getattr(improved_func, 'history_key', 'improved')
+    
+    def vision(image_np, deadline=None):
+        timeout = None if deadline is None else max(0.05, deadline - time.perf_counter())
+        return {'text': ocr_frame_with_google_vision(text_crop(), timeout=timeout), 'confidence': None}
+    
+    tiers = {'fast': fast, 'improved': improved}
+    cache_keys = {
+        'fast': _tesseract_frame_key(frame_np, use_text_regions),
+        'improved': improved_cache_key(frame_np, fused=fused, regions=use_text_regions),
+    }
+    if GOOGLE_VISION_AVAILABLE and get_google_vision_client():
+        tiers['vision'] = vision
+        cache_keys['vision'] = _vision_frame_key(frame_np, use_text_regions)
+    return tiers, cache_keys
+
+def ocr_frame_with_deadline(frame_np, deadline_ms, fused=False, use_text_regions=USE_TEXT_REGIONS):
+    """
+    処理時間の上限内で最も高精度なティアを選んでOCRする
+    ティアごとの結果はOCRキャッシュに保存され、同じフレームでは再利用される
+    fusedがTrueの場合はマルチフレーム合成済みとして、ocr_improvedの探索でノイズ除去を省く
+
+    Returns:
+        dict: text, confidence, tier, partial, elapsed_ms, cached
+    """
+    tiers, cache_keys = frame_tiers(frame_np, use_text_regions, fused)
+    result = ocr_with_deadline(frame_np, deadline_ms, tiers, cache_keys=cache_keys)
+    _print_tier_result(result, deadline_ms)
+    return result
+
+def _print_tier_result(result, deadline_ms):
+    """ocr_with_deadlineで使ったティアを表示"""
+    print(f"[OK] {result['tier']} ティアを使用（{result['elapsed_ms']:.0f}ms / 上限{deadline_ms}ms"
+          f"{'、キャッシュ' if result['cached'] else ''}{'、打ち切り' if result['partial'] else ''}）")
+
+def ocr_frame(frame_np, use_text_regions=USE_TEXT_REGIONS, deadline_ms=None, fused=False):
+    """
+    OpenCVのフレーム（NumPy配列）から文字を読み取り、テキストを返す
+    use_text_regionsがTrueの場合は文字行の領域だけを切り出して認識する
+    deadline_msを指定した場合は処理時間の履歴から間に合うティアを選ぶ
+    （ティアごとにキャッシュのキーを分け、文字領域の切り出しも同じように行う）
+    fusedはマルチフレーム合成済みのフレームか（deadline_msを指定した場合のみ使う）
+    """
     try:
-        # まずGoogle Vision APIを試行
+        if deadline_ms is not None:
+            return ocr_frame_with_deadline(frame_np, deadline_ms, fused=fused,
+                                           use_text_regions=use_text_regions)['text']
+
+        cache = get_ocr_cache()
+        boxes = None
         if GOOGLE_VISION_AVAILABLE:
-            google_result = ocr_frame_with_google_vision(frame_np)
+            vision_key = _vision_frame_key(frame_np, use_text_regions)
+            cached_text = cache.get(vision_key)
+            if cached_text is not None:
+                print("[OK] キャッシュ済みの結果を使用")
+                return cached_text
+
+            # 文字領域を含む範囲だけを送信（検出できなければフレーム全体）
+            vision_input = frame_np
+            if use_text_regions:
+                boxes = detect_text_regions(frame_np)
+                if boxes:
+                    x, y, w, h = union_box(boxes)
+                    vision_input = frame_np[y:y + h, x:x + w]
+
+            # まずGoogle Vision APIを試行
+            google_result = ocr_frame_with_google_vision(vision_input)
             if google_result is not None:
                 print("[OK] Google Vision API を使用")
+                cache.put(vision_key, google_result)
                 return google_result
         
+        tesseract_key = _tesseract_frame_key(frame_np, use_text_regions)
+        cached_text = cache.get(tesseract_key)
+        if cached_text is not None:
+            print("[OK] キャッシュ済みの結果を使用")
+            return cached_text
+
         print("[OK] Tesseract を使用")
         # Google Vision APIが使えない場合はTesseractを使用
-        processed_frame = enhance_image_for_ocr(frame_np)
-        pil_img = Image.fromarray(processed_frame)
-        text = pytesseract.image_to_string(pil_img, lang='jpn')
+        if use_text_regions and boxes is None:
+            boxes = detect_text_regions(frame_np)
+        if use_text_regions and boxes:
+            print(f"文字領域: {len(boxes)}行")
+            text = recognize_regions(frame_np, boxes, lang='jpn',
+                                     preprocess=lambda crop: enhance_image_for_ocr(crop, 'camera'))
+        else:
+            processed_frame = enhance_image_for_ocr(frame_np, 'camera')
+            text = recognize_text(processed_frame, lang='jpn')
+        cache.put(tesseract_key, text)
         return text
 
     except Exception as e:
         print(f"OCRフレーム処理中にエラーが発生しました: {e}", file=sys.stderr)
         return ""
 
-def capture_and_ocr_from_camera():
-    """カメラを起動し、キャプチャした画像から文字を読み取る"""
-    cap = cv2.VideoCapture(0)
+def iter_ocr_frame(frame_np, deadline_ms=None, fused=False, use_text_regions=USE_TEXT_REGIONS):
+    """
+    ストリーミング版のocr_frame: 認識できた行から順に返す
+    fastティア（Tesseract）では文字行ごとに認識するので、最初の行はページ全体の完了を待たずに返る
+    deadline_msを指定した場合はocr_frameと同じく処理時間の履歴からティアを選び、
+    fast以外のティア（ocr_improvedの探索・Google Vision API）は一括で結果が返るため、まとめて返す
+    どのティアの結果もocr_frameと同じキーでキャッシュされる
+    
+    Args:
+        frame_np (numpy.ndarray): OpenCVのフレーム
+        deadline_ms (float): 処理時間の上限（ミリ秒）。Noneの場合はVisionが使えればVision、無ければfastティア
+        fused (bool): マルチフレーム合成済みのフレームか
+        use_text_regions (bool): 文字行の領域だけを切り出して認識するか
+    
+    Yields:
+        str: 認識した1行
+    """
+    if deadline_ms is None and GOOGLE_VISION_AVAILABLE and get_google_vision_client():
+        for line in ocr_frame(frame_np, use_text_regions=use_text_regions).splitlines():
+            yield line
+        return
+    
+    tiers, cache_keys = frame_tiers(frame_np, use_text_regions, fused)
+    history = get_latency_history()
+    chosen = 'fast' if deadline_ms is None else choose_tier(tiers, deadline_ms, history)
+    
+    cached_tier, cached_text = cached_tier_result(tiers, cache_keys, min_tier=chosen)
+    if cached_tier is not None:
+        print(f"[OK] キャッシュ済みの結果を使用（{cached_tier} ティア）")
+        for line in cached_text.splitlines():
+            yield line
+        return
+    
+    if chosen != 'fast':
+        result = ocr_with_deadline(frame_np, deadline_ms, tiers, history, cache_keys)
+        _print_tier_result(result, deadline_ms)
+        for line in result['text'].splitlines():
+            yield line
+        return
+    
+    # fastティアは1行ずつ返す（処理時間の記録・キャッシュへの保存は最後まで読んだ場合のみ）
+    if deadline_ms is not None:
+        probe_tiers(frame_np, tiers, chosen, deadline_ms, history, cache_keys)
+    start = time.perf_counter()
+    deadline = None if deadline_ms is None else start + deadline_ms / 1000.0
+    print("[OK] Tesseract を使用（逐次表示）")
+    lines = []
+    for line in tiers['fast'].iter_lines(deadline):
+        lines.append(line)
+        yield line
+    history.record(tiers['fast'].history_key, (time.perf_counter() - start) * 1000)
+    if lines and (deadline is None or time.perf_counter() < deadline):
+        get_ocr_cache().put(cache_keys['fast'], '\n'.join(lines))
+
+def _read_for_vision(path, max_bytes):
+    """
+    画像ファイルを読み込む（max_bytesを超える場合はアップロード用に縮小・圧縮し直す）
+    
+    Returns:
+        bytes: 画像バイト
+    """
+    with open(path, 'rb') as image_file:
+        content = image_file.read()
+    if len(content) <= max_bytes:
+        return content
+    image_np = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image_np is None:
+        raise ValueError(f"画像が大きすぎます（{len(content)}バイト）。デコードできないため縮小できません")
+    encoded, _ = encode_for_upload(image_np, **VISION_UPLOAD_SETTINGS)
+    if len(encoded) > max_bytes:
+        raise ValueError(f"縮小しても画像が大きすぎます（{len(encoded)}バイト）")
+    return encoded
+
+def group_vision_batches(tasks, max_images=VISION_BATCH_MAX_IMAGES, max_bytes=VISION_BATCH_MAX_BYTES):
+    """
+    画像をAPIの制限内に収まるバッチに分割する（ファイルは必要になった時点で読み込む）
+    文書のページはその時点で1ページだけラスタライズしてアップロード用に圧縮する
+    1枚でmax_bytesを超える画像は縮小・圧縮し直し、それでも超える場合は送信せずに読み込みエラーとする
+    
+    Args:
+        tasks (iterable): (パス, ページ番号 or None) のタプル
+    
+    Yields:
+        list: (通し番号, パス, ページ番号, 画像バイト or None, 読み込みエラー) のリスト
+    """
+    batch = []
+    batch_bytes = 0
+    for index, (path, page) in enumerate(tasks):
+        try:
+            if page is None:
+                content = _read_for_vision(path, max_bytes)
+            else:
+                content, _ = encode_for_upload(load_page(path, page), **VISION_UPLOAD_SETTINGS)
+                if len(content) > max_bytes:
+                    raise ValueError(f"縮小しても画像が大きすぎます（{len(content)}バイト）")
+            error = None
+        except Exception as e:
+            content, error = None, str(e)
+        
+        size = len(content) if content else 0
+        if batch and (len(batch) >= max_images or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append((index, path, page, content, error))
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def _build_vision_request(content):
+    """テキスト検出用のAnnotateImageRequestを作成"""
+    if GOOGLE_VISION_AVAILABLE:
+        return vision.AnnotateImageRequest(
+            image=vision.Image(content=content),
+            features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+        )
+    return {'image': {'content': content}, 'features': [{'type': 'TEXT_DETECTION'}]}
+
+def _annotate_vision_batch(client, batch, max_retries=3, backoff=1.0):
+    """
+    1バッチ分をbatch_annotate_imagesで処理する
+    一時的なエラー（TRANSIENT_VISION_ERRORS）のみ指数バックオフで再試行し、それ以外は即座に失敗とする
+    
+    Returns:
+        list: 入力と同じ順序のJSONLレコード
+    """
+    start = time.perf_counter()
+    records = []
+    for _, path, page, _, error in batch:
+        record = {'path': path, 'text': None, 'error': error}
+        if page is not None:
+            record['page'] = page
+        records.append(record)
+    targets = [i for i, (_, _, _, content, error) in enumerate(batch) if error is None]
+    
+    attempts = 0
+    while targets:
+        attempts += 1
+        try:
+            requests = [_build_vision_request(batch[i][3]) for i in targets]
+            response = client.batch_annotate_images(requests=requests)
+            for i, image_response in zip(targets, response.responses):
+                if image_response.error.message:
+                    records[i]['error'] = image_response.error.message
+                elif image_response.text_annotations:
+                    records[i]['text'] = image_response.text_annotations[0].description
+                else:
+                    records[i]['text'] = ""
+            break
+        except TRANSIENT_VISION_ERRORS as e:
+            if attempts > max_retries:
+                for i in targets:
+                    records[i]['error'] = str(e)
+                break
+            time.sleep(backoff * (2 ** (attempts - 1)))
+        except Exception as e:
+            # 認証・権限・不正なリクエストなどは再試行しない
+            for i in targets:
+                records[i]['error'] = str(e)
+            break
+    
+    elapsed = time.perf_counter() - start
+    for record in records:
+        record['batch_size'] = len(batch)
+        record['attempts'] = attempts
+        record['elapsed'] = round(elapsed, 4)
+    return records
+
+def iter_batch_ocr_with_google_vision(inputs, client=None, max_in_flight=4, max_retries=3, backoff=1.0,
+                                      skip_paths=None):
+    """
+    フォルダ・ファイル一覧をバッチでGoogle Vision APIに送り、入力順に結果を返す
+    同時に送信するリクエストはmax_in_flight個まで
+    PDF・複数フレームのTIFFはページ単位で送信し、レコードにpageを付ける
+    
+    Args:
+        inputs (list): ディレクトリまたはファイルのパス
+        client: Visionクライアント（Noneの場合は共通クライアント）
+        max_in_flight (int): 同時リクエスト数の上限
+        max_retries (int): 一時的エラーの再試行回数
+        backoff (float): 再試行の初回待ち時間（秒）
+        skip_paths (set): 処理済みとしてスキップするパス（ページは task_key() の形式）
+    
+    Yields:
+        dict: path, (page), text, error, batch_size, attempts, elapsed
+    """
+    client = client or get_google_vision_client()
+    if not client:
+        raise RuntimeError("Google Vision APIが利用できません")
+    
+    skip_paths = skip_paths or set()
+    tasks = ((path, page) for path, page in iter_page_tasks(collect_image_paths(inputs))
+             if task_key(path, page) not in skip_paths)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch in group_vision_batches(tasks):
+            if len(pending) >= max_in_flight:
+                for record in pending.popleft().result():
+                    yield record
+            pending.append(executor.submit(_annotate_vision_batch, client, batch, max_retries, backoff))
+        while pending:
+            for record in pending.popleft().result():
+                yield record
+
+def ocr_batch_with_google_vision(inputs, output_path=None, resume=True, **kwargs):
+    """
+    バッチOCRの結果をJSONLとして出力する（output_pathがNoneなら標準出力）
+    resumeがTrueの場合は出力済みの画像をスキップして追記する
+    
+    Returns:
+        int: 処理した画像数
+    """
+    count = 0
+    skip_paths = load_done_paths(output_path) if resume else set()
+    output = open_jsonl_output(output_path)
+    try:
+        for record in iter_batch_ocr_with_google_vision(inputs, skip_paths=skip_paths, **kwargs):
+            write_jsonl_record(output, record)
+            count += 1
+    finally:
+        if output_path:
+            output.close()
+    return count
+
+def ocr_image_record(image_path):
+    """
+    バッチ処理用に、テキスト・平均信頼度・処理時間をまとめて返す
+    （Google Vision APIの結果には信頼度が無いためNone）
+    """
+    if GOOGLE_VISION_AVAILABLE:
+        start = time.perf_counter()
+        google_result = ocr_with_google_vision(image_path)
+        if google_result is not None:
+            return {
+                'text': google_result,
+                'confidence': None,
+                'engine': 'google_vision',
+                'timings': {'ocr_ms': round((time.perf_counter() - start) * 1000, 1)}
+            }
+    
+    timings = {}
+    start = time.perf_counter()
+    cv_img = np.array(Image.open(image_path))
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return _tesseract_array_record(cv_img, timings)
+
+def ocr_array_record(image_np, timings=None):
+    """
+    デコード済みの画像（文書のページなど）をOCRし、結果をまとめて返す
+    Google Vision APIが使えればアップロード用に圧縮して送信し、失敗時はTesseractを使用
+    """
+    if GOOGLE_VISION_AVAILABLE:
+        start = time.perf_counter()
+        google_result = ocr_frame_with_google_vision(image_np)
+        if google_result is not None:
+            timings = dict(timings or {})
+            timings['ocr_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            return {
+                'text': google_result,
+                'confidence': None,
+                'engine': 'google_vision',
+                'timings': timings
+            }
+    return _tesseract_array_record(image_np, timings)
+
+def ocr_page_record(document_path, page):
+    """PDF・TIFFの1ページだけをラスタライズしてOCRする（バッチ処理用）"""
+    timings = {}
+    start = time.perf_counter()
+    page_img = load_page(document_path, page)
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    record = ocr_array_record(page_img, timings)
+    record['page'] = page
+    return record
+
+def iter_ocr_document(document_path, max_workers=2):
+    """
+    PDF・TIFFを1ページずつラスタライズしながらOCRし、ページ順に結果を返す
+    
+    Yields:
+        dict: text, confidence, engine, page, timings
+    """
+    for page, record in iter_document_ocr(document_path, ocr_array_record, max_workers=max_workers):
+        record['page'] = page
+        yield record
+
+def _tesseract_array_record(image_np, timings=None):
+    """Tesseractでデコード済みの画像をOCRし、信頼度・処理時間とともに返す"""
+    timings = dict(timings or {})
+    start = time.perf_counter()
+    pipeline = get_pipeline('default')
+    outputs, stage_timings = pipeline.run(image_np)
+    processed_img_np = outputs[pipeline.outputs[0]]
+    timings['preprocess_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    timings['preprocess_stages'] = {name: round(ms, 1) for name, ms in stage_timings.items()}
+    
+    start = time.perf_counter()
+    data = recognize_data(processed_img_np, lang='jpn')
+    timings['ocr_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    
+    return {
+        'text': text_from_data(data),
+        'confidence': round(mean_confidence(data), 1),
+        'engine': 'tesseract',
+        'timings': timings
+    }
+
+def capture_and_ocr_from_camera(burst_mode=False):
+    """
+    カメラを起動し、キャプチャした画像から文字を読み取る
+
+    Args:
+        burst_mode (bool): 連写したフレームを位置合わせ・合成してノイズを減らす（暗い場所向け）
+    """
+    # 別スレッドで最新フレームを保持するカメラ（OCR後に古いフレームを読まない）
+    cap = ThreadedCamera(0)
     if not cap.isOpened():
         print("エラー: カメラを開けません。")
         return
+    print(cap.describe())
 
     print("カメラを起動しました。")
     print("SPACEキーを押すとOCRを実行します。")
     print("'q'キーを押すと終了します。")
+    if burst_mode:
+        print("マルチフレーム合成: 連写した画像を合成してからOCRを実行します。")
     
-    # Google Vision APIの状態を表示
-    if GOOGLE_VISION_AVAILABLE and setup_google_vision():
+    # Google Vision APIを事前接続して状態を表示
+    if GOOGLE_VISION_AVAILABLE and warm_up_google_vision():
         print("[OK] Google Vision API 利用可能（高精度モード）")
     else:
         print("[OK] Tesseract モード（標準精度）")
@@ -186,17 +798,26 @@ def capture_and_ocr_from_camera():
             cv2.setWindowTitle('Camera', 'Camera - Processing...')
             print("\n手動キャプチャ: 画像を処理します...")
 
-            # --- 画像のリサイズ処理 ---
-            h, w, _ = frame.shape
-            resize_w = 1280
-            resize_h = int(h * (resize_w / w))
-            resized_frame = cv2.resize(frame, (resize_w, resize_h))
-            print(f"画像をリサイズしました: ({w}x{h}) -> ({resize_w}x{resize_h})")
+            # プレビューは低解像度なので、OCR用に高解像度の静止画を撮る
+            # （マルチフレーム合成では連写して合成し、ノイズ除去の代わりにする）
+            if burst_mode:
+                still, _ = capture_fused(cap)
+            else:
+                _, still = cap.capture_still()
+            fused = burst_mode and still is not None
+            still = still if still is not None else frame
+
+            # --- 文字の高さに合わせたリサイズ処理 ---
+            h, w, _ = still.shape
+            resized_frame, scale, text_height = normalize_text_height(still)
+            resize_h, resize_w = resized_frame.shape[:2]
+            print(f"画像をリサイズしました: ({w}x{h}) -> ({resize_w}x{resize_h})"
+                  f" 文字高さ推定: {text_height or 0:.0f}px 倍率: {scale:.2f}")
             # --------------------------
 
             # OCRを実行
             print("OCRを実行中...")
-            extracted_text = ocr_frame(resized_frame)
+            extracted_text = ocr_frame(resized_frame, deadline_ms=camera_deadline_ms(fused), fused=fused)
             print("OCR処理が完了しました。")
 
             print("--- 読み取り結果 ---")
@@ -214,22 +835,45 @@ def capture_and_ocr_from_camera():
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    # 起動時にGoogle Vision APIの状態を確認
-    print("=== OCR アプリ (Google Vision API対応版) ===")
+    # 起動時にGoogle Vision APIの状態を確認（標準出力を汚さないよう標準エラーに表示）
+    print("=== OCR アプリ (Google Vision API対応版) ===", file=sys.stderr)
     if GOOGLE_VISION_AVAILABLE:
         if os.path.exists(GOOGLE_KEY_PATH):
-            print("[OK] Google Vision API設定ファイル検出")
+            print("[OK] Google Vision API設定ファイル検出", file=sys.stderr)
         else:
-            print("[WARNING] Google Vision APIキーファイルが見つかりません")
-            print(f"  {GOOGLE_KEY_PATH} を配置してください")
+            print("[WARNING] Google Vision APIキーファイルが見つかりません", file=sys.stderr)
+            print(f"  {GOOGLE_KEY_PATH} を配置してください", file=sys.stderr)
     else:
-        print("[WARNING] Google Vision APIライブラリが見つかりません")
-        print("  setup_google_vision.bat を実行してください")
-    print("=" * 45)
+        print("[WARNING] Google Vision APIライブラリが見つかりません", file=sys.stderr)
+        print("  setup_google_vision.bat を実行してください", file=sys.stderr)
+    print("=" * 45, file=sys.stderr)
     
     # 引数に応じて処理を分岐
     if len(sys.argv) > 1 and sys.argv[1] == "camera":
-        capture_and_ocr_from_camera()
+        capture_and_ocr_from_camera(burst_mode="burst" in sys.argv[2:])
+    elif len(sys.argv) > 2 and sys.argv[1] == "batch":
+        # python ocr_app_vision.py batch <フォルダ/ファイル...> [--output 出力.jsonl] [--workers N] [--fake]
+        args = sys.argv[2:]
+        client = None
+        if "--fake" in args:
+            from fake_vision_client import FakeImageAnnotatorClient
+            args.remove("--fake")
+            client = FakeImageAnnotatorClient()
+        inputs, options = parse_batch_args(args)
+        if client or get_google_vision_client():
+            # Vision APIが使える場合はバッチリクエストでまとめて送信
+            start = time.perf_counter()
+            count = ocr_batch_with_google_vision(inputs, output_path=options['output_path'],
+                                                 resume=options['resume'], client=client)
+            print(f"{count}枚を処理しました（{time.perf_counter() - start:.1f}秒）", file=sys.stderr)
+        else:
+            summary = run_batch_ocr(inputs, module_name='ocr_app_vision', **options)
+            print_batch_summary(summary)
+    elif len(sys.argv) > 1 and is_multipage_document(sys.argv[1]):
+        # ページごとに読み取り次第表示（後続の要約などを待たせない）
+        for record in iter_ocr_document(sys.argv[1]):
+            print(f"--- ページ {record['page']} ---")
+            print(record['text'] or '', flush=True)
     elif len(sys.argv) > 1:
         input_path = sys.argv[1]
         extracted_text = ocr_image(input_path)
@@ -237,5 +881,7 @@ if __name__ == "__main__":
     else:
         print("使用法:")
         print("  画像ファイルから読み取る場合: python ocr_app_vision.py <画像ファイルのパス>")
-        print("  カメラから読み取る場合:      python ocr_app_vision.py camera")
+        print("  PDF・TIFFから読み取る場合:   python ocr_app_vision.py <文書ファイルのパス>")
+        print("  カメラから読み取る場合:      python ocr_app_vision.py camera [burst]")
+        print("  フォルダを一括処理する場合:  python ocr_app_vision.py batch <フォルダ> [--output 出力.jsonl]")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+フォルダ一括OCRヘルパー
+プロセスプールで画像をOCRし、1画像1行のJSONLに書き出す（中断後は未処理分から再開）
+"""
+import os
+import sys
+import json
+import time
+import importlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from document_input_helper import PDF_EXTENSIONS, iter_page_tasks, task_key
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+# フォルダから収集する拡張子（PDFはページ単位で処理する）
+INPUT_EXTENSIONS = IMAGE_EXTENSIONS + PDF_EXTENSIONS
+
+
+def collect_image_paths(inputs):
+    """
+    ディレクトリ・ファイルの指定から画像・PDFファイルの一覧を作成する
+
+    Args:
+        inputs (list): ディレクトリまたはファイルのパス
+
+    Returns:
+        list: ファイルのパス（ディレクトリ内は名前順）
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_EXTENSIONS):
+                        paths.append(os.path.join(root, name))
+        else:
+            paths.append(item)
+    return paths
+
+
+def load_done_paths(output_path):
+    """
+    既存のJSONLから処理済み（エラーなし）の画像パスを読み込む
+    中断時に途中まで書かれた最終行は無視する
+    複数ページ文書のページは task_key() の形式（パス#ページ番号）で登録する
+    """
+    done = set()
+    if not output_path or not os.path.exists(output_path):
+        return done
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('path') and not record.get('error'):
+                done.add(task_key(record['path'], record.get('page')))
+    return done
+
+
+def open_jsonl_output(output_path):
+    """追記モードでJSONL出力を開く（Noneなら標準出力）"""
+    if not output_path:
+        return sys.stdout
+    output = open(output_path, 'a', encoding='utf-8')
+    # 中断で最終行が改行なしで終わっている場合に備える
+    if output.tell() > 0:
+        with open(output_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                output.write('\n')
+    return output
+
+
+def write_jsonl_record(output, record):
+    """1レコードを書き込んで即座にフラッシュ"""
+    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    output.flush()
+
+
+def _ocr_worker(module_name, path, page=None):
+    """
+    ワーカープロセスでmodule.ocr_image_recordを実行
+    文書のページはmodule.ocr_page_recordで1ページだけラスタライズして処理する
+    """
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        if page is None:
+            record = module.ocr_image_record(path)
+        else:
+            record = module.ocr_page_record(path, page)
+        record['error'] = record.get('error')
+    except Exception as e:
+        record = {'text': None, 'confidence': None, 'engine': None, 'error': str(e)}
+    record['path'] = path
+    if page is not None:
+        record['page'] = page
+    record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+def run_batch_ocr(inputs, output_path=None, module_name='ocr_app', workers=None, resume=True):
+    """
+    フォルダ内の画像をプロセスプールで並列にOCRする
+    PDF・複数フレームのTIFFはページ単位のタスクに分け、各ワーカーが1ページずつラスタライズする
+
+    Args:
+        inputs (list): ディレクトリまたはファイルのパス
+        output_path (str): JSONLの出力先（Noneなら標準出力）
+        module_name (str): ocr_image_recordを持つモジュール名
+        workers (int): プロセス数（Noneの場合はCPU数）
+        resume (bool): 出力済みの画像をスキップするか
+
+    Returns:
+        dict: total, skipped, processed, errors, elapsed
+    """
+    start = time.perf_counter()
+    paths = collect_image_paths(inputs)
+    done = load_done_paths(output_path) if resume else set()
+    workers = workers or os.cpu_count() or 1
+
+    summary = {'total': 0, 'skipped': 0, 'processed': 0, 'errors': 0, 'elapsed': 0.0}
+
+    def iter_todo():
+        # ページ数は必要になった時点で調べる（先に全文書を開かない）
+        for path, page in iter_page_tasks(paths):
+            summary['total'] += 1
+            if task_key(path, page) in done:
+                summary['skipped'] += 1
+                continue
+            yield path, page
+
+    output = open_jsonl_output(output_path)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            remaining = iter_todo()
+            # 投入済みのタスクはプロセス数の2倍までに抑える
+            for path, page in remaining:
+                pending.add(executor.submit(_ocr_worker, module_name, path, page))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    write_jsonl_record(output, record)
+                    summary['processed'] += 1
+                    if record['error']:
+                        summary['errors'] += 1
+                    next_task = next(remaining, None)
+                    if next_task is not None:
+                        pending.add(executor.submit(_ocr_worker, module_name, *next_task))
+    finally:
+        if output_path:
+            output.close()
+
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+
+def parse_batch_args(args):
+    """
+    'batch'サブコマンドの引数を解析する
+    <フォルダ/ファイル...> [--output 出力.jsonl] [--workers N] [--no-resume]
+
+    Returns:
+        tuple: (入力の一覧, オプションの辞書)
+    """
+    args = list(args)
+    options = {'output_path': None, 'workers': None, 'resume': True}
+    inputs = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--output' and i + 1 < len(args):
+            options['output_path'] = args[i + 1]
+            i += 2
+        elif args[i] == '--workers' and i + 1 < len(args):
+            options['workers'] = int(args[i + 1])
+            i += 2
+        elif args[i] == '--no-resume':
+            options['resume'] = False
+            i += 1
+        else:
+            inputs.append(args[i])
+            i += 1
+    return inputs, options
+
+
+def print_batch_summary(summary):
+    """処理結果の概要を標準エラーに表示"""
+    print(f"対象 {summary['total']}枚 / スキップ {summary['skipped']}枚 / "
+          f"処理 {summary['processed']}枚 / エラー {summary['errors']}枚 "
+          f"（{summary['elapsed']:.1f}秒）", file=sys.stderr)
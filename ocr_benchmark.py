@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+OCRベンチマーク
+create_test_image.py で作成したコーパスに対して、エンジン×前処理の組み合わせごとに
+レイテンシ（パーセンタイル）・スループット・ピークメモリ・文字誤り率（CER）を計測する
+
+  python ocr_benchmark.py <コーパスフォルダ> [--combos a,b,...] [--limit N] [--workers N]
+                          [--output 結果.json] [--baseline 前回の結果.json]
+
+各組み合わせは別プロセスで実行するので、ピークメモリが他の組み合わせの影響を受けない
+Google Vision APIは疑似クライアント（fake_vision_client）で計測する
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    # Windowsではresourceモジュールが無いためpsutilを使う
+    RESOURCE_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+# 計測する組み合わせ（名前 -> 説明）
+BENCHMARK_COMBOS = {
+    'ocr_app:simple': 'ocr_app 既定（大津の二値化）+ Tesseract',
+    'ocr_app:light': '軽量前処理 + Tesseract',
+    'ocr_app:advanced': '高精度前処理（NL-means）+ Tesseract',
+    'ocr_app:advanced_fast': '高精度前処理（NL-meansなし）+ Tesseract',
+    'ocr_app:normalized': '文字高さ正規化 + Tesseract',
+    'ocr_improved:search': 'ocr_improved 全組み合わせ探索',
+    'ocr_improved:cascade': 'ocr_improved カスケード探索',
+    'ocr_improved:adaptive': 'ocr_improved 学習した組み合わせの予測',
+    'ocr_app_vision:fake': 'ocr_app_vision バッチ（疑似Vision API）',
+}
+
+
+def load_corpus(corpus_dir, limit=None):
+    """
+    manifest.jsonl からコーパスを読み込む
+
+    Returns:
+        list: image（絶対パス）, text を持つ辞書のリスト
+    """
+    items = []
+    with open(os.path.join(corpus_dir, "manifest.jsonl"), 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            record['image'] = os.path.join(corpus_dir, record['image'])
+            items.append(record)
+            if limit and len(items) >= limit:
+                break
+    return items
+
+
+def edit_distance(a, b):
+    """レーベンシュタイン距離（文字単位）"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(recognized, ground_truth):
+    """
+    文字誤り率（空白・改行は除いて比較。Tesseractは日本語の文字間に空白を入れるため）
+    """
+    recognized = ''.join((recognized or '').split())
+    ground_truth = ''.join(ground_truth.split())
+    if not ground_truth:
+        return 0.0 if not recognized else 1.0
+    return edit_distance(recognized, ground_truth) / len(ground_truth)
+
+
+def percentile(values, p):
+    """パーセンタイル（線形補間）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def peak_rss_mb():
+    """このプロセスのピークメモリ使用量（MB）"""
+    if RESOURCE_AVAILABLE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOSはバイト、Linuxはキロバイト単位
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if PSUTIL_AVAILABLE:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    return None
+
+
+def _make_recognizer(combo):
+    """組み合わせ名から、画像パスを受け取りテキストを返す関数を作る"""
+    import numpy as np
+    from PIL import Image
+
+    module_name, variant = combo.split(':', 1)
+    if module_name == 'ocr_app':
+        from preprocess_helper import get_pipeline
+        from tesseract_helper import recognize_text
+        pipeline = get_pipeline(variant)
+
+        def recognize(path):
+            outputs, _ = pipeline.run(np.array(Image.open(path)))
+            return recognize_text(outputs[pipeline.outputs[0]], lang='jpn')
+        return recognize
+
+    if module_name == 'ocr_improved':
+        import ocr_improved
+        search = {'search': ocr_improved.search_best_config,
+                  'cascade': ocr_improved.cascade_search,
+                  'adaptive': ocr_improved.adaptive_search}[variant]
+
+        def recognize(path):
+            return search(np.array(Image.open(path)))['text']
+        return recognize
+
+    raise ValueError(f"未知の組み合わせです: {combo}")
+
+
+def _run_vision_fake(items, workers):
+    """疑似Visionクライアントでバッチ経路を計測（正解テキストを返すよう設定）"""
+    from fake_vision_client import FakeImageAnnotatorClient
+    from ocr_app_vision import iter_batch_ocr_with_google_vision
+
+    answers = {}
+    for item in items:
+        with open(item['image'], 'rb') as f:
+            answers[hashlib.sha1(f.read()).hexdigest()] = item['text']
+    client = FakeImageAnnotatorClient(answers=answers)
+
+    texts, latencies = {}, []
+    for record in iter_batch_ocr_with_google_vision([item['image'] for item in items], client=client,
+                                                    max_in_flight=workers):
+        texts[record['path']] = record['text']
+        latencies.append(record['elapsed'] * 1000)
+    return [texts.get(item['image']) for item in items], latencies
+
+
+def run_combo(combo, items, workers=1):
+    """
+    1つの組み合わせを計測する（子プロセスで実行される）
+
+    Returns:
+        dict: combo, images, errors, latency_ms (p50/p90/p99/mean), throughput,
+              throughput_per_core, peak_rss_mb, cer
+    """
+    start = time.perf_counter()
+    errors = 0
+
+    if combo == 'ocr_app_vision:fake':
+        texts, latencies = _run_vision_fake(items, workers)
+    else:
+        recognize = _make_recognizer(combo)
+
+        def measure(item):
+            item_start = time.perf_counter()
+            try:
+                text = recognize(item['image'])
+            except Exception as e:
+                print(f"{combo}: {item['image']} の処理中にエラー: {e}", file=sys.stderr)
+                text = None
+            return text, (time.perf_counter() - item_start) * 1000
+
+        # 最初の1枚はエンジンの初期化を含むため計測から除く
+        if items:
+            measure(items[0])
+            start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(measure, items))
+        texts = [text for text, _ in results]
+        latencies = [ms for _, ms in results]
+
+    elapsed = time.perf_counter() - start
+    cers = []
+    for item, text in zip(items, texts):
+        if text is None:
+            errors += 1
+        cers.append(character_error_rate(text, item['text']))
+
+    throughput = len(items) / elapsed if elapsed > 0 else 0.0
+    return {
+        'combo': combo,
+        'images': len(items),
+        'errors': errors,
+        'workers': workers,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p90': round(percentile(latencies, 90), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'mean': round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        },
+        'throughput': round(throughput, 2),
+        'throughput_per_core': round(throughput / workers, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        'cer': round(sum(cers) / len(cers), 4) if cers else 0.0,
+    }
+
+
+def run_benchmark(corpus_dir, combos=None, limit=None, workers=1):
+    """
+    すべての組み合わせをそれぞれ新しいプロセスで計測する
+
+    Returns:
+        dict: corpus, images, results（組み合わせごとのrun_comboの結果）
+    """
+    items = load_corpus(corpus_dir, limit)
+    combos = combos or list(BENCHMARK_COMBOS)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for combo in combos:
+        print(f"計測中: {combo}（{BENCHMARK_COMBOS.get(combo, '')}）", file=sys.stderr)
+        with context.Pool(1) as pool:
+            try:
+                results.append(pool.apply(run_combo, (combo, items, workers)))
+            except Exception as e:
+                print(f"{combo} の計測に失敗しました: {e}", file=sys.stderr)
+                results.append({'combo': combo, 'error': str(e)})
+    return {'corpus': os.path.abspath(corpus_dir), 'images': len(items), 'results': results}
+
+
+def format_report(report, baseline=None):
+    """結果を表形式の文字列にする（baselineがあれば差分を併記）"""
+    previous = {r['combo']: r for r in (baseline or {}).get('results', []) if 'error' not in r}
+    header = f"{'組み合わせ':<24}{'p50':>9}{'p90':>9}{'p99':>9}{'枚/秒':>9}{'枚/秒/core':>11}{'RSS MB':>9}{'CER':>8}"
+    lines = [header, '-' * len(header)]
+    for result in report['results']:
+        if 'error' in result:
+            lines.append(f"{result['combo']:<24}エラー: {result['error']}")
+            continue
+        latency = result['latency_ms']
+        rss = result['peak_rss_mb']
+        lines.append(f"{result['combo']:<24}{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}"
+                     f"{result['throughput']:>9.2f}{result['throughput_per_core']:>11.2f}"
+                     f"{rss if rss is not None else '-':>9}{result['cer']:>8.3f}")
+        old = previous.get(result['combo'])
+        if old:
+            def change(new, before):
+                return f"{(new - before) / before * 100:+.1f}%" if before else "-"
+            lines.append(f"{'  (前回比)':<24}{change(latency['p50'], old['latency_ms']['p50']):>9}"
+                         f"{change(latency['p90'], old['latency_ms']['p90']):>9}"
+                         f"{change(latency['p99'], old['latency_ms']['p99']):>9}"
+                         f"{change(result['throughput'], old['throughput']):>9}"
+                         f"{change(result['throughput_per_core'], old['throughput_per_core']):>11}"
+                         f"{'':>9}{result['cer'] - old['cer']:>+8.3f}")
+    return '\n'.join(lines)
+
+
+def parse_benchmark_args(args):
+    """コマンドライン引数を解析する"""
+    options = {'combos': None, 'limit': None, 'workers': 1, 'output': None, 'baseline': None}
+    corpus_dir = None
+    i = 0
+    while i < len(args):
+        if args[i] == '--combos' and i + 1 < len(args):
+            options['combos'] = args[i + 1].split(',')
+            i += 2
+        elif args[i] == '--limit' and i + 1 < len(args):
+            options['limit'] = int(args[i + 1])
+            i += 2
+        elif args[i] == '--workers' and i + 1 < len(args):
+            options['workers'] = int(args[i + 1])
+            i += 2
+        elif args[i] == '--output' and i + 1 < len(args):
+            options['output'] = args[i + 1]
+            i += 2
+        elif args[i] == '--baseline' and i + 1 < len(args):
+            options['baseline'] = args[i + 1]
+            i += 2
+        else:
+            corpus_dir = args[i]
+            i += 1
+    return corpus_dir, options
+
+
+if __name__ == "__main__":
+    corpus_dir, options = parse_benchmark_args(sys.argv[1:])
+    if not corpus_dir:
+        print("使用法: python ocr_benchmark.py <コーパスフォルダ> [--combos a,b] [--limit N] "
+              "[--workers N] [--output 結果.json] [--baseline 前回の結果.json]")
+        print("コーパスの作成: python create_test_image.py corpus <コーパスフォルダ> --count 1000")
+        print("組み合わせ: " + ', '.join(BENCHMARK_COMBOS))
+        sys.exit(1)
+
+    report = run_benchmark(corpus_dir, combos=options['combos'], limit=options['limit'],
+                           workers=options['workers'])
+
+    baseline = None
+    if options['baseline'] and os.path.exists(options['baseline']):
+        with open(options['baseline'], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if options['output']:
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {options['output']}")
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+OCR結果キャッシュヘルパー
+デコード済み画素とOCR設定のハッシュをキーに、メモリ(LRU)とSQLiteの2層で結果を保存する
+カメラ用には知覚ハッシュで「ほぼ同じシーン」を判定するキャッシュも提供する
+"""
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def make_cache_key(image_np, **settings):
+    """
+    画素データとOCR設定からキャッシュキーを作成する
+
+    Args:
+        image_np (numpy.ndarray): デコード済み画像
+        **settings: エンジン・言語・前処理などの設定
+
+    Returns:
+        str: SHA-256の16進文字列
+    """
+    image_np = np.ascontiguousarray(image_np)
+    digest = hashlib.sha256()
+    digest.update(str(image_np.shape).encode('ascii'))
+    digest.update(str(image_np.dtype).encode('ascii'))
+    digest.update(image_np.tobytes())
+    digest.update(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+
+def make_file_cache_key(path, chunk_size=1 << 20, **settings):
+    """
+    画像ファイルのバイト列とOCR設定からキャッシュキーを作成する
+    画像をデコードせずにキーを作れるため、巨大なスキャン画像にも使える
+
+    Args:
+        path (str): 画像ファイルのパス
+        chunk_size (int): 一度に読み込むバイト数
+        **settings: エンジン・言語・前処理などの設定
+
+    Returns:
+        str: SHA-256の16進文字列
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+class OCRCache:
+    """
+    2層構成のOCR結果キャッシュ
+    - メモリ層: 最大max_entries件のLRU
+    - ディスク層: SQLite、合計max_disk_bytesを超えたら最終アクセスが古い順に削除
+    """
+
+    def __init__(self, db_path="ocr_cache.db", max_entries=256, max_disk_bytes=50 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._initialize_db()
+
+    def _initialize_db(self):
+        """SQLiteのテーブルを準備"""
+        if not self.db_path:
+            return
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                " key TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ocr_cache_access ON ocr_cache(last_access)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"OCRキャッシュDB初期化エラー（メモリのみで動作します）: {e}")
+            self._conn = None
+
+    def _remember(self, key, text):
+        """メモリ層に追加し、上限を超えた分を削除"""
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        キャッシュから結果を取得する
+
+        Returns:
+            str or None: キャッシュされたテキスト（無ければNone）
+        """
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT text FROM ocr_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute(
+                            "UPDATE ocr_cache SET last_access = ? WHERE key = ?",
+                            (time.time(), key)
+                        )
+                        self._conn.commit()
+                        self._remember(key, row[0])
+                        self.hits += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"OCRキャッシュ読み込みエラー: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        """結果をキャッシュに保存する"""
+        if text is None:
+            return
+        with self._lock:
+            self._remember(key, text)
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO ocr_cache (key, text, size, last_access) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, text, len(text.encode('utf-8')) + len(key), time.time())
+                    )
+                    self._evict_disk()
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"OCRキャッシュ書き込みエラー: {e}")
+
+    def _evict_disk(self):
+        """ディスク層の合計サイズが上限を超えたら古いものから削除"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM ocr_cache ORDER BY last_access ASC"
+        ).fetchall()
+        removed = []
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM ocr_cache WHERE key = ?", removed)
+
+    def clear(self):
+        """キャッシュをすべて削除"""
+        with self._lock:
+            self.memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM ocr_cache")
+                self._conn.commit()
+
+    def close(self):
+        """DB接続を閉じる"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """プロセス共通のOCRキャッシュを取得する"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OCRCache()
+        return _default_cache
+
+
+def dhash(image_np, hash_size=8):
+    """
+    差分ハッシュ(dHash)を計算する
+    縮小したグレースケール画像で隣り合う画素の明暗を比較し、hash_size*hash_sizeビットにする
+
+    Args:
+        image_np (numpy.ndarray): BGRまたはグレースケール画像
+        hash_size (int): ハッシュの一辺のサイズ
+
+    Returns:
+        int: ハッシュ値
+    """
+    gray = cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY) if image_np.ndim == 3 else image_np
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    """2つのハッシュ値の異なるビット数"""
+    return bin(a ^ b).count('1')
+
+
+class PerceptualHashCache:
+    """
+    直近に認識したフレームの知覚ハッシュと結果を保持する
+    ハミング距離がmax_distance以下のフレームは同じシーンとみなして結果を再利用する
+
+    知覚ハッシュは画像全体の明暗の配置しか見ないため、レイアウトが同じで文字だけが違うもの
+    （同じ形式の値札・ラベルなど）は別のシーンでも一致することがある（誤ヒット）
+    8x8（64ビット）のハッシュでは小さな文字の違いがほとんど反映されないため、
+    既定では16x16（256ビット）のハッシュを使い、許容する距離も約4%に抑えている
+    誤ヒットが問題になる用途ではmax_distanceを小さくするか、キャッシュを使わないこと
+    """
+
+    def __init__(self, max_entries=16, max_distance=10, hash_size=16):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, frame):
+        """
+        同じシーンの結果を探す
+
+        Returns:
+            str or None: 見つかった場合は認識結果
+        """
+        frame_hash = dhash(frame, self.hash_size)
+        with self._lock:
+            best_hash, best_distance = None, None
+            for cached_hash in self.entries:
+                distance = hamming_distance(frame_hash, cached_hash)
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_hash, best_distance = cached_hash, distance
+            if best_hash is None:
+                return None
+            self.entries.move_to_end(best_hash)
+            return self.entries[best_hash]
+
+    def add(self, frame, text):
+        """
+        フレームの認識結果を登録
+        空の結果（OCRの失敗時もocr_frameは""を返す）は登録しない（同じシーンで再試行できるように）
+        """
+        if not text or text.isspace():
+            return
+        frame_hash = dhash(frame, self.hash_size)
+        with self._lock:
+            self.entries[frame_hash] = text
+            self.entries.move_to_end(frame_hash)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """登録済みの結果を削除"""
+        with self._lock:
+            self.entries.clear()
@@ -1,9 +1,11 @@
 import cv2
 import sys
 import os
-from ocr_app_vision import ocr_frame
+import copy
+from ocr_app_vision import iter_ocr_frame
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
+from functools import lru_cache
 from mercari_price_checker import get_mercari_prices, analyze_prices, format_price_info
 from mercari_real_scraper import get_real_mercari_prices
 from mercari_improved_scraper import get_real_mercari_prices_improved
@@ -17,31 +19,66 @@ from text_to_speech_helper import TextToSpeechHelper, quick_speak
 from summary_helper import SummaryHelper, format_summary_result, quick_summarize
 from ai_summary_helper import AISummaryHelper, format_ai_summary_result, quick_ai_summarize
 from real_ai_summary_helper import RealAISummaryHelper, format_real_ai_summary_result
+from camera_helper import ThreadedCamera
+from roi_helper import get_region_of_interest, RoiMouseSelector, preview_rect_in_frame
+from burst_fusion_helper import capture_fused
+from ocr_worker_helper import BackgroundWorker
+from auto_capture_helper import AutoCaptureTrigger
+from ocr_cache_helper import PerceptualHashCache
+from preprocess_helper import normalize_text_height
+from deadline_ocr_helper import camera_deadline_ms
+
+@lru_cache(maxsize=4)
+def load_overlay_font(size=20):
+    """日本語対応フォントを一度だけ読み込む"""
+    # Windowsの日本語フォントを試す
+    for font_name in ("msgothic.ttc", "NotoSansCJK-Regular.ttc"):
+        try:
+            return ImageFont.truetype(font_name, size)
+        except (IOError, OSError):
+            continue
+    # デフォルトフォントを使用
+    return ImageFont.load_default()
+
+@lru_cache(maxsize=16)
+def render_text_sprite(text, font_size=20, color=(0, 255, 0)):
+    """
+    テキストをRGBAで一度だけ描画し、BGR画像とアルファ値の組として返す
+    
+    Returns:
+        tuple: (BGR画像, アルファ値(H×W×1, uint16)) 描画範囲が空の場合はNone
+    """
+    font = load_overlay_font(font_size)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.textbbox((0, 0), text, font=font)
+    width, height = max(1, right), max(1, bottom)
+    
+    sprite = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).text((0, 0), text, font=font, fill=tuple(color) + (255,))
+    rgba = np.array(sprite)
+    bgr = np.ascontiguousarray(rgba[:, :, 2::-1]).astype(np.uint16)
+    alpha = rgba[:, :, 3:4].astype(np.uint16)
+    return bgr, alpha
 
 def draw_japanese_text(img, text, position):
-    """日本語テキストを画像に描画する関数"""
+    """日本語テキストを画像に描画する関数（描画済みのスプライトを合成）"""
     try:
-        # OpenCV画像をPIL画像に変換
-        img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(img_pil)
+        bgr, alpha = render_text_sprite(f"結果: {text}")
         
-        # デフォルトフォントを使用（日本語対応）
-        try:
-            # Windowsの日本語フォントを試す
-            font = ImageFont.truetype("msgothic.ttc", 20)
-        except:
-            try:
-                font = ImageFont.truetype("NotoSansCJK-Regular.ttc", 20)
-            except:
-                # デフォルトフォントを使用
-                font = ImageFont.load_default()
-        
-        # テキストを描画（緑色）
-        draw.text(position, f"結果: {text}", font=font, fill=(0, 255, 0))
+        # フレームからはみ出す部分は切り捨てる
+        x, y = position
+        frame_h, frame_w = img.shape[:2]
+        h = min(bgr.shape[0], frame_h - y)
+        w = min(bgr.shape[1], frame_w - x)
+        if h <= 0 or w <= 0:
+            return img
         
-        # PIL画像をOpenCV画像に戻す
-        img_cv = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
-        return img_cv
+        # テキスト部分だけをアルファ合成
+        roi = img[y:y + h, x:x + w]
+        a = alpha[:h, :w]
+        blended = (bgr[:h, :w] * a + roi.astype(np.uint16) * (255 - a) + 127) // 255
+        roi[:] = blended.astype(np.uint8)
+        return img
     except Exception as e:
         print(f"フォント描画エラー: {e}")
         # エラーの場合は英語で表示
@@ -49,12 +86,120 @@ def draw_japanese_text(img, text, position):
                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
         return img
 
-def simple_camera_ocr():
-    """シンプルなカメラOCRアプリ"""
-    cap = cv2.VideoCapture(0)
+def run_frame_ocr(frame, scene_cache=None, on_partial=None, preview_frame=None, fused=False):
+    """
+    フレームを縮小してOCRを実行する（ワーカースレッドで実行）
+    処理時間の上限（camera_deadline_ms）に間に合うティアを選び、fastティアでは認識できた行から順に返す
+    scene_cacheを指定した場合は結果を知覚ハッシュとともに登録する
+    （preview_frameを指定した場合は、照合に使うプレビューのフレームで登録する）
+    on_partialを指定した場合は1行認識するごとに、それまでのテキストを渡して呼び出す
+    fusedはマルチフレーム合成済みのフレームか（ノイズ除去を省いた探索を使い、上限を長くする）
+    """
+    # 文字の高さがOCRに適した大きさになるようリサイズ（大きな文字は縮小して軽量化）
+    h, w, _ = frame.shape
+    print(f"元の画像サイズ: {w}x{h}")
+    
+    small_frame, scale, text_height = normalize_text_height(frame, fallback_width=800)
+    if scale != 1.0:
+        new_h, new_w = small_frame.shape[:2]
+        print(f"リサイズ後: {new_w}x{new_h}（文字高さ推定: {text_height or 0:.0f}px 倍率: {scale:.2f}）")
+    else:
+        print("リサイズなし")
+    
+    # デバッグ用：処理前の画像を一時保存
+    cv2.imwrite("debug_capture.png", small_frame)
+    print("デバッグ画像を保存: debug_capture.png")
+    
+    # OCR実行
+    print("OCR処理開始...")
+    lines = []
+    for line in iter_ocr_frame(small_frame, deadline_ms=camera_deadline_ms(fused), fused=fused):
+        lines.append(line)
+        if on_partial is not None:
+            on_partial('\n'.join(lines))
+    text = '\n'.join(lines)
+    print("OCR処理完了")
+    if scene_cache is not None:
+        scene_cache.add(preview_frame if preview_frame is not None else frame, text)
+    return text
+
+def capture_and_ocr(cap, roi, preview_region, preview_size, scene_cache=None, on_partial=None, burst_mode=False):
+    """
+    高解像度の静止画（マルチフレーム合成では連写して合成）を撮り、OCR範囲を切り出してOCRする（ワーカースレッドで実行）
+    撮影に数百ミリ秒かかるため、プレビューを描画するスレッドでは撮影しない
+    roiは依頼した時点の範囲のコピー、preview_sizeはプレビューの (width, height)
+    撮影できなかった場合はプレビューの範囲（preview_region）をOCRする
+    """
+    if burst_mode:
+        still, _ = capture_fused(cap)
+    else:
+        _, still = cap.capture_still()
+    if still is not None:
+        # 範囲はプレビューに対する割合なので、静止画の解像度・縦横比に換算して切り出す
+        sh, sw = still.shape[:2]
+        region = roi.crop(still, preview_rect_in_frame(preview_size, (sw, sh)))
+    else:
+        region = preview_region
+    return run_frame_ocr(region, scene_cache, on_partial, preview_frame=preview_region,
+                         fused=burst_mode and still is not None)
+
+def search_prices(fetch, analyze, format_info, query):
+    """価格検索を実行し、表示用の文字列を返す（ワーカースレッドで実行）"""
+    prices = fetch(query, max_results=5)
+    analysis = analyze(prices)
+    return format_info(analysis)
+
+def run_summary(summarize, format_result, text, mode):
+    """要約を実行し、(要約文, 表示用の文字列) を返す（ワーカースレッドで実行）"""
+    summary = summarize(text, mode)
+    return summary, format_result(summary, len(text))
+
+def run_real_ai_summary(helper, text):
+    """真のAI要約を実行し、(要約文, 表示用の文字列) を返す（ワーカースレッドで実行）"""
+    result, error = helper.get_real_ai_summary(text, 'detailed')
+    if not result:
+        raise RuntimeError(f"{error}（API設定やネットワーク接続を確認してください）")
+    return result['summary'], format_real_ai_summary_result(result, len(text))
+
+def run_real_ai_setup(helper):
+    """
+    真のAI要約のAPI設定を対話的に行う（標準入力を待つため専用のワーカースレッドで実行）
+
+    Returns:
+        str: 表示用のメッセージ
+    """
+    print("\n--- 真のAI要約 セットアップ ---")
+    print("🤖 AI API（OpenAI/Gemini/Claude）の設定が必要です。")
+    print("セットアップを実行しますか？ (y/n): ", end="", flush=True)
+    setup_choice = input().strip().lower()
+    if setup_choice != 'y':
+        return "真のAI要約を使用するにはAPI設定が必要です。"
+    if helper.setup_wizard():
+        return "✅ セットアップ完了！再度Iキーを押してください。"
+    return "❌ セットアップがキャンセルされました。"
+
+def draw_processing_overlay(img, kind):
+    """バックグラウンド処理中であることを画面右上に表示"""
+    h, w = img.shape[:2]
+    label = "OCR processing..." if kind == 'ocr' else "Processing..."
+    cv2.rectangle(img, (w - 230, 10), (w - 10, 45), (0, 0, 0), -1)
+    cv2.putText(img, label, (w - 220, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
+    return img
+
+def simple_camera_ocr(auto_mode=False, burst_mode=False):
+    """
+    シンプルなカメラOCRアプリ
+    
+    Args:
+        auto_mode (bool): 鮮明・静止したフレームで自動的にOCRを実行するか（Mキーで切替）
+        burst_mode (bool): 連写したフレームを合成してノイズを減らすか（Fキーで切替、暗い場所向け）
+    """
+    # 別スレッドで最新フレームを保持するカメラ（OCR後に古いフレームを読まない）
+    cap = ThreadedCamera(0)
     if not cap.isOpened():
         print("エラー: カメラを開けません。")
         return
+    print(cap.describe())
 
     print("=== カメラOCR + 価格検索 ===")
     print("カメラを起動しました。")
@@ -73,6 +218,9 @@ def simple_camera_ocr():
     print("Uキー: 基本要約")
     print("Aキー: AI高度要約")
     print("Iキー: 真のAI要約 (API)")
+    print("Mキー: 自動キャプチャ切替")
+    print("Fキー: マルチフレーム合成切替（暗い場所向け）")
+    print("マウス左ドラッグ: OCR範囲を指定 / 右クリック: 範囲を解除")
     print("'q'キー: 終了")
     print("=============================")
     
@@ -91,16 +239,104 @@ def simple_camera_ocr():
     summary_helper = SummaryHelper()
     ai_summary_helper = AISummaryHelper()
     real_ai_summary_helper = RealAISummaryHelper()
+    
+    # OCR・価格検索・要約はバックグラウンドで実行し、プレビューを止めない
+    # （ネットワーク待ちの価格検索・要約がOCRを待たせないようにワーカーを分ける）
+    worker = BackgroundWorker("CameraOCRWorker")
+    network_worker = BackgroundWorker("CameraNetworkWorker")
+    # API設定のように標準入力を待つ処理はさらに別のワーカーで実行する
+    prompt_worker = BackgroundWorker("CameraPromptWorker")
+    
+    # 自動キャプチャ（鮮明かつ静止したフレームが続いたらOCR）
+    auto_trigger = AutoCaptureTrigger()
+    
+    # 同じシーンの再OCRを省くための知覚ハッシュキャッシュ
+    scene_cache = PerceptualHashCache()
+    
+    # マウスで指定したOCR範囲（前回の範囲を引き継ぐ）
+    roi = get_region_of_interest()
+    cv2.namedWindow('Simple OCR Camera')
+    roi_selector = RoiMouseSelector(roi, 'Simple OCR Camera')
+    # 自動キャプチャが評価している範囲（変わったら評価をやり直す）
+    auto_roi_box = roi.box
+    
+    def request_ocr(frame):
+        """同じシーンなら前回の結果を返し、そうでなければバックグラウンドで高解像度の静止画を撮ってOCRを実行"""
+        # OCR範囲が指定されていればその部分だけを照合・認識する
+        preview_region = roi.crop(frame)
+        cached_text = scene_cache.lookup(preview_region)
+        if cached_text is not None:
+            print("[OK] 前回と同じシーンのため認識結果を再利用")
+            worker.post_result('ocr', cached_text)
+        else:
+            # プレビューは低解像度なので、OCR用に高解像度で撮る
+            # （マルチフレーム合成では連写して合成し、ノイズ除去の代わりにする）
+            # 撮影もワーカーで行い、ここではその時点の範囲とプレビューだけを渡す
+            ph, pw = frame.shape[:2]
+            # 認識できた行から順に画面へ表示する
+            worker.submit('ocr', capture_and_ocr, cap, copy.copy(roi), preview_region.copy(), (pw, ph),
+                          scene_cache, lambda text: worker.post_result('ocr_partial', text),
+                          burst_mode=burst_mode)
 
     while True:
         ret, frame = cap.read()
         if not ret:
             print("エラー: フレームをキャプチャできません。")
             break
+        
+        # 完了したバックグラウンド処理の結果を反映
+        job = worker.poll() or network_worker.poll() or prompt_worker.poll()
+        while job is not None:
+            if job['kind'] == 'ocr_partial':
+                # 途中結果（読み取れた行まで）を表示
+                last_ocr_result = job['result'].strip()
+            elif job['kind'] == 'ocr':
+                if job['error'] is not None:
+                    print(f"OCR処理エラー: {job['error']}")
+                else:
+                    text = job['result']
+                    print(f"--- 読み取り結果 ({job['elapsed']:.2f}秒) ---")
+                    print(f"テキスト長: {len(text) if text else 0}")
+                    if text and not text.isspace():
+                        result_text = text.strip()
+                        print(f"結果: '{result_text}'")
+                        # 画面表示用に結果を保存
+                        last_ocr_result = result_text
+                        last_summary_result = ""  # 新しいOCR実行時に要約をクリア
+                        ocr_history.append(result_text)
+                        if len(ocr_history) > 10:  # 最新10件を保持
+                            ocr_history.pop(0)
+                    else:
+                        print("文字は検出されませんでした。")
+                        last_ocr_result = "No text detected"
+                        last_summary_result = ""  # 要約もクリア
+                    print("------------------")
+            elif job['kind'] == 'price':
+                if job['error'] is not None:
+                    print(f"価格検索エラー: {job['error']}")
+                else:
+                    print(job['result'])
+            elif job['kind'] == 'summary':
+                if job['error'] is not None:
+                    print(f"要約エラー: {job['error']}")
+                else:
+                    # 要約結果を保存（音声読み上げ用）
+                    last_summary_result, formatted_result = job['result']
+                    print(formatted_result)
+                    print("\n💡 ヒント: 要約文を音声で聞くには「V」キーを押してください")
+            elif job['kind'] == 'setup':
+                if job['error'] is not None:
+                    print(f"API設定エラー: {job['error']}")
+                else:
+                    print(job['result'])
+            job = worker.poll() or network_worker.poll() or prompt_worker.poll()
 
         # フレームにOCR結果を描画
         display_frame = frame.copy()
         
+        # OCR範囲（ドラッグ中はその矩形）を表示
+        roi_selector.draw(display_frame)
+        
         # 最新のOCR結果を画面上に表示
         if last_ocr_result:
             # 背景となる矩形を描画
@@ -110,13 +346,30 @@ def simple_camera_ocr():
             # PILを使って日本語テキストを描画
             display_frame = draw_japanese_text(display_frame, last_ocr_result, (20, 30))
         
+        # 自動キャプチャ: 同じ内容では再発火しない
+        if auto_mode:
+            if roi.box != auto_roi_box:
+                auto_trigger.reset()
+                auto_roi_box = roi.box
+            if auto_trigger.update(roi.crop(frame)) and not worker.is_busy('ocr'):
+                print("\n--- 自動キャプチャ: OCR実行中（バックグラウンド） ---")
+                request_ocr(frame)
+            cv2.putText(display_frame, auto_trigger.status_text(), (20, 130),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+        
+        # 処理中表示（プレビューは止めない）
+        if worker.is_busy():
+            display_frame = draw_processing_overlay(display_frame, worker.current_kind)
+        elif network_worker.is_busy():
+            display_frame = draw_processing_overlay(display_frame, network_worker.current_kind)
+        
         # 操作説明を画面下部に表示
         h, w = display_frame.shape[:2]
         cv2.rectangle(display_frame, (10, h-60), (w-10, h-10), (0, 0, 0), -1)
         # 2行で表示
         cv2.putText(display_frame, "SPACE: OCR | P: Sample | R: Mercari | T: Rakuten | S: Simple | B: BookOff | L: Rakuma", 
                    (2, h-45), cv2.FONT_HERSHEY_SIMPLEX, 0.22, (255, 255, 255), 1)
-        cv2.putText(display_frame, "N: Notepad | W: Word | C: Copy | V: Voice | U/A/I: Summary | Q: Quit", 
+        cv2.putText(display_frame, "N: Notepad | W: Word | C: Copy | V: Voice | U/A/I: Summary | M: Auto | F: Burst | Q: Quit", 
                    (2, h-25), cv2.FONT_HERSHEY_SIMPLEX, 0.2, (255, 255, 255), 1)
         
         # フレームを表示
@@ -127,63 +380,24 @@ def simple_camera_ocr():
             print("終了します...")
             break
         elif key == 32:  # SPACEキーのコード
-            print("\n--- OCR実行中 ---")
-            try:
-                # フレームサイズを小さくして処理を軽量化
-                h, w, _ = frame.shape
-                print(f"元の画像サイズ: {w}x{h}")
-                
-                if w > 800:
-                    scale = 800 / w
-                    new_w = int(w * scale)
-                    new_h = int(h * scale)
-                    small_frame = cv2.resize(frame, (new_w, new_h))
-                    print(f"リサイズ後: {new_w}x{new_h}")
-                else:
-                    small_frame = frame
-                    print("リサイズなし")
+            print("\n--- OCR実行中（バックグラウンド） ---")
+            # 処理待ちのOCRがあれば最新のフレームで置き換える
+            request_ocr(frame)
                 
-                # デバッグ用：処理前の画像を一時保存
-                cv2.imwrite("debug_capture.png", small_frame)
-                print("デバッグ画像を保存: debug_capture.png")
+        elif key == ord('m') or key == ord('M'):  # Mキーで自動キャプチャ切替
+            auto_mode = not auto_mode
+            auto_trigger.reset()
+            print(f"\n--- 自動キャプチャ: {'ON' if auto_mode else 'OFF'} ---")
                 
-                # OCR実行
-                print("OCR処理開始...")
-                text = ocr_frame(small_frame)
-                print("OCR処理完了")
-                
-                print("--- 読み取り結果 ---")
-                print(f"テキスト長: {len(text) if text else 0}")
-                if text and not text.isspace():
-                    result_text = text.strip()
-                    print(f"結果: '{result_text}'")
-                    # 画面表示用に結果を保存
-                    last_ocr_result = result_text
-                    last_summary_result = ""  # 新しいOCR実行時に要約をクリア
-                    ocr_history.append(result_text)
-                    if len(ocr_history) > 10:  # 最新10件を保持
-                        ocr_history.pop(0)
-                else:
-                    print("文字は検出されませんでした。")
-                    last_ocr_result = "No text detected"
-                    last_summary_result = ""  # 要約もクリア
-                print("------------------")
-                
-            except Exception as e:
-                print(f"OCR処理エラー: {e}")
-                import traceback
-                traceback.print_exc()
+        elif key == ord('f') or key == ord('F'):  # Fキーでマルチフレーム合成切替
+            burst_mode = not burst_mode
+            print(f"\n--- マルチフレーム合成: {'ON' if burst_mode else 'OFF'} ---")
                 
         elif key == ord('p') or key == ord('P'):  # Pキーが押されたら価格検索（サンプル版）
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- 価格検索実行（サンプル版）: {last_ocr_result} ---")
-                try:
-                    prices = get_mercari_prices(last_ocr_result, max_results=5)
-                    analysis = analyze_prices(prices)
-                    price_info = format_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_mercari_prices, analyze_prices,
+                              format_price_info, last_ocr_result)
             else:
                 print("\n--- 価格検索（サンプル版） ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -193,13 +407,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- 改良版メルカリ価格検索: {last_ocr_result} ---")
                 print("複数の方法でデータ取得を試行します...")
-                try:
-                    real_prices = get_real_mercari_prices_improved(last_ocr_result, max_results=5)
-                    analysis = analyze_prices(real_prices)
-                    price_info = format_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"実価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_real_mercari_prices_improved, analyze_prices,
+                              format_price_info, last_ocr_result)
             else:
                 print("\n--- 改良版メルカリ価格検索 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -209,13 +418,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- 楽天市場価格検索: {last_ocr_result} ---")
                 print("楽天市場APIでデータ取得中...")
-                try:
-                    rakuten_prices = get_rakuten_prices(last_ocr_result, max_results=5)
-                    analysis = analyze_rakuten_prices(rakuten_prices)
-                    price_info = format_rakuten_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"楽天価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_rakuten_prices, analyze_rakuten_prices,
+                              format_rakuten_price_info, last_ocr_result)
             else:
                 print("\n--- 楽天市場価格検索 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -225,13 +429,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- 簡単価格チェック: {last_ocr_result} ---")
                 print("複数サイトから価格情報を収集中...")
-                try:
-                    simple_prices = get_simple_prices(last_ocr_result, max_results=5)
-                    analysis = analyze_simple_prices(simple_prices)
-                    price_info = format_simple_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"簡単価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_simple_prices, analyze_simple_prices,
+                              format_simple_price_info, last_ocr_result)
             else:
                 print("\n--- 簡単価格チェック ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -241,13 +440,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- ブックオフ価格検索: {last_ocr_result} ---")
                 print("ブックオフオンラインで中古価格を検索中...")
-                try:
-                    bookoff_prices = get_bookoff_prices(last_ocr_result, max_results=5)
-                    analysis = analyze_bookoff_prices(bookoff_prices)
-                    price_info = format_bookoff_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"ブックオフ価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_bookoff_prices, analyze_bookoff_prices,
+                              format_bookoff_price_info, last_ocr_result)
             else:
                 print("\n--- ブックオフ価格検索 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -257,13 +451,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- ラクマSOLD価格検索: {last_ocr_result} ---")
                 print("ラクマで売れた商品の価格を検索中...")
-                try:
-                    rakuma_prices = get_rakuma_prices(last_ocr_result, max_results=5)
-                    analysis = analyze_rakuma_prices(rakuma_prices)
-                    price_info = format_rakuma_price_info(analysis)
-                    print(price_info)
-                except Exception as e:
-                    print(f"ラクマ価格検索エラー: {e}")
+                network_worker.submit('price', search_prices, get_rakuma_prices, analyze_rakuma_prices,
+                              format_rakuma_price_info, last_ocr_result)
             else:
                 print("\n--- ラクマSOLD価格検索 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -337,16 +526,8 @@ def simple_camera_ocr():
         elif key == ord('u') or key == ord('U'):  # Uキーで文章要約
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- 文章要約: {len(last_ocr_result)}文字 ---")
-                try:
-                    # 要約を実行
-                    summary_result = summary_helper.smart_summary(last_ocr_result, 'auto')
-                    # 要約結果を保存（音声読み上げ用）
-                    last_summary_result = summary_result
-                    formatted_result = format_summary_result(summary_result, len(last_ocr_result))
-                    print(formatted_result)
-                    print("\n💡 ヒント: 要約文を音声で聞くには「V」キーを押してください")
-                except Exception as e:
-                    print(f"要約エラー: {e}")
+                network_worker.submit('summary', run_summary, summary_helper.smart_summary,
+                              format_summary_result, last_ocr_result, 'auto')
             else:
                 print("\n--- 基本文章要約 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -356,16 +537,8 @@ def simple_camera_ocr():
             if last_ocr_result and last_ocr_result != "No text detected":
                 print(f"\n--- AI高度要約: {len(last_ocr_result)}文字 ---")
                 print("🤖 AI分析中... 文章構造を解析しています...")
-                try:
-                    # AI要約を実行
-                    ai_summary_result = ai_summary_helper.ai_smart_summary(last_ocr_result, 'hybrid')
-                    # AI要約結果を保存（音声読み上げ用）
-                    last_summary_result = ai_summary_result
-                    formatted_result = format_ai_summary_result(ai_summary_result, len(last_ocr_result))
-                    print(formatted_result)
-                    print("\n💡 ヒント: AI要約文を音声で聞くには「V」キーを押してください")
-                except Exception as e:
-                    print(f"AI要約エラー: {e}")
+                network_worker.submit('summary', run_summary, ai_summary_helper.ai_smart_summary,
+                              format_ai_summary_result, last_ocr_result, 'hybrid')
             else:
                 print("\n--- AI高度要約 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -373,42 +546,15 @@ def simple_camera_ocr():
                 
         elif key == ord('i') or key == ord('I'):  # Iキーで真のAI要約
             if last_ocr_result and last_ocr_result != "No text detected":
-                # API設定チェック
+                # API設定チェック（未設定なら描画ループを止めずに設定を行う）
                 if not real_ai_summary_helper.is_configured():
-                    print("\n--- 真のAI要約 セットアップ ---")
-                    print("🤖 AI API（OpenAI/Gemini/Claude）の設定が必要です。")
-                    print("セットアップを実行しますか？ (y/n): ", end="")
-                    setup_choice = input().strip().lower()
-                    
-                    if setup_choice == 'y':
-                        if real_ai_summary_helper.setup_wizard():
-                            print("✅ セットアップ完了！再度Iキーを押してください。")
-                        else:
-                            print("❌ セットアップがキャンセルされました。")
-                    else:
-                        print("真のAI要約を使用するにはAPI設定が必要です。")
-                    return
-                
-                print(f"\n--- 🧠 真のAI要約: {len(last_ocr_result)}文字 ---")
-                print("🤖 本物のAI（GPT/Gemini/Claude）で分析中...")
-                try:
-                    # 真のAI要約を実行
-                    result, error = real_ai_summary_helper.get_real_ai_summary(
-                        last_ocr_result, 'detailed'
-                    )
-                    
-                    if result:
-                        # 真のAI要約結果を保存（音声読み上げ用）
-                        last_summary_result = result['summary']
-                        formatted_result = format_real_ai_summary_result(result, len(last_ocr_result))
-                        print(formatted_result)
-                        print("\n💡 ヒント: 真のAI要約文を音声で聞くには「V」キーを押してください")
-                    else:
-                        print(f"真のAI要約エラー: {error}")
-                        print("💡 ヒント: API設定やネットワーク接続を確認してください")
-                        
-                except Exception as e:
-                    print(f"真のAI要約エラー: {e}")
+                    if not prompt_worker.is_busy():
+                        prompt_worker.submit('setup', run_real_ai_setup, real_ai_summary_helper)
+                else:
+                    print(f"\n--- 🧠 真のAI要約: {len(last_ocr_result)}文字 ---")
+                    print("🤖 本物のAI（GPT/Gemini/Claude）で分析中...")
+                    network_worker.submit('summary', run_real_ai_summary, real_ai_summary_helper,
+                                          last_ocr_result)
             else:
                 print("\n--- 🧠 真のAI要約 ---")
                 print("先にSPACEキーでOCRを実行してください。")
@@ -444,8 +590,11 @@ def simple_camera_ocr():
                 print("先にSPACEキーでOCRを実行してください。")
                 print("----------------")
 
+    worker.stop()
+    network_worker.stop()
+    prompt_worker.stop()
     cap.release()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    simple_camera_ocr()
\ No newline at end of file
+    simple_camera_ocr(auto_mode="auto" in sys.argv[1:], burst_mode="burst" in sys.argv[1:])
\ No newline at end of file
@@ -4,48 +4,69 @@ import cv2
 import numpy as np
 import sys
 import os
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait
+from tesseract_helper import recognize_data
+from preprocess_helper import get_pipeline
+from config_selector_helper import (get_config_selector, image_features,
+                                    SELECTOR_ACCEPT_CONFIDENCE, SELECTOR_EXPLORE_RATE)
 
 # Tesseract設定
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-def enhance_image_advanced(image_np):
+# 複数のTesseract設定
+OCR_CONFIGS = [
+    '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzあいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん',
+    '--psm 7',
+    '--psm 8',
+    '--psm 6',
+    '--psm 13'
+]
+
+# 採用する最低信頼度（%）
+MIN_CONFIDENCE = 30
+
+# カスケードモードで打ち切る平均信頼度（%）
+CASCADE_CONFIDENCE_THRESHOLD = 75
+
+# カスケードの軽量段階（前処理名, 設定のインデックス）を安い順に並べる
+CASCADE_LIGHT_STEPS = [
+    ('otsu', 3),       # 大津の二値化 + --psm 6
+    ('otsu', 1),       # 大津の二値化 + --psm 7（1行）
+    ('adaptive', 3),   # 適応的二値化 + --psm 6
+]
+
+def enhance_image_advanced(image_np, image_class='improved'):
     """
     OCR精度向上のための高度な画像前処理
+    ノイズ除去・コントラスト強化・シャープニングの結果を3種類の二値化で共有する
+    （'advanced_fast' プリセットを指定するとfastNlMeansDenoisingを省略。
+      マルチフレーム合成済みのカメラ画像には画像の種類 'burst' を指定する）
     
     Args:
         image_np (numpy.ndarray): 入力画像
+        image_class (str): 画像の種類またはプリセット名
     
     Returns:
-        numpy.ndarray: 前処理済み画像
+        tuple: 前処理済み画像（適応的ガウシアン, 適応的平均, 大津）
     """
-    # グレースケール化
-    if len(image_np.shape) == 3:
-        gray = cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image_np.copy()
-    
-    # ノイズ除去
-    denoised = cv2.fastNlMeansDenoising(gray)
-    
-    # ガウシアンブラーでわずかに平滑化
-    blurred = cv2.GaussianBlur(denoised, (1, 1), 0)
-    
-    # コントラスト強化（適応的）
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    contrast_enhanced = clahe.apply(blurred)
-    
-    # シャープニング
-    kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-    sharpened = cv2.filter2D(contrast_enhanced, -1, kernel)
-    
-    # 適応的二値化（複数手法を試行）
-    binary1 = cv2.adaptiveThreshold(sharpened, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-    binary2 = cv2.adaptiveThreshold(sharpened, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 11, 2)
+    pipeline = get_pipeline(image_class)
+    outputs, _ = pipeline.run(image_np)
+    return tuple(outputs[name] for name in pipeline.outputs)
+
+def enhance_image_light(image_np):
+    """
+    ノイズ除去・CLAHE・シャープニングを省いた軽量な前処理
     
-    # 大津の二値化も試行
-    _, binary3 = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    Args:
+        image_np (numpy.ndarray): 入力画像
     
-    return binary1, binary2, binary3
+    Returns:
+        dict: 前処理名をキーとした二値化画像（'otsu', 'adaptive'）
+    """
+    outputs, _ = get_pipeline('light').run(image_np)
+    return outputs
 
 def ocr_with_multiple_configs(image_path):
     """
@@ -65,14 +86,7 @@ def ocr_with_multiple_configs(image_path):
         # 複数の前処理を適用
         binary1, binary2, binary3 = enhance_image_advanced(cv_img)
         
-        # 複数のTesseract設定
-        configs = [
-            '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzあいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん',
-            '--psm 7',
-            '--psm 8',
-            '--psm 6',
-            '--psm 13'
-        ]
+        configs = OCR_CONFIGS
         
         results = []
         
@@ -92,7 +106,7 @@ def ocr_with_multiple_configs(image_path):
                     # テキストを取得
                     text = pytesseract.image_to_string(pil_img, lang='jpn', config=config).strip()
                     
-                    if text and avg_confidence > 30:  # 最低信頼度30%
+                    if text and avg_confidence > MIN_CONFIDENCE:  # 最低信頼度30%
                         results.append((text, avg_confidence, i, j))
                         
                 except Exception as e:
@@ -112,6 +126,343 @@ def ocr_with_multiple_configs(image_path):
         print(f"OCR処理中にエラーが発生しました: {e}")
         return ""
 
+def text_from_data(data):
+    """
+    image_to_dataの結果からテキストを組み立てる（image_to_stringの再実行を省く）
+    
+    Args:
+        data (dict): pytesseract.Output.DICT形式の単語データ
+    
+    Returns:
+        str: 行・段落ごとに改行したテキスト
+    """
+    lines = []
+    current_key = None
+    current_words = []
+    
+    for i, word in enumerate(data['text']):
+        if data['level'][i] != 5 or not word or not word.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if key != current_key:
+            if current_words:
+                lines.append((current_key, ' '.join(current_words)))
+            current_key = key
+            current_words = []
+        current_words.append(word.strip())
+    if current_words:
+        lines.append((current_key, ' '.join(current_words)))
+    
+    # 段落が変わる箇所には空行を入れる
+    output = []
+    previous = None
+    for key, line in lines:
+        if previous is not None and key[:2] != previous[:2]:
+            output.append('')
+        output.append(line)
+        previous = key
+    return '\n'.join(output)
+
+def mean_confidence(data):
+    """単語データから平均信頼度を計算する"""
+    confidences = [float(conf) for conf in data['conf'] if float(conf) > 0]
+    return sum(confidences) / len(confidences) if confidences else 0
+
+def run_candidate(binary, config, preprocess_name, config_index, deadline=None):
+    """
+    1つの前処理×設定の組み合わせを1回のTesseract呼び出しで評価する
+    preprocess_nameは前処理の出力名（例: 'otsu'）で、結果のpreprocessにそのまま入る
+    deadline（time.perf_counter()基準の締め切り時刻）を指定した場合は、
+    締め切りを過ぎていれば実行せず、実行する場合も残り時間をTesseractの上限にする
+    
+    Returns:
+        dict or None: text, confidence, preprocess, config, elapsed, error
+                      締め切りを過ぎていて実行しなかった・打ち切られた場合はNone
+    """
+    start = time.perf_counter()
+    if deadline is not None and start >= deadline:
+        return None
+    candidate = {
+        'text': '',
+        'confidence': 0,
+        'preprocess': preprocess_name,
+        'config': config_index,
+        'elapsed': 0.0,
+        'error': None
+    }
+    try:
+        timeout = None if deadline is None else deadline - time.perf_counter()
+        data = recognize_data(binary, lang='jpn', config=config, timeout=timeout)
+        candidate['text'] = text_from_data(data).strip()
+        candidate['confidence'] = mean_confidence(data)
+    except Exception as e:
+        if deadline is not None and time.perf_counter() >= deadline:
+            # 締め切りで打ち切られた候補は結果に含めない
+            return None
+        candidate['error'] = str(e)
+    candidate['elapsed'] = time.perf_counter() - start
+    return candidate
+
+def search_best_config(image_np, max_workers=None, image_class='improved', deadline=None, record=True):
+    """
+    全ての前処理×設定の組み合わせを並列に1回ずつ実行し、最良の結果を返す
+    全候補を実行できた場合は、結果を設定選択モデルに記録する
+    
+    Args:
+        image_np (numpy.ndarray): 入力画像
+        max_workers (int): 並列数（Noneの場合はCPU数）
+        image_class (str): 前処理の画像の種類またはプリセット名
+        deadline (float): time.perf_counter()基準の締め切り時刻（Noneで無制限）
+                          締め切りまでに終わった候補の中から最良のものを返す
+        record (bool): 結果を設定選択モデルに記録するか（呼び出し側でまとめて記録する場合はFalse）
+    
+    Returns:
+        dict: text, confidence, preprocess, config, elapsed, preprocess_timings, candidates, partial
+    """
+    start = time.perf_counter()
+    pipeline = get_pipeline(image_class)
+    outputs, preprocess_timings = pipeline.run(image_np)
+    
+    jobs = [(outputs[name], config, name, j)
+            for name in pipeline.outputs
+            for j, config in enumerate(OCR_CONFIGS)]
+    # 締め切りで打ち切られても結果が残るよう、汎用的な設定（--psm 6）を先に実行
+    jobs.sort(key=lambda job: job[3] != 3)
+    
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(run_candidate, *job, deadline=deadline) for job in jobs]
+    timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+    done, _ = wait(futures, timeout=timeout)
+    # 締め切りを過ぎた場合は未実行の候補を取り消す
+    # 実行中の候補も締め切りでTesseractが打ち切られ、まだ始まっていない候補は実行されずに終わる
+    executor.shutdown(wait=False, cancel_futures=True)
+    candidates = [future.result() for future in futures
+                  if future in done and future.result() is not None]
+    
+    valid = [c for c in candidates if c['text'] and c['confidence'] > MIN_CONFIDENCE]
+    fallback = [c for c in candidates if c['preprocess'] == pipeline.outputs[0] and c['config'] == 3]
+    if valid:
+        best = max(valid, key=lambda c: c['confidence'])
+    elif fallback:
+        # フォールバック: 最初の前処理・最も汎用的な設定（--psm 6）
+        best = fallback[0]
+    elif candidates:
+        best = max(candidates, key=lambda c: c['confidence'])
+    else:
+        best = {'text': '', 'confidence': 0, 'preprocess': None, 'config': None}
+    
+    result = {
+        'text': best['text'],
+        'confidence': best['confidence'],
+        'preprocess': best['preprocess'],
+        'config': best['config'],
+        'elapsed': time.perf_counter() - start,
+        'preprocess_timings': preprocess_timings,
+        'candidates': candidates,
+        'partial': len(candidates) < len(jobs)
+    }
+    # 締め切りで打ち切られた探索は候補が偏るため記録しない
+    if record and not result['partial']:
+        record_search_result(image_np, result, image_class)
+    return result
+
+def ocr_with_multiple_configs_parallel(image_path, max_workers=None):
+    """
+    ocr_with_multiple_configsの並列・1パス版
+    
+    Args:
+        image_path (str): 画像ファイルのパス
+        max_workers (int): 並列数（Noneの場合はCPU数）
+    
+    Returns:
+        dict: search_best_configの結果（失敗時はtextが空）
+    """
+    try:
+        img = Image.open(image_path)
+        cv_img = np.array(img)
+        result = search_best_config(cv_img, max_workers=max_workers)
+        print(f"最適設定: 前処理{result['preprocess']}, 設定{result['config']}, "
+              f"信頼度: {result['confidence']:.1f}%, 処理時間: {result['elapsed']:.2f}秒")
+        return result
+    except Exception as e:
+        print(f"OCR処理中にエラーが発生しました: {e}")
+        return {'text': '', 'confidence': 0, 'preprocess': None, 'config': None,
+                'elapsed': 0.0, 'candidates': []}
+
+def cascade_search(image_np, threshold=CASCADE_CONFIDENCE_THRESHOLD, max_workers=None,
+                   image_class='improved'):
+    """
+    安い前処理・設定から順に試し、平均信頼度が閾値を超えた時点で打ち切る
+    軽量段階で閾値に届かない場合のみ、重い前処理による全候補探索へ進む
+    軽量段階の候補は'light'、重い段階の候補はimage_classとして設定選択モデルに記録する
+    
+    Args:
+        image_np (numpy.ndarray): 入力画像
+        threshold (float): 打ち切る平均信頼度（%）
+        max_workers (int): 重い段階の並列数
+        image_class (str): 重い段階の前処理の画像の種類またはプリセット名
+    
+    Returns:
+        dict: text, confidence, stage, preprocess, config, elapsed, candidates
+    """
+    start = time.perf_counter()
+    light = enhance_image_light(image_np)
+    candidates = []
+    
+    for name, config_index in CASCADE_LIGHT_STEPS:
+        candidate = run_candidate(light[name], OCR_CONFIGS[config_index], name, config_index)
+        candidates.append(candidate)
+        if candidate['text'] and candidate['confidence'] >= threshold:
+            record_search_result(image_np, {'candidates': list(candidates)}, 'light')
+            return {
+                'text': candidate['text'],
+                'confidence': candidate['confidence'],
+                'stage': 'light',
+                'preprocess': name,
+                'config': config_index,
+                'elapsed': time.perf_counter() - start,
+                'candidates': candidates
+            }
+    
+    # 軽量段階の前処理名は'light'のパイプラインのものなので、重い段階とは分けて記録する
+    record_search_result(image_np, {'candidates': list(candidates)}, 'light')
+    
+    # 信頼度が低い画像のみ重い前処理へエスカレーション
+    heavy = search_best_config(image_np, max_workers=max_workers, image_class=image_class)
+    candidates.extend(heavy['candidates'])
+    
+    best_light = max(candidates[:len(CASCADE_LIGHT_STEPS)], key=lambda c: c['confidence'])
+    if best_light['text'] and best_light['confidence'] > heavy['confidence']:
+        best, stage = best_light, 'light'
+    else:
+        best, stage = heavy, 'heavy'
+    
+    return {
+        'text': best['text'],
+        'confidence': best['confidence'],
+        'stage': stage,
+        'preprocess': best['preprocess'],
+        'config': best['config'],
+        'elapsed': time.perf_counter() - start,
+        'candidates': candidates
+    }
+
+def record_search_result(image_np, result, image_class='improved', features=None, selector=None):
+    """全探索の結果（全候補の信頼度）を設定選択モデルに記録する"""
+    selector = selector or get_config_selector()
+    features = features or image_features(image_np)
+    selector.record(image_class, features,
+                    [(c['preprocess'], c['config'], c['confidence'])
+                     for c in result['candidates'] if not c['error']])
+
+def adaptive_search(image_np, accept_confidence=SELECTOR_ACCEPT_CONFIDENCE, max_workers=None,
+                    image_class='improved', selector=None, explore_rate=SELECTOR_EXPLORE_RATE):
+    """
+    過去の結果から予測した1つの組み合わせだけを実行し、信頼度が低い場合のみ全探索する
+    結果は1枚につき1回だけ設定選択モデルに記録する（全探索した場合は全候補、それ以外は予測した組み合わせ）
+    予測があってもexplore_rateの割合で全探索し、予測以外の組み合わせの信頼度も更新する
+    
+    Args:
+        image_np (numpy.ndarray): 入力画像
+        accept_confidence (float): 予測した組み合わせの結果を採用する最低信頼度（%）
+        max_workers (int): 全探索の並列数
+        image_class (str): 前処理の画像の種類またはプリセット名
+        explore_rate (float): 予測を使わずに全探索する割合（0で無効）
+    
+    Returns:
+        dict: text, confidence, stage（'predicted', 'full' または 'explore'）, preprocess, config,
+              elapsed, candidates, prediction
+    """
+    start = time.perf_counter()
+    selector = selector or get_config_selector()
+    features = image_features(image_np)
+    pipeline = get_pipeline(image_class)
+    prediction = selector.predict(image_class, features)
+    candidates = []
+    explore = prediction is not None and random.random() < explore_rate
+    
+    if (prediction and not explore and prediction['preprocess'] in pipeline.outputs
+            and prediction['confidence'] >= accept_confidence):
+        # 予測した前処理に必要なノードだけを計算して1回だけOCR
+        name = prediction['preprocess']
+        outputs, _ = pipeline.run(image_np, outputs=[name])
+        candidate = run_candidate(outputs[name], OCR_CONFIGS[prediction['config']],
+                                  name, prediction['config'])
+        candidates.append(candidate)
+        if candidate['text'] and candidate['confidence'] >= accept_confidence:
+            selector.record(image_class, features, [(name, candidate['config'], candidate['confidence'])])
+            return {
+                'text': candidate['text'],
+                'confidence': candidate['confidence'],
+                'stage': 'predicted',
+                'preprocess': candidate['preprocess'],
+                'config': candidate['config'],
+                'elapsed': time.perf_counter() - start,
+                'candidates': candidates,
+                'prediction': prediction
+            }
+    
+    # 予測が無い・信頼度が低い・探索する回の場合は全探索して結果を学習する
+    # （予測した組み合わせの結果は全探索の候補にも含まれるため、ここでまとめて1回だけ記録する）
+    result = search_best_config(image_np, max_workers=max_workers, image_class=image_class, record=False)
+    record_search_result(image_np, result, image_class, features, selector)
+    return {
+        'text': result['text'],
+        'confidence': result['confidence'],
+        'stage': 'explore' if explore else 'full',
+        'preprocess': result['preprocess'],
+        'config': result['config'],
+        'elapsed': time.perf_counter() - start,
+        'candidates': candidates + result['candidates'],
+        'prediction': prediction
+    }
+
+def ocr_with_adaptive(image_path, max_workers=None):
+    """
+    画像ファイルに対してadaptive_searchを実行する
+    
+    Returns:
+        dict: adaptive_searchの結果（失敗時はtextが空）
+    """
+    try:
+        img = Image.open(image_path)
+        cv_img = np.array(img)
+        result = adaptive_search(cv_img, max_workers=max_workers)
+        print(f"自動選択: {result['stage']}, 前処理{result['preprocess']}, 設定{result['config']}, "
+              f"信頼度: {result['confidence']:.1f}%, 試行数: {len(result['candidates'])}, "
+              f"処理時間: {result['elapsed']:.2f}秒")
+        return result
+    except Exception as e:
+        print(f"OCR処理中にエラーが発生しました: {e}")
+        return {'text': '', 'confidence': 0, 'stage': None, 'preprocess': None,
+                'config': None, 'elapsed': 0.0, 'candidates': [], 'prediction': None}
+
+def ocr_with_cascade(image_path, threshold=CASCADE_CONFIDENCE_THRESHOLD, max_workers=None):
+    """
+    カスケードモードでOCRを実行する
+    
+    Args:
+        image_path (str): 画像ファイルのパス
+        threshold (float): 打ち切る平均信頼度（%）
+        max_workers (int): 重い段階の並列数
+    
+    Returns:
+        dict: cascade_searchの結果（失敗時はtextが空）
+    """
+    try:
+        img = Image.open(image_path)
+        cv_img = np.array(img)
+        result = cascade_search(cv_img, threshold=threshold, max_workers=max_workers)
+        print(f"カスケード: {result['stage']}段階で確定, 前処理{result['preprocess']}, "
+              f"設定{result['config']}, 信頼度: {result['confidence']:.1f}%, "
+              f"試行数: {len(result['candidates'])}, 処理時間: {result['elapsed']:.2f}秒")
+        return result
+    except Exception as e:
+        print(f"OCR処理中にエラーが発生しました: {e}")
+        return {'text': '', 'confidence': 0, 'stage': None, 'preprocess': None,
+                'config': None, 'elapsed': 0.0, 'candidates': []}
+
 def test_ocr_accuracy():
     """OCR精度をテストする"""
     # エンコーディング設定
@@ -141,7 +492,24 @@ def test_ocr_accuracy():
     return improved_result
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2 and sys.argv[2] == "--parallel":
+        result = ocr_with_multiple_configs_parallel(sys.argv[1])
+        print("候補ごとの処理時間:")
+        for c in result['candidates']:
+            print(f"  前処理{c['preprocess']} 設定{c['config']}: "
+                  f"{c['elapsed'] * 1000:.0f}ms 信頼度 {c['confidence']:.1f}%")
+        print("OCR結果:")
+        print(result['text'])
+    elif len(sys.argv) > 2 and sys.argv[2] == "--cascade":
+        threshold = float(sys.argv[3]) if len(sys.argv) > 3 else CASCADE_CONFIDENCE_THRESHOLD
+        result = ocr_with_cascade(sys.argv[1], threshold=threshold)
+        print("OCR結果:")
+        print(result['text'])
+    elif len(sys.argv) > 2 and sys.argv[2] == "--adaptive":
+        result = ocr_with_adaptive(sys.argv[1])
+        print("OCR結果:")
+        print(result['text'])
+    elif len(sys.argv) > 1:
         result = ocr_with_multiple_configs(sys.argv[1])
         print("OCR結果:")
         print(result)
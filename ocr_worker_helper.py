@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+バックグラウンド処理ヘルパー
+カメラのプレビューを止めずにOCR・価格検索・要約を別スレッドで実行する
+"""
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+
+class BackgroundWorker:
+    """
+    種類ごとに1枠のキューを持つワーカースレッド
+    同じ種類のタスクが処理待ちのまま新しく投入された場合は新しい方だけを残す（最新優先）
+    結果はpoll()で描画ループ側から取り出す
+    """
+
+    def __init__(self, name="BackgroundWorker"):
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._running = True
+        self.current_kind = None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, func, *args, **kwargs):
+        """
+        タスクを投入する
+
+        Args:
+            kind (str): タスクの種類（'ocr', 'price' など）
+            func (callable): 実行する関数
+        """
+        with self._condition:
+            self._pending.pop(kind, None)
+            self._pending[kind] = (func, args, kwargs, time.perf_counter())
+            self._condition.notify()
+
+    def post_result(self, kind, result):
+        """ワーカーを経由せずに結果を直接投稿する（キャッシュ済みの結果など）"""
+        self._results.put({'kind': kind, 'result': result, 'error': None, 'elapsed': 0.0})
+
+    def is_busy(self, kind=None):
+        """処理中または処理待ちのタスクがあるか（kind指定時はその種類のみ）"""
+        with self._condition:
+            if kind is None:
+                return self.current_kind is not None or bool(self._pending)
+            return self.current_kind == kind or kind in self._pending
+
+    def poll(self):
+        """
+        完了したタスクの結果を1件取り出す（無ければNone）
+
+        Returns:
+            dict or None: kind, result, error, elapsed
+        """
+        try:
+            return self._results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        """ワーカースレッド本体"""
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                kind, (func, args, kwargs, submitted) = self._pending.popitem(last=False)
+                self.current_kind = kind
+
+            result, error = None, None
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                error = e
+
+            with self._condition:
+                self.current_kind = None
+            self._results.put({
+                'kind': kind,
+                'result': result,
+                'error': error,
+                'elapsed': time.perf_counter() - submitted
+            })
+
+    def stop(self, timeout=1.0):
+        """ワーカーを停止（実行中のタスクは最後まで実行される）"""
+        with self._condition:
+            self._running = False
+            self._pending.clear()
+            self._condition.notify_all()
+        self.thread.join(timeout)
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+OCR前処理パイプラインヘルパー
+前処理をノードの組み合わせ（グラフ）として宣言し、共通の中間結果は一度だけ計算する
+各ノードの処理時間を記録し、画像の種類ごとのプリセットを設定ファイルで選択できる
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from image_encode_helper import estimate_text_height
+
+# 前処理設定ファイル
+PREPROCESS_CONFIG_FILE = "preprocess_config.json"
+
+# Tesseractが最も安定して読める文字の高さ（ピクセル）
+TARGET_TEXT_HEIGHT = 32
+
+
+def _grayscale(image):
+    """グレースケール化"""
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _denoise(image, h=3):
+    """ノイズ除去（fastNlMeansDenoising、重い処理）"""
+    return cv2.fastNlMeansDenoising(image, None, h)
+
+
+def _blur(image, ksize=1):
+    """ガウシアンブラーでわずかに平滑化"""
+    return cv2.GaussianBlur(image, (ksize, ksize), 0)
+
+
+def _clahe(image, clip_limit=2.0, tile_size=8):
+    """コントラスト強化（適応的）"""
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
+    return clahe.apply(image)
+
+
+def _sharpen(image):
+    """シャープニング"""
+    kernel = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+    return cv2.filter2D(image, -1, kernel)
+
+
+def _otsu(image):
+    """大津の二値化"""
+    _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def _adaptive_gaussian(image, block_size=11, c=2):
+    """適応的二値化（ガウシアン）"""
+    return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, block_size, c)
+
+
+def _adaptive_mean(image, block_size=11, c=2):
+    """適応的二値化（平均）"""
+    return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                 cv2.THRESH_BINARY, block_size, c)
+
+
+def _resize(image, width=None, max_side=None, scale=None):
+    """幅・長辺・倍率のいずれかを指定して縮小/拡大"""
+    h, w = image.shape[:2]
+    if scale is None:
+        if width:
+            scale = width / w
+        elif max_side:
+            scale = min(1.0, max_side / max(h, w))
+        else:
+            return image
+    if abs(scale - 1.0) < 1e-3:
+        return image
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    return cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))),
+                      interpolation=interpolation)
+
+
+def measure_text_height(image, analysis_side=800):
+    """
+    縮小した画像で文字の高さを推定し、元画像のスケールに換算する
+
+    Args:
+        image (numpy.ndarray): BGRまたはグレースケール画像
+        analysis_side (int): 推定に使う画像の長辺の上限
+
+    Returns:
+        float or None: 元画像での文字の高さ（推定できない場合はNone）
+    """
+    gray = _grayscale(image)
+    h, w = gray.shape[:2]
+    ratio = min(1.0, analysis_side / max(h, w))
+    if ratio < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * ratio)), max(1, int(h * ratio))),
+                          interpolation=cv2.INTER_AREA)
+    text_height = estimate_text_height(gray)
+    if text_height is None:
+        return None
+    return text_height / ratio
+
+
+def text_height_scale(image, target_height=TARGET_TEXT_HEIGHT, min_scale=0.2, max_scale=3.0,
+                      max_side=2000, fallback_width=1280):
+    """
+    文字の高さがtarget_heightになる倍率を求める
+
+    文字が検出できない場合はfallback_widthまで縮小する（従来の固定幅リサイズ）
+
+    Returns:
+        tuple: (倍率, 推定した文字の高さ or None)
+    """
+    h, w = image.shape[:2]
+    text_height = measure_text_height(image)
+    if text_height:
+        scale = min(max_scale, max(min_scale, target_height / text_height))
+    elif fallback_width and w > fallback_width:
+        scale = fallback_width / w
+    else:
+        scale = 1.0
+    # 拡大しすぎてメモリ・処理時間が膨らまないよう長辺を制限
+    if max_side and max(h, w) * scale > max_side:
+        scale = max_side / max(h, w)
+    return scale, text_height
+
+
+def _normalize_text_height(image, target_height=TARGET_TEXT_HEIGHT, min_scale=0.2, max_scale=3.0,
+                           max_side=2000, fallback_width=1280):
+    """文字の高さがTesseractの得意な大きさになるよう縮小/拡大"""
+    scale, _ = text_height_scale(image, target_height, min_scale, max_scale, max_side, fallback_width)
+    return _resize(image, scale=scale)
+
+
+def normalize_text_height(image, target_height=TARGET_TEXT_HEIGHT, **kwargs):
+    """
+    文字の高さを揃えるようにリサイズする（カメラ画像の固定幅リサイズの代わり）
+
+    大きな文字の写真は積極的に縮小して処理する画素を減らし、
+    小さな文字は拡大して認識精度を上げる
+
+    Args:
+        image (numpy.ndarray): BGRまたはグレースケール画像
+        target_height (int): 目標とする文字の高さ（ピクセル）
+
+    Returns:
+        tuple: (リサイズ後の画像, 倍率, 推定した文字の高さ or None)
+    """
+    scale, text_height = text_height_scale(image, target_height, **kwargs)
+    return _resize(image, scale=scale), scale, text_height
+
+
+# 利用可能な処理の一覧
+STAGES = {
+    'grayscale': _grayscale,
+    'denoise': _denoise,
+    'blur': _blur,
+    'clahe': _clahe,
+    'sharpen': _sharpen,
+    'otsu': _otsu,
+    'adaptive_gaussian': _adaptive_gaussian,
+    'adaptive_mean': _adaptive_mean,
+    'resize': _resize,
+    'normalize_text_height': _normalize_text_height,
+}
+
+# プリセット定義
+# nodes: ノード名 -> {'op': 処理名, 'input': 入力ノード名（省略時は元画像）, その他パラメータ}
+# outputs: 出力するノード名の一覧
+PREPROCESS_PRESETS = {
+    # 大津の二値化のみ（従来のenhance_image_for_ocr）
+    'simple': {
+        'nodes': {
+            'gray': {'op': 'grayscale'},
+            'otsu': {'op': 'otsu', 'input': 'gray'},
+        },
+        'outputs': ['otsu'],
+    },
+    # ノイズ除去・強調を省いた軽量版（カスケードの最初の段階）
+    'light': {
+        'nodes': {
+            'gray': {'op': 'grayscale'},
+            'otsu': {'op': 'otsu', 'input': 'gray'},
+            'adaptive': {'op': 'adaptive_gaussian', 'input': 'gray'},
+        },
+        'outputs': ['otsu', 'adaptive'],
+    },
+    # 従来のenhance_image_advanced（3種類の二値化が強調済み画像を共有する）
+    'advanced': {
+        'nodes': {
+            'gray': {'op': 'grayscale'},
+            'denoised': {'op': 'denoise', 'input': 'gray'},
+            'blurred': {'op': 'blur', 'input': 'denoised'},
+            'contrast': {'op': 'clahe', 'input': 'blurred'},
+            'sharpened': {'op': 'sharpen', 'input': 'contrast'},
+            'adaptive_gaussian': {'op': 'adaptive_gaussian', 'input': 'sharpened'},
+            'adaptive_mean': {'op': 'adaptive_mean', 'input': 'sharpened'},
+            'otsu': {'op': 'otsu', 'input': 'sharpened'},
+        },
+        'outputs': ['adaptive_gaussian', 'adaptive_mean', 'otsu'],
+    },
+    # advancedからfastNlMeansDenoisingを外したもの
+    'advanced_fast': {
+        'nodes': {
+            'gray': {'op': 'grayscale'},
+            'contrast': {'op': 'clahe', 'input': 'gray'},
+            'sharpened': {'op': 'sharpen', 'input': 'contrast'},
+            'adaptive_gaussian': {'op': 'adaptive_gaussian', 'input': 'sharpened'},
+            'adaptive_mean': {'op': 'adaptive_mean', 'input': 'sharpened'},
+            'otsu': {'op': 'otsu', 'input': 'sharpened'},
+        },
+        'outputs': ['adaptive_gaussian', 'adaptive_mean', 'otsu'],
+    },
+    # 文字の高さを揃えてから大津の二値化
+    'normalized': {
+        'nodes': {
+            'gray': {'op': 'grayscale'},
+            'scaled': {'op': 'normalize_text_height', 'input': 'gray'},
+            'otsu': {'op': 'otsu', 'input': 'scaled'},
+        },
+        'outputs': ['otsu'],
+    },
+}
+
+# 画像の種類ごとに使うプリセット（設定ファイルで上書き可能）
+DEFAULT_PREPROCESS_CONFIG = {
+    'image_class_presets': {
+        'default': 'simple',
+        'camera': 'simple',
+        'price_tag': 'simple',
+        'label': 'simple',
+        'document': 'simple',
+        'improved': 'advanced',
+        # マルチフレーム合成でノイズ除去済みのカメラ画像
+        'burst': 'advanced_fast',
+    },
+    'custom_presets': {},
+}
+
+
+class PreprocessPipeline:
+    """
+    宣言的な前処理グラフ
+    複数の出力が同じ中間結果を必要とする場合も、各ノードは1回だけ計算される
+    """
+
+    def __init__(self, nodes, outputs, name=None):
+        self.name = name
+        self.nodes = nodes
+        self.outputs = list(outputs)
+        for node_name, node in nodes.items():
+            if node['op'] not in STAGES:
+                raise ValueError(f"未知の前処理です: {node['op']} ({node_name})")
+
+    def run(self, image, outputs=None):
+        """
+        前処理を実行する
+
+        Args:
+            image (numpy.ndarray): 入力画像
+            outputs (list): 計算する出力ノード名（Noneの場合はすべて）
+                            指定した出力に必要なノードだけが計算される
+
+        Returns:
+            tuple: (出力ノード名 -> 画像 の辞書, ノード名 -> 処理時間(ms) の辞書)
+        """
+        outputs = self.outputs if outputs is None else list(outputs)
+        results = {'input': image}
+        timings = {}
+        for output in outputs:
+            self._evaluate(output, results, timings, set())
+        return {name: results[name] for name in outputs}, timings
+
+    def _evaluate(self, name, results, timings, visiting):
+        """ノードを入力側から再帰的に計算（計算済みなら再利用）"""
+        if name in results:
+            return results[name]
+        if name in visiting:
+            raise ValueError(f"前処理グラフが循環しています: {name}")
+        visiting.add(name)
+
+        node = self.nodes[name]
+        source = self._evaluate(node.get('input', 'input'), results, timings, visiting)
+        params = {key: value for key, value in node.items() if key not in ('op', 'input')}
+
+        start = time.perf_counter()
+        results[name] = STAGES[node['op']](source, **params)
+        timings[name] = (time.perf_counter() - start) * 1000
+        return results[name]
+
+
+def load_preprocess_config(config_file=PREPROCESS_CONFIG_FILE):
+    """前処理設定を読み込み、既定値とマージする"""
+    config = json.loads(json.dumps(DEFAULT_PREPROCESS_CONFIG))
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+            config['image_class_presets'].update(loaded.get('image_class_presets', {}))
+            for name, definition in loaded.get('custom_presets', {}).items():
+                # 組み込みプリセットと同じ名前は、キャッシュキーや既定の動作が変わるため受け付けない
+                if name in PREPROCESS_PRESETS:
+                    print(f"前処理設定ファイル: カスタムプリセット名 '{name}' は組み込みプリセットと"
+                          f"重複するため無視します", file=sys.stderr)
+                    continue
+                config['custom_presets'][name] = definition
+    except Exception as e:
+        print(f"前処理設定ファイル読み込みエラー: {e}", file=sys.stderr)
+    return config
+
+
+_config = None
+_config_lock = threading.Lock()
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_preprocess_config():
+    """前処理設定を取得（初回のみファイルを読み込む）"""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_preprocess_config()
+        return _config
+
+
+def resolve_preset(image_class_or_preset):
+    """画像の種類またはプリセット名からプリセット名を決定する"""
+    config = get_preprocess_config()
+    presets = config['image_class_presets']
+    if image_class_or_preset in presets:
+        return presets[image_class_or_preset]
+    if image_class_or_preset in PREPROCESS_PRESETS or image_class_or_preset in config['custom_presets']:
+        return image_class_or_preset
+    return presets['default']
+
+
+def preset_definition(image_class_or_preset):
+    """
+    画像の種類またはプリセット名から、実際に使われるプリセットの定義を取得する
+
+    Returns:
+        tuple: (プリセット名, 定義の辞書)
+    """
+    preset = resolve_preset(image_class_or_preset)
+    config = get_preprocess_config()
+    return preset, config['custom_presets'].get(preset) or PREPROCESS_PRESETS[preset]
+
+
+def preset_signature(image_class_or_preset):
+    """
+    キャッシュキー用の前処理の識別情報（プリセット名と定義の内容）
+    設定ファイルでプリセットを編集した場合は別のキーになる
+    """
+    preset, definition = preset_definition(image_class_or_preset)
+    return {'name': preset, 'definition': definition}
+
+
+def get_pipeline(image_class_or_preset='default'):
+    """プリセットのパイプラインを取得（生成済みなら再利用）"""
+    preset, definition = preset_definition(image_class_or_preset)
+    with _pipelines_lock:
+        pipeline = _pipelines.get(preset)
+        if pipeline is None:
+            pipeline = PreprocessPipeline(definition['nodes'], definition['outputs'], name=preset)
+            _pipelines[preset] = pipeline
+        return pipeline
+
+
+def preprocess_image(image, image_class_or_preset='default'):
+    """
+    プリセットで前処理を行い、最初の出力画像を返す
+
+    Args:
+        image (numpy.ndarray): 入力画像
+        image_class_or_preset (str): 画像の種類（'camera' など）またはプリセット名
+
+    Returns:
+        numpy.ndarray: 前処理済み画像
+    """
+    pipeline = get_pipeline(image_class_or_preset)
+    outputs, _ = pipeline.run(image)
+    return outputs[pipeline.outputs[0]]
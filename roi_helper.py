@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+OCR範囲（ROI）ヘルパー
+カメラ画面でドラッグして指定した範囲だけを前処理・OCRする（値札・バーコードラベル用）
+範囲はプレビューのフレームに対する割合で保存する
+高解像度の静止画にはpreview_rect_in_frame()でプレビューの視野を静止画の座標に換算してから適用する
+"""
+import os
+import json
+import threading
+
+import cv2
+
+# 範囲の保存ファイル
+ROI_FILE = "ocr_roi.json"
+
+# これより小さい範囲（幅・高さのフレームに対する割合）はクリック・タップとみなして無視する
+MIN_ROI_FRACTION = 0.02
+
+
+class RegionOfInterest:
+    """
+    OCR範囲（左上・右下の座標をフレームに対する0〜1の割合で保持）
+    範囲が指定されていない場合はフレーム全体を使う
+    """
+
+    def __init__(self, roi_file=ROI_FILE):
+        self.roi_file = roi_file
+        self.box = None
+        self.load()
+
+    def load(self):
+        """保存ファイルを読み込む"""
+        try:
+            if self.roi_file and os.path.exists(self.roi_file):
+                with open(self.roi_file, 'r', encoding='utf-8') as f:
+                    box = json.load(f).get('box')
+                self.box = tuple(float(v) for v in box) if box else None
+        except Exception as e:
+            print(f"OCR範囲の読み込みエラー: {e}")
+            self.box = None
+
+    def save(self):
+        """保存ファイルに書き込む"""
+        if not self.roi_file:
+            return
+        try:
+            with open(self.roi_file, 'w', encoding='utf-8') as f:
+                json.dump({'box': [round(v, 4) for v in self.box] if self.box else None}, f)
+        except Exception as e:
+            print(f"OCR範囲の保存エラー: {e}")
+
+    @property
+    def active(self):
+        """範囲が指定されているか"""
+        return self.box is not None
+
+    def set_box(self, x0, y0, x1, y1):
+        """
+        範囲を設定して保存する（座標はフレームに対する割合）
+
+        Returns:
+            bool: 設定したか（小さすぎる範囲は無視する）
+        """
+        x0, x1 = sorted((min(max(x0, 0.0), 1.0), min(max(x1, 0.0), 1.0)))
+        y0, y1 = sorted((min(max(y0, 0.0), 1.0), min(max(y1, 0.0), 1.0)))
+        if x1 - x0 < MIN_ROI_FRACTION or y1 - y0 < MIN_ROI_FRACTION:
+            return False
+        self.box = (x0, y0, x1, y1)
+        self.save()
+        return True
+
+    def set_from_pixels(self, start, end, width, height):
+        """ドラッグの始点・終点（ピクセル）から範囲を設定する"""
+        return self.set_box(start[0] / float(width), start[1] / float(height),
+                            end[0] / float(width), end[1] / float(height))
+
+    def clear(self):
+        """範囲を解除してフレーム全体に戻す"""
+        self.box = None
+        self.save()
+
+    def pixel_box(self, width, height, frame_rect=None):
+        """
+        範囲をピクセル座標に変換する
+
+        Args:
+            width, height (int): 画像の大きさ
+            frame_rect (tuple): 画像の中でカメラ映像が写っている範囲 (x, y, w, h)（省略時は画像全体）
+
+        Returns:
+            tuple: (x, y, w, h)
+        """
+        fx, fy, fw, fh = frame_rect or (0, 0, width, height)
+        x0, y0, x1, y1 = self.box or (0.0, 0.0, 1.0, 1.0)
+        left = max(0, min(width - 1, int(round(fx + x0 * fw))))
+        top = max(0, min(height - 1, int(round(fy + y0 * fh))))
+        right = max(left + 1, min(width, int(round(fx + x1 * fw))))
+        bottom = max(top + 1, min(height, int(round(fy + y1 * fh))))
+        return left, top, right - left, bottom - top
+
+    def crop(self, image, frame_rect=None):
+        """範囲を切り出す（範囲が無い場合は画像をそのまま返す）"""
+        if not self.active and frame_rect is None:
+            return image
+        h, w = image.shape[:2]
+        x, y, rw, rh = self.pixel_box(w, h, frame_rect)
+        return image[y:y + rh, x:x + rw]
+
+
+def preview_rect_in_frame(preview_size, frame_size):
+    """
+    プレビューの視野が別の解像度のフレーム（静止画）のどこに写っているかを求める
+    縦横比が違う場合は、同じ中心で短い方の辺をそろえてセンサーから切り出しているとみなす
+    （例: 4:3のプレビューに対して16:9の静止画は上下が切れているため、はみ出した部分は負の座標になる）
+
+    Args:
+        preview_size (tuple): プレビューの (width, height)
+        frame_size (tuple): 静止画の (width, height)
+
+    Returns:
+        tuple or None: pixel_box()・crop()のframe_rectに渡す (x, y, w, h)
+                       縦横比が同じ場合はNone（割合をそのまま使える）
+    """
+    (pw, ph), (fw, fh) = preview_size, frame_size
+    if not (pw and ph and fw and fh):
+        return None
+    preview_aspect = pw / float(ph)
+    frame_aspect = fw / float(fh)
+    if abs(frame_aspect - preview_aspect) <= 0.02 * preview_aspect:
+        return None
+    if frame_aspect > preview_aspect:
+        # 静止画の方が横長: 幅をそろえ、プレビューの上下は静止画の外にはみ出す
+        height = fw / preview_aspect
+        return 0.0, (fh - height) / 2.0, float(fw), height
+    # 静止画の方が縦長: 高さをそろえ、プレビューの左右は静止画の外にはみ出す
+    width = fh * preview_aspect
+    return (fw - width) / 2.0, 0.0, width, float(fh)
+
+
+_roi = None
+_roi_lock = threading.Lock()
+
+
+def get_region_of_interest():
+    """共通のOCR範囲を取得"""
+    global _roi
+    with _roi_lock:
+        if _roi is None:
+            _roi = RegionOfInterest()
+        return _roi
+
+
+class RoiMouseSelector:
+    """
+    OpenCVのウィンドウ上で左ドラッグしてOCR範囲を指定する（右クリックで解除）
+    表示する画像はプレビューのフレームと同じ大きさであること
+    """
+
+    def __init__(self, roi, window_name):
+        self.roi = roi
+        self.window_name = window_name
+        self.frame_size = None
+        self._drag_start = None
+        self._drag_end = None
+        cv2.setMouseCallback(window_name, self.on_mouse)
+
+    def on_mouse(self, event, x, y, flags, param):
+        """マウスイベントの処理"""
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self._drag_start = self._drag_end = (x, y)
+        elif event == cv2.EVENT_MOUSEMOVE and self._drag_start is not None:
+            self._drag_end = (x, y)
+        elif event == cv2.EVENT_LBUTTONUP and self._drag_start is not None:
+            start, self._drag_start = self._drag_start, None
+            if self.frame_size and self.roi.set_from_pixels(start, (x, y), *self.frame_size):
+                w, h = self.frame_size
+                _, _, rw, rh = self.roi.pixel_box(w, h)
+                print(f"\n--- OCR範囲を設定しました: {rw}x{rh} ---")
+        elif event == cv2.EVENT_RBUTTONDOWN:
+            self._drag_start = None
+            if self.roi.active:
+                self.roi.clear()
+                print("\n--- OCR範囲を解除しました（フレーム全体） ---")
+
+    def draw(self, display_frame):
+        """範囲（ドラッグ中はその矩形）を表示用の画像に描画する"""
+        h, w = display_frame.shape[:2]
+        self.frame_size = (w, h)
+        if self._drag_start is not None:
+            cv2.rectangle(display_frame, self._drag_start, self._drag_end, (0, 200, 255), 1)
+        elif self.roi.active:
+            x, y, rw, rh = self.roi.pixel_box(w, h)
+            cv2.rectangle(display_frame, (x, y), (x + rw - 1, y + rh - 1), (0, 255, 0), 2)
+        return display_frame
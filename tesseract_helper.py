@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+常駐型Tesseractエンジンヘルパー
+言語モデルを一度だけ読み込み、NumPy配列を直接認識する
+常駐するのはtesserocrのバックエンドのみ
+tesserocrが無い環境ではpytesseractにフォールバックする（この場合は従来どおり呼び出しごとにプロセスを起動する）
+"""
+import os
+import sys
+import queue
+import time
+import shlex
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    from tesserocr import PyTessBaseAPI, RIL, iterate_level
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+
+def _find_tessdata_path():
+    """tesseract_cmdの設定からtessdataフォルダを推定する"""
+    prefix = os.environ.get('TESSDATA_PREFIX')
+    if prefix and os.path.isdir(prefix):
+        return prefix
+
+    if PYTESSERACT_AVAILABLE:
+        cmd = pytesseract.pytesseract.tesseract_cmd
+        candidate = os.path.join(os.path.dirname(cmd), 'tessdata')
+        if os.path.isdir(candidate):
+            return candidate
+
+    return None
+
+
+def parse_tesseract_config(config):
+    """
+    pytesseract形式の設定文字列を分解する
+
+    Args:
+        config (str): 例 '--psm 6 -c tessedit_char_whitelist=0123'
+
+    Returns:
+        tuple: (psm, 変数の辞書)
+    """
+    psm = None
+    variables = {}
+    tokens = shlex.split(config or '')
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '--psm' and i + 1 < len(tokens):
+            psm = int(tokens[i + 1])
+            i += 2
+        elif token == '-c' and i + 1 < len(tokens):
+            name, _, value = tokens[i + 1].partition('=')
+            variables[name] = value
+            i += 2
+        else:
+            i += 1
+    return psm, variables
+
+
+def _as_contiguous_uint8(image_np):
+    """Tesseractに渡せる連続したuint8配列に変換する"""
+    if image_np.dtype != np.uint8:
+        image_np = image_np.astype(np.uint8)
+    return np.ascontiguousarray(image_np)
+
+
+class TesseractEngine:
+    """
+    常駐型Tesseractエンジン（backendが'tesserocr'の場合のみ常駐し、'pytesseract'では呼び出しごとにプロセスを起動する）
+    1インスタンスは1スレッドからのみ使用すること（並列処理はTesseractEnginePoolを使用）
+    """
+
+    def __init__(self, lang='jpn'):
+        self.lang = lang
+        self.api = None
+        self.backend = None
+        self._initialize_engine()
+
+    def _initialize_engine(self):
+        """言語モデルを読み込んでエンジンを初期化"""
+        if TESSEROCR_AVAILABLE:
+            try:
+                tessdata = _find_tessdata_path()
+                if tessdata:
+                    self.api = PyTessBaseAPI(path=tessdata, lang=self.lang)
+                else:
+                    self.api = PyTessBaseAPI(lang=self.lang)
+                self.backend = 'tesserocr'
+                return
+            except Exception as e:
+                print(f"tesserocr初期化エラー（pytesseractを使用します）: {e}", file=sys.stderr)
+                self.api = None
+
+        if PYTESSERACT_AVAILABLE:
+            self.backend = 'pytesseract'
+        else:
+            raise RuntimeError("tesserocr / pytesseract のどちらも利用できません")
+
+    def _set_image(self, image_np):
+        """
+        NumPy配列をTesseractへ渡す
+        （PIL画像や一時ファイルは経由しないが、tesserocrのSetImageBytesはbytesを要求するため
+          tobytes()で画素データが1回コピーされる）
+        """
+        image_np = _as_contiguous_uint8(image_np)
+        height, width = image_np.shape[:2]
+        bytes_per_pixel = 1 if image_np.ndim == 2 else image_np.shape[2]
+        self.api.SetImageBytes(image_np.tobytes(), width, height,
+                               bytes_per_pixel, image_np.strides[0])
+
+    @contextmanager
+    def _configured(self, config):
+        """psmと変数を一時的に設定し、終了後に元へ戻す"""
+        psm, variables = parse_tesseract_config(config)
+        previous_psm = self.api.GetPageSegMode()
+        previous_vars = {}
+        try:
+            if psm is not None:
+                self.api.SetPageSegMode(psm)
+            for name, value in variables.items():
+                previous_vars[name] = self.api.GetVariableAsString(name)
+                self.api.SetVariable(name, value)
+            yield
+        finally:
+            self.api.SetPageSegMode(previous_psm)
+            for name, value in previous_vars.items():
+                self.api.SetVariable(name, value if value is not None else '')
+            self.api.Clear()
+
+    def image_to_string(self, image_np, config=''):
+        """
+        画像からテキストを抽出する
+
+        Args:
+            image_np (numpy.ndarray): グレースケールまたはカラー画像
+            config (str): pytesseract形式の設定文字列
+
+        Returns:
+            str: 抽出されたテキスト
+        """
+        if self.backend == 'pytesseract':
+            return pytesseract.image_to_string(image_np, lang=self.lang, config=config)
+
+        with self._configured(config):
+            self._set_image(image_np)
+            return self.api.GetUTF8Text()
+
+    def image_to_data(self, image_np, config='', timeout=None):
+        """
+        単語ごとの位置・信頼度を取得する（pytesseract.Output.DICTと同じキー）
+
+        Args:
+            image_np (numpy.ndarray): グレースケールまたはカラー画像
+            config (str): pytesseract形式の設定文字列
+            timeout (float): 認識の最大時間（秒）。超えた場合はRuntimeError（Noneで無制限）
+
+        Returns:
+            dict: level, block_num, par_num, line_num, word_num,
+                  left, top, width, height, conf, text のリスト
+        """
+        if self.backend == 'pytesseract':
+            # pytesseractはtimeoutを超えるとプロセスを止めてRuntimeErrorを送出する
+            return pytesseract.image_to_data(image_np, lang=self.lang, config=config,
+                                             output_type=pytesseract.Output.DICT,
+                                             timeout=timeout or 0)
+
+        keys = ['level', 'block_num', 'par_num', 'line_num', 'word_num',
+                'left', 'top', 'width', 'height', 'conf', 'text']
+        data = {key: [] for key in keys}
+
+        with self._configured(config):
+            self._set_image(image_np)
+            # tesserocrのRecognizeは時間切れの場合Falseを返す（0は無制限）
+            timeout_ms = max(1, int(timeout * 1000)) if timeout is not None else 0
+            if not self.api.Recognize(timeout_ms):
+                raise RuntimeError("Tesseractの認識が時間内に終わりませんでした")
+            iterator = self.api.GetIterator()
+            block_num = par_num = line_num = word_num = 0
+            for word in iterate_level(iterator, RIL.WORD):
+                if word.IsAtBeginningOf(RIL.BLOCK):
+                    block_num += 1
+                    par_num = line_num = 0
+                if word.IsAtBeginningOf(RIL.PARA):
+                    par_num += 1
+                    line_num = 0
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line_num += 1
+                    word_num = 0
+                word_num += 1
+
+                box = word.BoundingBox(RIL.WORD)
+                if box is None:
+                    continue
+                left, top, right, bottom = box
+                data['level'].append(5)
+                data['block_num'].append(block_num)
+                data['par_num'].append(par_num)
+                data['line_num'].append(line_num)
+                data['word_num'].append(word_num)
+                data['left'].append(left)
+                data['top'].append(top)
+                data['width'].append(right - left)
+                data['height'].append(bottom - top)
+                data['conf'].append(word.Confidence(RIL.WORD))
+                data['text'].append(word.GetUTF8Text(RIL.WORD) or '')
+
+        return data
+
+    def close(self):
+        """エンジンを解放"""
+        if self.api is not None:
+            self.api.End()
+            self.api = None
+
+
+class TesseractEnginePool:
+    """
+    スレッドセーフなTesseractエンジンプール
+    エンジンは必要になった時点で最大max_engines個まで生成され、以後は再利用される
+    """
+
+    def __init__(self, lang='jpn', max_engines=None):
+        self.lang = lang
+        self.max_engines = max_engines or max(1, os.cpu_count() or 1)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout=None):
+        """
+        空いているエンジンを取得（無ければ生成、上限なら待機）
+        timeout（秒）までに空かなければRuntimeError
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_engines:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return TesseractEngine(self.lang)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError("空いているTesseractエンジンが時間内にありませんでした")
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """with文でエンジンを借りる（timeoutは空きを待つ最大時間）"""
+        engine = self._acquire(timeout)
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def image_to_string(self, image_np, config=''):
+        """プールのエンジンでテキストを抽出する"""
+        with self.engine() as engine:
+            return engine.image_to_string(image_np, config=config)
+
+    def image_to_data(self, image_np, config='', timeout=None):
+        """
+        プールのエンジンで単語データを取得する
+        timeout（秒）はエンジンの空き待ちと認識の合計の上限
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.engine(timeout) as engine:
+            remaining = None if deadline is None else max(0.001, deadline - time.perf_counter())
+            return engine.image_to_data(image_np, config=config, timeout=remaining)
+
+    def close(self):
+        """待機中のエンジンをすべて解放"""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            engine.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_tesseract_pool(lang='jpn'):
+    """言語ごとのプロセス共通エンジンプールを取得する"""
+    with _pools_lock:
+        pool = _pools.get(lang)
+        if pool is None:
+            pool = TesseractEnginePool(lang)
+            _pools[lang] = pool
+        return pool
+
+
+def recognize_text(image_np, lang='jpn', config=''):
+    """
+    常駐エンジンでNumPy画像からテキストを抽出する
+
+    Args:
+        image_np (numpy.ndarray): 入力画像
+        lang (str): 言語
+        config (str): pytesseract形式の設定文字列
+
+    Returns:
+        str: 抽出されたテキスト
+    """
+    return get_tesseract_pool(lang).image_to_string(image_np, config=config)
+
+
+def recognize_data(image_np, lang='jpn', config='', timeout=None):
+    """
+    常駐エンジンでNumPy画像から単語データを取得する
+    timeout（秒）を超えた場合はRuntimeError
+    """
+    return get_tesseract_pool(lang).image_to_data(image_np, config=config, timeout=timeout)
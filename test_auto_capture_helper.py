@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+auto_capture_helperの単体テスト
+実行: python -m unittest test_auto_capture_helper  または  python -m pytest test_auto_capture_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import unittest
+
+try:
+    import cv2  # noqa: F401  auto_capture_helperの読み込みに必要
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+def checkerboard(size=64, cell=4, inverted=False):
+    """鮮明な（ラプラシアン分散の大きい）テスト画像"""
+    y, x = np.indices((size, size))
+    board = (((x // cell) + (y // cell)) % 2 * 255).astype(np.uint8)
+    return 255 - board if inverted else board
+
+
+@requires_cv2
+class AutoCaptureTriggerTest(unittest.TestCase):
+    """AutoCaptureTrigger"""
+
+    def _trigger(self):
+        from auto_capture_helper import AutoCaptureTrigger
+        return AutoCaptureTrigger(stable_frames=3)
+
+    def test_fires_after_stable_sharp_frames(self):
+        trigger = self._trigger()
+        frame = checkerboard()
+        # 1枚目は前フレームが無いため動きありとみなす
+        self.assertEqual([trigger.update(frame) for _ in range(4)], [False, False, False, True])
+        self.assertIn("captured", trigger.status_text())
+
+    def test_does_not_refire_until_scene_changes(self):
+        trigger = self._trigger()
+        frame = checkerboard()
+        for _ in range(4):
+            trigger.update(frame)
+        self.assertFalse(any(trigger.update(frame) for _ in range(10)))
+
+        other = checkerboard(inverted=True)
+        self.assertEqual([trigger.update(other) for _ in range(4)], [False, False, False, True])
+
+    def test_blurry_frames_never_fire(self):
+        trigger = self._trigger()
+        flat = np.full((64, 64), 128, dtype=np.uint8)
+        self.assertFalse(any(trigger.update(flat) for _ in range(10)))
+        self.assertEqual(trigger.sharpness, 0.0)
+
+    def test_moving_frames_never_fire(self):
+        trigger = self._trigger()
+        frames = [checkerboard(), checkerboard(inverted=True)]
+        self.assertFalse(any(trigger.update(frames[i % 2]) for i in range(10)))
+
+    def test_color_frames_and_reset(self):
+        trigger = self._trigger()
+        frame = np.dstack([checkerboard()] * 3)
+        for _ in range(4):
+            trigger.update(frame)
+        trigger.reset()
+        self.assertIsNone(trigger.fired_reference)
+        self.assertEqual(trigger.status_text().split()[1], "0/3")
+        self.assertEqual([trigger.update(frame) for _ in range(4)], [False, False, False, True])
+
+    def test_crop_size_change_starts_over(self):
+        trigger = self._trigger()
+        for _ in range(4):
+            trigger.update(checkerboard(64))
+        self.assertIsNotNone(trigger.fired_reference)
+        # OCR範囲が変わって切り出す大きさが変わっても例外にならず、別のシーンとして評価し直す
+        smaller = checkerboard(48)
+        self.assertEqual([trigger.update(smaller) for _ in range(4)], [False, False, False, True])
+        self.assertEqual(trigger.fired_reference.shape, (48, 48))
+
+
+if __name__ == '__main__':
+    unittest.main()
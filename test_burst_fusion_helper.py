@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+burst_fusion_helperの単体テスト（カメラは使わない）
+実行: python -m unittest test_burst_fusion_helper  または  python -m pytest test_burst_fusion_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import types
+import unittest
+
+try:
+    import cv2  # noqa: F401  burst_fusion_helperの読み込みに必要
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+def _frames():
+    return [np.full((4, 4), value, dtype=np.uint8) for value in (0, 10, 200)]
+
+
+@requires_cv2
+class FuseFramesTest(unittest.TestCase):
+    """fuse_frames"""
+
+    def test_median_ignores_outlier(self):
+        from burst_fusion_helper import fuse_frames
+        fused = fuse_frames(_frames(), method='median')
+        self.assertEqual(fused.dtype, np.uint8)
+        self.assertTrue((fused == 10).all())
+
+    def test_mean(self):
+        from burst_fusion_helper import fuse_frames
+        fused = fuse_frames(_frames(), method='mean')
+        self.assertEqual(fused.dtype, np.uint8)
+        self.assertTrue((fused == 70).all())
+
+    def test_single_frame_is_returned_as_is(self):
+        from burst_fusion_helper import fuse_frames
+        frame = _frames()[0]
+        self.assertIs(fuse_frames([frame]), frame)
+
+
+@requires_cv2
+class CaptureFusedTest(unittest.TestCase):
+    """capture_fused（capture_burstだけを持つ代わりのカメラで確認）"""
+
+    def _camera(self, frames):
+        return types.SimpleNamespace(capture_burst=lambda count: frames[:count])
+
+    def test_no_frames_gives_none(self):
+        from burst_fusion_helper import capture_fused
+        self.assertEqual(capture_fused(self._camera([])), (None, None))
+
+    def test_color_frames_are_fused_to_bgr(self):
+        from burst_fusion_helper import capture_fused
+        texture = np.random.RandomState(0).randint(0, 256, (32, 32)).astype(np.uint8)
+        frames = [np.dstack([texture] * 3) for _ in range(3)]
+        fused, info = capture_fused(self._camera(frames), count=3, fusion='median')
+        self.assertEqual(fused.shape, (32, 32, 3))
+        self.assertEqual((info['frames'], info['fusion']), (3, 'median'))
+
+
+@requires_cv2
+class CameraDeadlineTest(unittest.TestCase):
+    """deadline_ocr_helper.camera_deadline_ms（合成済みのフレームは上限を長くする）"""
+
+    def test_fused_frames_get_burst_deadline(self):
+        from deadline_ocr_helper import (BURST_OCR_DEADLINE_MS, CAMERA_OCR_DEADLINE_MS,
+                                         DEFAULT_TIER_LATENCY_MS, camera_deadline_ms)
+        self.assertEqual(camera_deadline_ms(), CAMERA_OCR_DEADLINE_MS)
+        self.assertEqual(camera_deadline_ms(fused=True), BURST_OCR_DEADLINE_MS)
+        self.assertGreaterEqual(BURST_OCR_DEADLINE_MS, DEFAULT_TIER_LATENCY_MS['improved_burst'])
+
+
+if __name__ == '__main__':
+    unittest.main()
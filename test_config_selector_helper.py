@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+config_selector_helperの単体テスト（保存ファイルは使わない）
+実行: python -m unittest test_config_selector_helper  または  python -m pytest test_config_selector_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import unittest
+
+try:
+    import cv2  # noqa: F401  config_selector_helperの読み込みに必要
+    import numpy  # noqa: F401
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+@requires_cv2
+class ConfigSelectorTest(unittest.TestCase):
+    """ConfigSelector"""
+
+    FEATURES = {'contrast': 45.0, 'density': 0.1, 'aspect': 1.3, 'brightness': 120.0}
+
+    def _selector(self):
+        from config_selector_helper import ConfigSelector
+        return ConfigSelector(model_file=None, min_samples=3)
+
+    def test_feature_bucket_and_combo_key(self):
+        from config_selector_helper import combo_key, feature_bucket
+        self.assertEqual(feature_bucket('receipt', self.FEATURES), 'receipt|c1|d1|a1|b1')
+        self.assertEqual(combo_key('otsu', 3), 'otsu:3')
+
+    def test_no_prediction_until_min_samples(self):
+        selector = self._selector()
+        for _ in range(2):
+            selector.record('receipt', self.FEATURES, [('otsu', 0, 50.0), ('adaptive', 3, 80.0)])
+        self.assertIsNone(selector.predict('receipt', self.FEATURES))
+
+    def test_predicts_combo_with_best_mean_confidence(self):
+        selector = self._selector()
+        for _ in range(3):
+            selector.record('receipt', self.FEATURES, [('otsu', 0, 50.0), ('adaptive', 3, 80.0)])
+        prediction = selector.predict('receipt', self.FEATURES)
+        self.assertEqual((prediction['preprocess'], prediction['config']), ('adaptive', 3))
+        self.assertAlmostEqual(prediction['confidence'], 80.0)
+        self.assertEqual(prediction['samples'], 3)
+
+    def test_falls_back_to_image_class_bucket(self):
+        selector = self._selector()
+        for _ in range(3):
+            selector.record('receipt', self.FEATURES, [('otsu', 0, 70.0)])
+        other = dict(self.FEATURES, contrast=90.0, brightness=200.0)
+        prediction = selector.predict('receipt', other)
+        self.assertEqual(prediction['bucket'], 'receipt|*')
+        self.assertIsNone(selector.predict('document', self.FEATURES))
+
+
+if __name__ == '__main__':
+    unittest.main()
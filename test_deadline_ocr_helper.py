@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+deadline_ocr_helperのティア選択の単体テスト（OCRと履歴ファイルは使わない）
+実行: python -m unittest test_deadline_ocr_helper  または  python -m pytest test_deadline_ocr_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import unittest
+from unittest import mock
+
+try:
+    import cv2  # noqa: F401  deadline_ocr_helperの読み込みに必要
+    import numpy  # noqa: F401
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+def _history(samples):
+    from deadline_ocr_helper import LatencyHistory
+    history = LatencyHistory(history_file=None)
+    for tier, values in samples.items():
+        for ms in values:
+            history.record(tier, ms)
+    return history
+
+
+@requires_cv2
+class LatencyHistoryTest(unittest.TestCase):
+    """LatencyHistory"""
+
+    def test_estimate_uses_default_without_samples(self):
+        from deadline_ocr_helper import DEFAULT_TIER_LATENCY_MS
+        history = _history({})
+        self.assertEqual(history.estimate('improved'), DEFAULT_TIER_LATENCY_MS['improved'])
+        self.assertFalse(history.has_samples('improved'))
+
+    def test_estimate_is_percentile_of_recent_samples(self):
+        history = _history({'fast': range(1, 11)})
+        self.assertEqual(history.estimate('fast', percentile=90), 10)
+        self.assertEqual(history.estimate('fast', percentile=50), 6)
+
+    def test_window_drops_old_samples(self):
+        from deadline_ocr_helper import LatencyHistory
+        history = LatencyHistory(history_file=None, window=3)
+        for ms in (5000, 100, 100, 100):
+            history.record('fast', ms)
+        self.assertEqual(history.estimate('fast', percentile=100), 100)
+
+
+@requires_cv2
+class ChooseTierTest(unittest.TestCase):
+    """choose_tier / probe_tiers"""
+
+    TIERS = {'fast': None, 'improved': None, 'vision': None}
+
+    def test_picks_most_accurate_within_deadline(self):
+        from deadline_ocr_helper import choose_tier
+        tiers = {'fast': None, 'improved': None}
+        slow = _history({'fast': [100], 'improved': [3000]})
+        self.assertEqual(choose_tier(tiers, 500, history=slow), 'fast')
+        quick = _history({'fast': [100], 'improved': [400]})
+        self.assertEqual(choose_tier(tiers, 500, history=quick), 'improved')
+
+    def test_unmeasured_tier_over_deadline_is_not_chosen(self):
+        from deadline_ocr_helper import choose_tier
+        history = _history({'fast': [100]})
+        # improvedの既定の見積もり（3000ms）・visionの既定の見積もり（800ms）は500msを超える
+        self.assertEqual(choose_tier(self.TIERS, 500, history=history), 'fast')
+        # 既定の見積もりが締め切り内なら履歴が無くても選ぶ
+        self.assertEqual(choose_tier(self.TIERS, 1000, history=history), 'vision')
+
+    def test_unmeasured_tier_is_probed_in_background(self):
+        import deadline_ocr_helper
+        history = _history({'fast': [100]})
+        with mock.patch.object(deadline_ocr_helper, '_probe_executor') as executor:
+            deadline_ocr_helper.probe_tiers('image', self.TIERS, 'fast', 500, history=history)
+        args = executor.submit.call_args[0]
+        self.assertEqual(args[2], 'vision')
+
+    def test_uses_history_key(self):
+        from deadline_ocr_helper import choose_tier
+
+        def burst(image_np, deadline=None):
+            return None
+        burst.history_key = 'improved_burst'
+
+        tiers = {'fast': None, 'improved': burst}
+        history = _history({'fast': [100], 'improved': [100], 'improved_burst': [3000]})
+        self.assertEqual(choose_tier(tiers, 500, history=history), 'fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
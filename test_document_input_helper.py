@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+document_input_helperのページ単位のOCRの単体テスト（ラスタライズはiter_pagesの置き換えで代用する）
+実行: python -m unittest test_document_input_helper  または  python -m pytest test_document_input_helper.py
+numpy / PIL が無い環境ではスキップする
+"""
+import threading
+import unittest
+from unittest import mock
+
+try:
+    import numpy  # noqa: F401  document_input_helperの読み込みに必要
+    import PIL  # noqa: F401
+    DOCUMENT_AVAILABLE = True
+except ImportError:
+    DOCUMENT_AVAILABLE = False
+
+requires_document = unittest.skipUnless(DOCUMENT_AVAILABLE, "numpy / PIL が必要です")
+
+
+@requires_document
+class IterDocumentOCRTest(unittest.TestCase):
+    """iter_document_ocr"""
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.rasterized = 0
+        self.finished = 0
+        self.max_alive = 0
+
+    def _pages(self, count):
+        """ページを1枚ずつ返し、OCRが終わっていないページ数の最大を記録する"""
+        def iter_pages(path, dpi=None):
+            for page in range(1, count + 1):
+                with self.lock:
+                    self.rasterized += 1
+                    self.max_alive = max(self.max_alive, self.rasterized - self.finished)
+                yield page, f"{path}:{page}"
+        return iter_pages
+
+    def _ocr(self, image):
+        with self.lock:
+            self.finished += 1
+        return image.upper()
+
+    def _run(self, count, max_workers):
+        from document_input_helper import iter_document_ocr
+        with mock.patch('document_input_helper.iter_pages', self._pages(count)):
+            return list(iter_document_ocr('doc', self._ocr, max_workers=max_workers))
+
+    def test_results_are_in_page_order(self):
+        results = self._run(7, max_workers=3)
+        self.assertEqual(results, [(page, f"DOC:{page}") for page in range(1, 8)])
+
+    def test_rasterized_pages_are_bounded(self):
+        self._run(20, max_workers=2)
+        self.assertLessEqual(self.max_alive, 3)
+
+    def test_error_is_raised_for_failed_page(self):
+        from document_input_helper import iter_document_ocr
+
+        def ocr(image):
+            if image.endswith(':2'):
+                raise ValueError("読み取れません")
+            return image
+
+        with mock.patch('document_input_helper.iter_pages', self._pages(3)):
+            results = iter_document_ocr('doc', ocr, max_workers=1)
+            self.assertEqual(next(results), (1, 'doc:1'))
+            with self.assertRaises(ValueError):
+                next(results)
+
+
+@requires_document
+class IterPageTasksTest(unittest.TestCase):
+    """iter_page_tasks / task_key"""
+
+    def test_documents_are_expanded_to_pages(self):
+        from document_input_helper import iter_page_tasks
+
+        def page_count(path):
+            if path == 'broken.pdf':
+                raise RuntimeError("壊れています")
+            return 2
+
+        with mock.patch('document_input_helper.page_count', page_count):
+            tasks = list(iter_page_tasks(['a.png', 'doc.pdf', 'broken.pdf']))
+        self.assertEqual(tasks, [('a.png', None), ('doc.pdf', 1), ('doc.pdf', 2), ('broken.pdf', None)])
+
+    def test_task_key(self):
+        from document_input_helper import task_key
+        self.assertEqual(task_key('a.png', None), 'a.png')
+        self.assertEqual(task_key('doc.pdf', 3), 'doc.pdf#3')
+
+
+if __name__ == '__main__':
+    unittest.main()
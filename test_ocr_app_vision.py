@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_app_visionのバッチ処理の単体テスト（Vision APIには接続しない）
+実行: python -m unittest test_ocr_app_vision  または  python -m pytest test_ocr_app_vision.py
+ocr_app_visionを読み込めない環境（cv2 / numpy / pytesseract / PIL が無い）ではスキップする
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    import cv2
+    import numpy as np
+    import ocr_app_vision
+    OCR_APP_VISION_AVAILABLE = True
+except ImportError:
+    OCR_APP_VISION_AVAILABLE = False
+
+requires_ocr_app_vision = unittest.skipUnless(OCR_APP_VISION_AVAILABLE, "ocr_app_visionの依存パッケージが必要です")
+
+
+@requires_ocr_app_vision
+class GroupVisionBatchesTest(unittest.TestCase):
+    """group_vision_batches"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = [self._write(f"image{i}.png", b'x' * 10) for i in range(3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_split_by_image_count(self):
+        batches = list(ocr_app_vision.group_vision_batches([(p, None) for p in self.paths], max_images=2))
+        self.assertEqual([[item[0] for item in batch] for batch in batches], [[0, 1], [2]])
+        self.assertEqual(batches[0][0], (0, self.paths[0], None, b'x' * 10, None))
+
+    def test_split_by_total_bytes(self):
+        batches = list(ocr_app_vision.group_vision_batches([(p, None) for p in self.paths], max_bytes=25))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+
+    def test_unreadable_file_is_reported_in_batch(self):
+        missing = os.path.join(self.directory, "missing.png")
+        batches = list(ocr_app_vision.group_vision_batches([(missing, None), (self.paths[0], None)]))
+        self.assertEqual(len(batches), 1)
+        index, path, page, content, error = batches[0][0]
+        self.assertEqual((index, path, content), (0, missing, None))
+        self.assertTrue(error)
+
+    def _oversized_png(self):
+        ok, encoded = cv2.imencode('.png', np.zeros((8, 8), dtype=np.uint8))
+        return self._write("large.png", encoded.tobytes())
+
+    def test_oversized_file_is_reencoded(self):
+        path = self._oversized_png()
+        with mock.patch('ocr_app_vision.encode_for_upload', return_value=(b'small', {})) as encode:
+            batches = list(ocr_app_vision.group_vision_batches([(path, None)], max_bytes=20))
+        encode.assert_called_once()
+        self.assertEqual(batches[0][0][3:], (b'small', None))
+
+    def test_file_still_too_large_is_not_sent(self):
+        path = self._oversized_png()
+        with mock.patch('ocr_app_vision.encode_for_upload', return_value=(b'y' * 30, {})):
+            batches = list(ocr_app_vision.group_vision_batches([(path, None)], max_bytes=20))
+        _, _, _, content, error = batches[0][0]
+        self.assertIsNone(content)
+        self.assertTrue(error)
+
+    def test_failed_file_is_not_sent_to_client(self):
+        client = mock.Mock()
+        batch = [(0, 'large.png', None, None, "画像が大きすぎます")]
+        records = ocr_app_vision._annotate_vision_batch(client, batch)
+        client.batch_annotate_images.assert_not_called()
+        self.assertEqual(records[0]['error'], "画像が大きすぎます")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_batch_helperの単体テスト（OCRはこのモジュールのocr_image_recordで置き換える）
+実行: python -m unittest test_ocr_batch_helper  または  python -m pytest test_ocr_batch_helper.py
+numpy / PIL が無い環境ではスキップする
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy  # noqa: F401  document_input_helperの読み込みに必要
+    import PIL  # noqa: F401
+    BATCH_AVAILABLE = True
+except ImportError:
+    BATCH_AVAILABLE = False
+
+requires_batch = unittest.skipUnless(BATCH_AVAILABLE, "numpy / PIL が必要です")
+
+
+def ocr_image_record(path):
+    """run_batch_ocrのワーカーから呼ばれる疑似OCR（bad.pngは失敗する）"""
+    if os.path.basename(path) == 'bad.png':
+        raise RuntimeError("読み込めません")
+    return {'text': os.path.basename(path), 'confidence': 90.0, 'engine': 'fake'}
+
+
+def _read_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@requires_batch
+class BatchResumeTest(unittest.TestCase):
+    """load_done_paths / open_jsonl_output / run_batch_ocrの再開"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.images = os.path.join(self.directory, "images")
+        os.mkdir(self.images)
+        for name in ('a.png', 'b.png', 'bad.png', 'notes.txt'):
+            with open(os.path.join(self.images, name), 'wb') as f:
+                f.write(b'x')
+        self.output = os.path.join(self.directory, "result.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.images, name)
+
+    def test_collect_image_paths_filters_extensions(self):
+        from ocr_batch_helper import collect_image_paths
+        self.assertEqual(collect_image_paths([self.images]),
+                         [self._path('a.png'), self._path('b.png'), self._path('bad.png')])
+
+    def test_load_done_paths_skips_errors_and_truncated_line(self):
+        from ocr_batch_helper import load_done_paths
+        with open(self.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'path': 'a.png', 'text': 'a', 'error': None}) + '\n')
+            f.write(json.dumps({'path': 'bad.png', 'text': None, 'error': 'x'}) + '\n')
+            f.write(json.dumps({'path': 'doc.pdf', 'page': 2, 'text': 'p', 'error': None}) + '\n')
+            f.write('{"path": "b.png", "te')
+        self.assertEqual(load_done_paths(self.output), {'a.png', 'doc.pdf#2'})
+        self.assertEqual(load_done_paths(os.path.join(self.directory, "missing.jsonl")), set())
+
+    def test_open_jsonl_output_ends_truncated_line(self):
+        from ocr_batch_helper import open_jsonl_output, write_jsonl_record
+        with open(self.output, 'w', encoding='utf-8') as f:
+            f.write('{"path": "b.png", "te')
+        output = open_jsonl_output(self.output)
+        write_jsonl_record(output, {'path': 'c.png'})
+        output.close()
+        with open(self.output, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines()[-1], '{"path": "c.png"}')
+
+    def test_resume_only_retries_unfinished_images(self):
+        from ocr_batch_helper import run_batch_ocr
+        first = run_batch_ocr([self.images], self.output, module_name=__name__, workers=2)
+        self.assertEqual((first['total'], first['skipped'], first['processed'], first['errors']),
+                         (3, 0, 3, 1))
+
+        second = run_batch_ocr([self.images], self.output, module_name=__name__, workers=2)
+        self.assertEqual((second['total'], second['skipped'], second['processed'], second['errors']),
+                         (3, 2, 1, 1))
+        records = _read_records(self.output)
+        self.assertEqual(len(records), 4)
+        self.assertEqual([r['path'] for r in records[3:]], [self._path('bad.png')])
+        self.assertEqual({r['text'] for r in records if not r['error']}, {'a.png', 'b.png'})
+
+    def test_no_resume_processes_everything_again(self):
+        from ocr_batch_helper import run_batch_ocr
+        run_batch_ocr([self.images], self.output, module_name=__name__, workers=1)
+        again = run_batch_ocr([self.images], self.output, module_name=__name__, workers=1, resume=False)
+        self.assertEqual((again['skipped'], again['processed']), (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_cache_helperの単体テスト
+実行: python -m unittest test_ocr_cache_helper  または  python -m pytest test_ocr_cache_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+try:
+    import cv2  # noqa: F401  ocr_cache_helperの読み込みに必要
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+@requires_cv2
+class MakeCacheKeyTest(unittest.TestCase):
+    """make_cache_key"""
+
+    def test_same_pixels_and_settings_give_same_key(self):
+        from ocr_cache_helper import make_cache_key
+        image = np.zeros((4, 4), dtype=np.uint8)
+        self.assertEqual(make_cache_key(image, lang='jpn', psm=6),
+                         make_cache_key(image.copy(), psm=6, lang='jpn'))
+
+    def test_pixels_shape_and_settings_change_key(self):
+        from ocr_cache_helper import make_cache_key
+        image = np.zeros((4, 4), dtype=np.uint8)
+        key = make_cache_key(image, lang='jpn')
+        changed = image.copy()
+        changed[0, 0] = 1
+        self.assertNotEqual(key, make_cache_key(changed, lang='jpn'))
+        self.assertNotEqual(key, make_cache_key(image.reshape(2, 8), lang='jpn'))
+        self.assertNotEqual(key, make_cache_key(image, lang='eng'))
+
+
+@requires_cv2
+class MakeFileCacheKeyTest(unittest.TestCase):
+    """make_file_cache_key（画像をデコードせずファイルのバイト列から作る）"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_same_bytes_and_settings_give_same_key(self):
+        from ocr_cache_helper import make_file_cache_key
+        first = self._write('a.png', b'0123456789' * 10)
+        copy = self._write('b.png', b'0123456789' * 10)
+        self.assertEqual(make_file_cache_key(first, lang='jpn', tiled=True),
+                         make_file_cache_key(copy, chunk_size=7, tiled=True, lang='jpn'))
+
+    def test_bytes_and_settings_change_key(self):
+        from ocr_cache_helper import make_file_cache_key
+        path = self._write('a.png', b'0123456789')
+        key = make_file_cache_key(path, lang='jpn')
+        self.assertNotEqual(key, make_file_cache_key(self._write('b.png', b'0123456780'), lang='jpn'))
+        self.assertNotEqual(key, make_file_cache_key(path, lang='jpn', tiled=True))
+
+
+@requires_cv2
+class OCRCacheTest(unittest.TestCase):
+    """OCRCacheのメモリ層・ディスク層"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "ocr_cache.db")
+        # 最終アクセス時刻が同じにならないよう、1ずつ増える時計に置き換える
+        clock = itertools.count(1.0)
+        patcher = mock.patch('ocr_cache_helper.time', types.SimpleNamespace(time=lambda: next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _cache(self, **kwargs):
+        from ocr_cache_helper import OCRCache
+        cache = OCRCache(**kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        cache = self._cache(db_path=None, max_entries=2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('c', 'C')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('A', 'C'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_none_is_not_cached(self):
+        cache = self._cache(db_path=None)
+        cache.put('a', None)
+        self.assertIsNone(cache.get('a'))
+        cache.put('b', '')
+        self.assertEqual(cache.get('b'), '')
+
+    def test_disk_tier_persists_across_instances(self):
+        cache = self._cache(db_path=self.db_path)
+        cache.put('key', '値札 100円')
+        cache.close()
+
+        reopened = self._cache(db_path=self.db_path)
+        self.assertEqual(reopened.get('key'), '値札 100円')
+        self.assertIn('key', reopened.memory)
+
+    def test_disk_tier_evicts_least_recently_accessed(self):
+        # 1件の大きさはキー2文字+テキスト10バイトの12、上限30なので2件まで残る
+        cache = self._cache(db_path=self.db_path, max_entries=0, max_disk_bytes=30)
+        cache.put('k1', 'x' * 10)
+        cache.put('k2', 'x' * 10)
+        self.assertEqual(cache.get('k1'), 'x' * 10)
+        cache.put('k3', 'x' * 10)
+        self.assertIsNone(cache.get('k2'))
+        self.assertEqual(cache.get('k1'), 'x' * 10)
+        self.assertEqual(cache.get('k3'), 'x' * 10)
+
+    def test_clear_removes_both_tiers(self):
+        cache = self._cache(db_path=self.db_path)
+        cache.put('key', 'text')
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(self._cache(db_path=self.db_path).get('key'))
+
+
+@requires_cv2
+class PerceptualHashCacheTest(unittest.TestCase):
+    """PerceptualHashCacheのハミング距離による照合"""
+
+    def _gradient(self):
+        """左から右へ明るくなる画像（dHashの全ビットが1になる）"""
+        return np.tile(np.linspace(0, 255, 68).astype(np.uint8), (64, 1))
+
+    def test_hamming_distance(self):
+        from ocr_cache_helper import hamming_distance
+        self.assertEqual(hamming_distance(0b1011, 0b0001), 2)
+        self.assertEqual(hamming_distance(5, 5), 0)
+
+    def test_dhash_bits(self):
+        from ocr_cache_helper import dhash
+        frame = self._gradient()
+        self.assertEqual(dhash(frame, 16), (1 << 256) - 1)
+        self.assertEqual(dhash(255 - frame, 16), 0)
+
+    def test_lookup_within_max_distance(self):
+        from ocr_cache_helper import PerceptualHashCache, dhash
+        cache = PerceptualHashCache(max_distance=3)
+        frame = self._gradient()
+        cache.entries[dhash(frame, cache.hash_size) ^ 0b111] = 'near'
+        self.assertEqual(cache.lookup(frame), 'near')
+
+        strict = PerceptualHashCache(max_distance=2)
+        strict.entries[dhash(frame, strict.hash_size) ^ 0b111] = 'near'
+        self.assertIsNone(strict.lookup(frame))
+
+    def test_lookup_prefers_closest_entry(self):
+        from ocr_cache_helper import PerceptualHashCache, dhash
+        cache = PerceptualHashCache(max_distance=10)
+        frame = self._gradient()
+        frame_hash = dhash(frame, cache.hash_size)
+        cache.entries[frame_hash ^ 0b1111] = 'far'
+        cache.entries[frame_hash ^ 0b1] = 'close'
+        self.assertEqual(cache.lookup(frame), 'close')
+
+    def test_different_scene_and_empty_text(self):
+        from ocr_cache_helper import PerceptualHashCache
+        cache = PerceptualHashCache()
+        frame = self._gradient()
+        cache.add(frame, '')
+        self.assertIsNone(cache.lookup(frame))
+        cache.add(frame, '値札 100円')
+        self.assertEqual(cache.lookup(frame), '値札 100円')
+        self.assertIsNone(cache.lookup(255 - frame))
+
+    def test_oldest_scene_is_evicted(self):
+        from ocr_cache_helper import PerceptualHashCache
+        cache = PerceptualHashCache(max_entries=1)
+        frame = self._gradient()
+        cache.add(frame, 'first')
+        cache.add(255 - frame, 'second')
+        self.assertIsNone(cache.lookup(frame))
+        self.assertEqual(cache.lookup(255 - frame), 'second')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_improvedの探索の単体テスト（前処理とTesseractは置き換える）
+実行: python -m unittest test_ocr_improved  または  python -m pytest test_ocr_improved.py
+ocr_improvedを読み込めない環境（cv2 / numpy / pytesseract / PIL が無い）ではスキップする
+"""
+import unittest
+from unittest import mock
+
+try:
+    import ocr_improved
+    OCR_IMPROVED_AVAILABLE = True
+except ImportError:
+    OCR_IMPROVED_AVAILABLE = False
+
+requires_ocr_improved = unittest.skipUnless(OCR_IMPROVED_AVAILABLE, "ocr_improvedの依存パッケージが必要です")
+
+
+class FakePipeline:
+    """前処理の出力名をそのまま画像の代わりに返すパイプライン"""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def run(self, image, outputs=None):
+        return {name: name for name in (outputs or self.outputs)}, {}
+
+
+def fake_get_pipeline(image_class):
+    if image_class == 'light':
+        return FakePipeline(['otsu', 'adaptive'])
+    return FakePipeline(['adaptive_gaussian', 'adaptive_mean', 'otsu'])
+
+
+def fake_recognizer(confidences):
+    """前処理名ごとに決まった信頼度の1単語を返すrecognize_data"""
+    def recognize_data(binary, lang='jpn', config='', timeout=None):
+        return {'level': [5], 'block_num': [1], 'par_num': [1], 'line_num': [1],
+                'text': [binary], 'conf': [confidences.get(binary, 0)]}
+    return recognize_data
+
+
+@requires_ocr_improved
+class CascadeSearchTest(unittest.TestCase):
+    """cascade_search"""
+
+    def _search(self, confidences):
+        with mock.patch('ocr_improved.get_pipeline', fake_get_pipeline), \
+                mock.patch('ocr_improved.recognize_data', fake_recognizer(confidences)), \
+                mock.patch('ocr_improved.record_search_result'):
+            return ocr_improved.cascade_search('image', threshold=75, max_workers=2)
+
+    def test_light_stage_reports_preprocess_name(self):
+        result = self._search({'otsu': 90})
+        self.assertEqual(result['stage'], 'light')
+        self.assertEqual((result['preprocess'], result['config']), ('otsu', 3))
+        self.assertEqual(len(result['candidates']), 1)
+
+    def test_heavy_stage_reports_preprocess_name(self):
+        result = self._search({'otsu': 40, 'adaptive': 40, 'adaptive_gaussian': 50, 'adaptive_mean': 80})
+        self.assertEqual(result['stage'], 'heavy')
+        self.assertEqual(result['preprocess'], 'adaptive_mean')
+        self.assertTrue(all(isinstance(c['preprocess'], str) for c in result['candidates']))
+
+
+
+@requires_ocr_improved
+class RecordSearchResultTest(unittest.TestCase):
+    """探索が最後まで終わるたびに設定選択モデルへ記録する"""
+
+    CONFIDENCES = {'otsu': 40, 'adaptive': 40, 'adaptive_gaussian': 50, 'adaptive_mean': 80}
+
+    def setUp(self):
+        self.record = mock.MagicMock()
+        for target, value in (('ocr_improved.get_pipeline', fake_get_pipeline),
+                              ('ocr_improved.recognize_data', fake_recognizer(self.CONFIDENCES)),
+                              ('ocr_improved.record_search_result', self.record)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _recorded_classes(self):
+        return [call[0][2] for call in self.record.call_args_list]
+
+    def test_search_best_config_records_completed_search(self):
+        result = ocr_improved.search_best_config('image', max_workers=2)
+        self.assertEqual(self._recorded_classes(), ['improved'])
+        self.assertIs(self.record.call_args[0][1], result)
+
+    def test_search_best_config_skips_partial_search(self):
+        result = ocr_improved.search_best_config('image', max_workers=2, deadline=0.0)
+        self.assertTrue(result['partial'])
+        self.record.assert_not_called()
+
+    def test_cascade_records_light_stage(self):
+        with mock.patch('ocr_improved.recognize_data', fake_recognizer({'otsu': 90})):
+            ocr_improved.cascade_search('image', threshold=75)
+        self.assertEqual(self._recorded_classes(), ['light'])
+
+    def test_cascade_records_both_stages(self):
+        ocr_improved.cascade_search('image', threshold=75, max_workers=2)
+        self.assertEqual(self._recorded_classes(), ['light', 'improved'])
+        light_candidates = self.record.call_args_list[0][0][1]['candidates']
+        self.assertEqual(len(light_candidates), len(ocr_improved.CASCADE_LIGHT_STEPS))
+
+    def test_adaptive_search_records_once(self):
+        selector = mock.MagicMock()
+        selector.predict.return_value = None
+        with mock.patch('ocr_improved.image_features', return_value={}):
+            ocr_improved.adaptive_search('image', max_workers=2, selector=selector)
+        self.assertEqual(self._recorded_classes(), ['improved'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+ocr_worker_helperの単体テスト
+実行: python -m unittest test_ocr_worker_helper  または  python -m pytest test_ocr_worker_helper.py
+"""
+import threading
+import time
+import unittest
+
+from ocr_worker_helper import BackgroundWorker
+
+
+def _collect(worker, count, timeout=2.0):
+    """結果をcount件取り出す（時間内に揃わなければそこまで）"""
+    results = []
+    end = time.perf_counter() + timeout
+    while len(results) < count and time.perf_counter() < end:
+        item = worker.poll()
+        if item is None:
+            time.sleep(0.005)
+        else:
+            results.append(item)
+    return results
+
+
+class BackgroundWorkerTest(unittest.TestCase):
+    """BackgroundWorker"""
+
+    def setUp(self):
+        self.worker = BackgroundWorker()
+        self.addCleanup(self.worker.stop)
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def _block(self):
+        """releaseされるまでワーカーを占有するタスクを投入する"""
+        def blocker():
+            self.started.set()
+            self.release.wait(2.0)
+            return 'blocker'
+        self.worker.submit('busy', blocker)
+        self.assertTrue(self.started.wait(2.0))
+
+    def test_latest_submission_of_same_kind_wins(self):
+        self._block()
+        for frame in (1, 2, 3):
+            self.worker.submit('ocr', lambda frame=frame: frame)
+        self.assertTrue(self.worker.is_busy('ocr'))
+        self.release.set()
+
+        results = _collect(self.worker, 2)
+        self.assertEqual([(r['kind'], r['result']) for r in results], [('busy', 'blocker'), ('ocr', 3)])
+        self.assertEqual(_collect(self.worker, 1, timeout=0.1), [])
+
+    def test_different_kinds_all_run_in_submission_order(self):
+        self._block()
+        self.worker.submit('ocr', lambda: 'text')
+        self.worker.submit('price', lambda: 'price')
+        self.release.set()
+        results = _collect(self.worker, 3)
+        self.assertEqual([r['kind'] for r in results], ['busy', 'ocr', 'price'])
+
+    def test_resubmitted_kind_moves_to_the_back(self):
+        self._block()
+        self.worker.submit('ocr', lambda: 'old')
+        self.worker.submit('price', lambda: 'price')
+        self.worker.submit('ocr', lambda: 'new')
+        self.release.set()
+        results = _collect(self.worker, 3)
+        self.assertEqual([r['result'] for r in results], ['blocker', 'price', 'new'])
+
+    def test_error_is_reported_and_worker_keeps_running(self):
+        def fail():
+            raise ValueError("失敗")
+        self.worker.submit('ocr', fail)
+        result = _collect(self.worker, 1)[0]
+        self.assertIsInstance(result['error'], ValueError)
+        self.assertIsNone(result['result'])
+
+        self.worker.submit('ocr', lambda: 'ok')
+        self.assertEqual(_collect(self.worker, 1)[0]['result'], 'ok')
+
+    def test_is_busy_and_post_result(self):
+        self.assertFalse(self.worker.is_busy())
+        self._block()
+        self.assertTrue(self.worker.is_busy())
+        self.assertTrue(self.worker.is_busy('busy'))
+        self.assertFalse(self.worker.is_busy('ocr'))
+        self.worker.post_result('ocr', 'cached')
+        self.assertEqual(self.worker.poll()['result'], 'cached')
+        self.release.set()
+        _collect(self.worker, 1)
+        self.assertFalse(self.worker.is_busy())
+
+    def test_stop_drops_pending_tasks(self):
+        self._block()
+        self.worker.submit('ocr', lambda: 'never')
+        self.worker.stop(timeout=0)
+        self.release.set()
+        self.worker.thread.join(2.0)
+        self.assertFalse(self.worker.thread.is_alive())
+        self.assertEqual([r['kind'] for r in _collect(self.worker, 2, timeout=0.1)], ['busy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+preprocess_helperの文字の高さによるリサイズの単体テスト
+実行: python -m unittest test_preprocess_helper  または  python -m pytest test_preprocess_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import types
+import unittest
+from unittest import mock
+
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+def _image(width, height):
+    """text_height_scaleは大きさしか見ないため、画素の無い代わりのオブジェクトで十分"""
+    return types.SimpleNamespace(shape=(height, width))
+
+
+@requires_cv2
+class TextHeightScaleTest(unittest.TestCase):
+    """text_height_scale（文字の高さの推定はmeasure_text_heightの置き換えで固定する）"""
+
+    def _scale(self, width, height, text_height, **kwargs):
+        from preprocess_helper import text_height_scale
+        with mock.patch('preprocess_helper.measure_text_height', return_value=text_height):
+            return text_height_scale(_image(width, height), target_height=32, **kwargs)
+
+    def test_large_text_is_shrunk_to_target(self):
+        self.assertEqual(self._scale(1000, 800, 64.0), (0.5, 64.0))
+
+    def test_small_text_is_enlarged_up_to_max_scale(self):
+        self.assertEqual(self._scale(400, 300, 16.0), (2.0, 16.0))
+        self.assertEqual(self._scale(400, 300, 8.0), (3.0, 8.0))
+
+    def test_scale_is_clamped_to_min_scale(self):
+        self.assertEqual(self._scale(1000, 800, 1000.0), (0.2, 1000.0))
+
+    def test_long_side_limit_wins_over_text_height(self):
+        scale, _ = self._scale(1000, 1000, 8.0, max_side=2000)
+        self.assertEqual(scale, 2.0)
+
+    def test_fallback_width_without_text(self):
+        self.assertEqual(self._scale(2560, 1920, None), (0.5, None))
+        self.assertEqual(self._scale(640, 480, None), (1.0, None))
+
+
+@requires_cv2
+class NormalizeTextHeightTest(unittest.TestCase):
+    """measure_text_height / normalize_text_height（合成した文字らしい矩形で確認）"""
+
+    def _blocks(self, block_height=20):
+        image = np.full((200, 400), 255, dtype=np.uint8)
+        for x in range(20, 380, 20):
+            cv2.rectangle(image, (x, 90), (x + 9, 90 + block_height - 1), 0, -1)
+        return image
+
+    def test_measure_text_height(self):
+        from preprocess_helper import measure_text_height
+        self.assertEqual(measure_text_height(self._blocks()), 20.0)
+        self.assertIsNone(measure_text_height(np.full((200, 400), 255, dtype=np.uint8)))
+
+    def test_normalize_resizes_to_target_height(self):
+        from preprocess_helper import normalize_text_height
+        resized, scale, text_height = normalize_text_height(self._blocks(), target_height=32)
+        self.assertEqual((scale, text_height), (1.6, 20.0))
+        self.assertEqual(resized.shape, (320, 640))
+
+
+if __name__ == '__main__':
+    unittest.main()
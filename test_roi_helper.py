@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+roi_helperの単体テスト（保存ファイルは使わない）
+実行: python -m unittest test_roi_helper  または  python -m pytest test_roi_helper.py
+cv2 / numpy が無い環境ではスキップする
+"""
+import copy
+import unittest
+
+try:
+    import cv2  # noqa: F401  roi_helperの読み込みに必要
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+requires_cv2 = unittest.skipUnless(CV2_AVAILABLE, "cv2 / numpy が必要です")
+
+
+@requires_cv2
+class RegionOfInterestTest(unittest.TestCase):
+    """RegionOfInterest.pixel_box / crop / preview_rect_in_frame"""
+
+    def _roi(self, box=None):
+        from roi_helper import RegionOfInterest
+        roi = RegionOfInterest(roi_file=None)
+        if box:
+            self.assertTrue(roi.set_box(*box))
+        return roi
+
+    def test_whole_frame_without_box(self):
+        self.assertEqual(self._roi().pixel_box(640, 480), (0, 0, 640, 480))
+
+    def test_fraction_to_pixels(self):
+        roi = self._roi((0.75, 1.0, 0.25, 0.5))
+        self.assertEqual(roi.box, (0.25, 0.5, 0.75, 1.0))
+        self.assertEqual(roi.pixel_box(640, 480), (160, 240, 320, 240))
+
+    def test_tiny_box_is_ignored(self):
+        roi = self._roi()
+        self.assertFalse(roi.set_box(0.5, 0.5, 0.51, 0.9))
+        self.assertFalse(roi.active)
+
+    def test_same_aspect_needs_no_frame_rect(self):
+        from roi_helper import preview_rect_in_frame
+        self.assertIsNone(preview_rect_in_frame((640, 480), (1280, 960)))
+
+    def test_wider_still_is_clipped_to_frame(self):
+        from roi_helper import preview_rect_in_frame
+        rect = preview_rect_in_frame((640, 480), (1280, 720))
+        self.assertEqual(rect, (0.0, -120.0, 1280.0, 960.0))
+        roi = self._roi((0.25, 0.5, 0.75, 1.0))
+        self.assertEqual(roi.pixel_box(1280, 720, rect), (320, 360, 640, 360))
+
+    def test_taller_still_is_centered_horizontally(self):
+        from roi_helper import preview_rect_in_frame
+        x, y, w, h = preview_rect_in_frame((640, 480), (480, 640))
+        self.assertAlmostEqual(x, (480 - 640 * 4 / 3.0) / 2)
+
+    def test_crop_changes_size_with_box(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        roi = self._roi()
+        self.assertIs(roi.crop(frame), frame)
+        self.assertTrue(roi.set_box(0.25, 0.5, 0.75, 1.0))
+        self.assertEqual(roi.crop(frame).shape, (240, 320, 3))
+
+    def test_copy_keeps_box_at_request_time(self):
+        roi = self._roi((0.25, 0.5, 0.75, 1.0))
+        snapshot = copy.copy(roi)
+        roi.clear()
+        self.assertEqual(snapshot.pixel_box(640, 480), (160, 240, 320, 240))
+
+
+if __name__ == '__main__':
+    unittest.main()
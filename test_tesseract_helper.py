@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+tesseract_helperの単体テスト（Tesseract本体は使わない）
+実行: python -m unittest test_tesseract_helper  または  python -m pytest test_tesseract_helper.py
+numpy が無い環境ではスキップする
+"""
+import threading
+import unittest
+from unittest import mock
+
+try:
+    import numpy  # noqa: F401  tesseract_helperの読み込みに必要
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+requires_numpy = unittest.skipUnless(NUMPY_AVAILABLE, "numpy が必要です")
+
+
+class FakeEngine:
+    """TesseractEngineの代わり（生成数を数える）"""
+    created = 0
+
+    def __init__(self, lang='jpn'):
+        FakeEngine.created += 1
+        self.lang = lang
+        self.closed = False
+
+    def image_to_data(self, image_np, config='', timeout=None):
+        return {'text': [image_np], 'timeout': timeout}
+
+    def close(self):
+        self.closed = True
+
+
+@requires_numpy
+class ParseTesseractConfigTest(unittest.TestCase):
+    """parse_tesseract_config"""
+
+    def test_psm_and_variables(self):
+        from tesseract_helper import parse_tesseract_config
+        psm, variables = parse_tesseract_config('--psm 6 -c tessedit_char_whitelist=0123 -c preserve=1')
+        self.assertEqual(psm, 6)
+        self.assertEqual(variables, {'tessedit_char_whitelist': '0123', 'preserve': '1'})
+
+    def test_empty_config(self):
+        from tesseract_helper import parse_tesseract_config
+        self.assertEqual(parse_tesseract_config(''), (None, {}))
+        self.assertEqual(parse_tesseract_config(None), (None, {}))
+
+    def test_unknown_tokens_are_ignored(self):
+        from tesseract_helper import parse_tesseract_config
+        self.assertEqual(parse_tesseract_config('--oem 1 --psm 7'), (7, {}))
+
+    def test_quoted_value(self):
+        from tesseract_helper import parse_tesseract_config
+        _, variables = parse_tesseract_config('-c "tessedit_char_whitelist=0 1"')
+        self.assertEqual(variables, {'tessedit_char_whitelist': '0 1'})
+
+
+@requires_numpy
+class TesseractEnginePoolTest(unittest.TestCase):
+    """TesseractEnginePool（エンジンはFakeEngineに置き換える）"""
+
+    def setUp(self):
+        FakeEngine.created = 0
+        patcher = mock.patch('tesseract_helper.TesseractEngine', FakeEngine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_engine_is_reused(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=2)
+        with pool.engine() as first:
+            pass
+        with pool.engine() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(FakeEngine.created, 1)
+
+    def test_concurrent_use_creates_up_to_max_engines(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=2)
+        with pool.engine() as first, pool.engine() as second:
+            self.assertIsNot(first, second)
+            with self.assertRaises(RuntimeError):
+                with pool.engine(timeout=0.05):
+                    pass
+        self.assertEqual(FakeEngine.created, 2)
+
+    def test_waiting_caller_gets_released_engine(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=1)
+        acquired = []
+
+        with pool.engine() as held:
+            thread = threading.Thread(target=lambda: acquired.append(pool._acquire(timeout=2.0)))
+            thread.start()
+        thread.join(timeout=2.0)
+        self.assertEqual(acquired, [held])
+        self.assertEqual(FakeEngine.created, 1)
+
+    def test_failed_creation_does_not_use_up_a_slot(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=1)
+        with mock.patch('tesseract_helper.TesseractEngine', side_effect=RuntimeError("初期化失敗")):
+            with self.assertRaises(RuntimeError):
+                pool._acquire()
+        with pool.engine() as engine:
+            self.assertIsInstance(engine, FakeEngine)
+
+    def test_image_to_data_passes_remaining_timeout(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=1)
+        data = pool.image_to_data('image', timeout=1.0)
+        self.assertEqual(data['text'], ['image'])
+        self.assertTrue(0 < data['timeout'] <= 1.0)
+        self.assertIsNone(pool.image_to_data('image')['timeout'])
+
+    def test_close_releases_idle_engines(self):
+        from tesseract_helper import TesseractEnginePool
+        pool = TesseractEnginePool(max_engines=2)
+        with pool.engine() as engine:
+            pass
+        pool.close()
+        self.assertTrue(engine.closed)
+        self.assertEqual(pool._created, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
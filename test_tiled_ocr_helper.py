@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+tiled_ocr_helperの行の結合の単体テスト（Tesseractは使わない）
+実行: python -m unittest test_tiled_ocr_helper  または  python -m pytest test_tiled_ocr_helper.py
+numpy / PIL が無い環境ではスキップする
+"""
+import unittest
+
+try:
+    import numpy  # noqa: F401  tiled_ocr_helperの読み込みに必要
+    from PIL import Image
+    TILED_AVAILABLE = True
+except ImportError:
+    TILED_AVAILABLE = False
+
+requires_tiled = unittest.skipUnless(TILED_AVAILABLE, "numpy / PIL が必要です")
+
+
+def _line(text, box, tile, conf=90.0, edge=False, paragraph=(1, 1)):
+    """ocr_tileと同じ形式の行"""
+    return {'text': text, 'conf': conf, 'box': box, 'tile': tile, 'edge': edge, 'paragraph': paragraph}
+
+
+def _texts(lines):
+    return [line['text'] for line in lines]
+
+
+@requires_tiled
+class MergeTileLinesTest(unittest.TestCase):
+    """merge_tile_lines"""
+
+    LEFT_TILE = (0, 0, 100, 100)
+    RIGHT_TILE = (64, 0, 164, 100)
+
+    def test_duplicate_in_overlap_keeps_higher_confidence(self):
+        from tiled_ocr_helper import merge_tile_lines
+        merged = merge_tile_lines([
+            [_line('A', (70, 10, 95, 20), self.LEFT_TILE, conf=80.0)],
+            [_line('B', (70, 10, 95, 20), self.RIGHT_TILE, conf=90.0)],
+        ])
+        self.assertEqual(_texts(merged), ['B'])
+
+    def test_duplicate_prefers_line_not_cut_by_tile_edge(self):
+        from tiled_ocr_helper import merge_tile_lines
+        merged = merge_tile_lines([
+            [_line('whole', (70, 10, 95, 20), self.LEFT_TILE, conf=50.0)],
+            [_line('cut', (70, 10, 95, 20), self.RIGHT_TILE, conf=95.0, edge=True)],
+        ])
+        self.assertEqual(_texts(merged), ['whole'])
+
+    def test_two_columns_in_one_tile_keep_tesseract_order(self):
+        from tiled_ocr_helper import merge_tile_lines
+        tile = (0, 0, 400, 300)
+        merged = merge_tile_lines([[
+            _line('左1', (10, 10, 150, 30), tile, paragraph=(1, 1)),
+            _line('左2', (10, 40, 150, 60), tile, paragraph=(1, 1)),
+            _line('右1', (250, 12, 390, 32), tile, paragraph=(2, 1)),
+            _line('右2', (250, 42, 390, 62), tile, paragraph=(2, 1)),
+        ]])
+        self.assertEqual(_texts(merged), ['左1', '左2', '右1', '右2'])
+
+    def test_two_columns_in_side_by_side_tiles_are_not_interleaved(self):
+        from tiled_ocr_helper import merge_tile_lines
+        left_tile, right_tile = (0, 0, 220, 300), (180, 0, 400, 300)
+        merged = merge_tile_lines([
+            [_line('左1', (10, 10, 150, 30), left_tile),
+             _line('左2', (10, 40, 150, 60), left_tile)],
+            [_line('右1', (250, 10, 390, 30), right_tile),
+             _line('右2', (250, 40, 390, 60), right_tile)],
+        ])
+        self.assertEqual(_texts(merged), ['左1', '左2', '右1', '右2'])
+
+    def test_fragments_split_across_tiles_are_joined(self):
+        from tiled_ocr_helper import merge_tile_lines
+        merged = merge_tile_lines([
+            [_line('Hello', (10, 10, 60, 30), self.LEFT_TILE, conf=80.0),
+             _line('next', (10, 40, 60, 60), self.LEFT_TILE)],
+            [_line('World', (70, 10, 120, 30), self.RIGHT_TILE, conf=90.0)],
+        ])
+        self.assertEqual(_texts(merged), ['Hello World', 'next'])
+        self.assertEqual(merged[0]['box'], (10, 10, 120, 30))
+        self.assertAlmostEqual(merged[0]['conf'], 85.0)
+        self.assertNotIn('last_tile', merged[0])
+
+    def test_lines_in_same_tile_are_not_joined(self):
+        from tiled_ocr_helper import merge_tile_lines
+        merged = merge_tile_lines([[
+            _line('Price', (10, 10, 60, 30), self.LEFT_TILE),
+            _line('100', (70, 10, 95, 30), self.LEFT_TILE),
+        ]])
+        self.assertEqual(_texts(merged), ['Price', '100'])
+
+
+@requires_tiled
+class AllowLargeImagesTest(unittest.TestCase):
+    """巨大画像の上限はタイル分割の読み込み中だけ引き上げる"""
+
+    def test_limit_is_restored(self):
+        from tiled_ocr_helper import TILED_MAX_PIXELS, _allow_large_images
+        original = Image.MAX_IMAGE_PIXELS
+        with _allow_large_images():
+            self.assertGreaterEqual(Image.MAX_IMAGE_PIXELS, TILED_MAX_PIXELS)
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, original)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+文字領域検出ヘルパー
+モルフォロジー勾配と輪郭抽出で文字行の矩形を求め、その部分だけをOCRにかける
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from tesseract_helper import recognize_text
+
+
+def _to_gray(image_np):
+    """グレースケールに変換"""
+    if image_np.ndim == 3:
+        return cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY)
+    return image_np
+
+
+def detect_text_regions(image_np, min_height=8, min_width=12, padding=4, max_regions=50):
+    """
+    文字行らしい領域の矩形を検出する
+
+    Args:
+        image_np (numpy.ndarray): BGRまたはグレースケール画像
+        min_height (int): 採用する最小の高さ（ピクセル）
+        min_width (int): 採用する最小の幅（ピクセル）
+        padding (int): 矩形の周囲に加える余白
+        max_regions (int): 返す矩形の最大数（面積の大きい順）
+
+    Returns:
+        list: (x, y, w, h) のリスト（上から下、左から右の順）
+    """
+    gray = _to_gray(image_np)
+    height, width = gray.shape[:2]
+
+    # モルフォロジー勾配で文字のエッジを強調
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # 横方向に繋げて文字行のかたまりにする
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 80), 1))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, line_kernel)
+
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < min_height or w < min_width:
+            continue
+        if h > height * 0.5 and w > width * 0.5:
+            # 画面全体を覆うような塊は背景とみなす
+            continue
+        # 輪郭内にエッジが十分あるものだけを文字行とみなす
+        fill_ratio = cv2.countNonZero(binary[y:y + h, x:x + w]) / float(w * h)
+        if fill_ratio < 0.1:
+            continue
+        x0 = max(0, x - padding)
+        y0 = max(0, y - padding)
+        x1 = min(width, x + w + padding)
+        y1 = min(height, y + h + padding)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)[:max_regions]
+    return sort_boxes_reading_order(boxes)
+
+
+def sort_boxes_reading_order(boxes):
+    """矩形を読み順（上から下、同じ行は左から右）に並べる"""
+    if not boxes:
+        return []
+    median_h = float(np.median([b[3] for b in boxes]))
+    return sorted(boxes, key=lambda b: (int((b[1] + b[3] / 2) // max(1.0, median_h)), b[0]))
+
+
+def union_box(boxes):
+    """全ての矩形を含む最小の矩形"""
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def crop_regions(image_np, boxes):
+    """矩形ごとに画像を切り出す（コピーせずビューを返す）"""
+    return [image_np[y:y + h, x:x + w] for x, y, w, h in boxes]
+
+
+def iter_recognize_regions(image_np, boxes, preprocess=None, lang='jpn', config='--psm 7', max_workers=None,
+                           deadline=None):
+    """
+    切り出した文字行を並列にOCRし、読み順に1行ずつ返す
+    先頭の行は他の行の完了を待たずに返るので、結果を逐次表示できる
+
+    Args:
+        image_np (numpy.ndarray): 元画像
+        boxes (list): detect_text_regionsの結果
+        preprocess (callable): 切り出し画像に適用する前処理（二値化など）
+        lang (str): 言語
+        config (str): Tesseract設定（既定は1行モード）
+        max_workers (int): 並列数
+        deadline (float): time.perf_counter()基準の締め切り時刻
+                          締め切りを過ぎてから順番が来た行は認識せず空文字列とする（Noneで無制限）
+
+    Yields:
+        tuple: (矩形, 認識したテキスト)
+    """
+    crops = crop_regions(image_np, boxes)
+
+    def recognize(crop):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return ''
+        if preprocess is not None:
+            crop = preprocess(crop)
+        return recognize_text(crop, lang=lang, config=config).strip()
+
+    workers = max_workers or min(len(crops), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 読み順に投入するので、上の行ほど先に終わる
+        futures = [executor.submit(recognize, crop) for crop in crops]
+        try:
+            for box, future in zip(boxes, futures):
+                yield box, future.result()
+        finally:
+            # 途中で読み取りをやめた場合は未実行の行を取り消す
+            for future in futures:
+                future.cancel()
+
+
+def recognize_regions(image_np, boxes, preprocess=None, lang='jpn', config='--psm 7', max_workers=None,
+                      deadline=None):
+    """
+    切り出した文字行を並列にOCRし、読み順に連結する
+
+    Args:
+        image_np (numpy.ndarray): 元画像
+        boxes (list): detect_text_regionsの結果
+        preprocess (callable): 切り出し画像に適用する前処理（二値化など）
+        lang (str): 言語
+        config (str): Tesseract設定（既定は1行モード）
+        max_workers (int): 並列数
+        deadline (float): time.perf_counter()基準の締め切り時刻（iter_recognize_regionsと同じ）
+
+    Returns:
+        str: 行ごとに改行したテキスト
+    """
+    lines = [text for _, text in iter_recognize_regions(image_np, boxes, preprocess=preprocess, lang=lang,
+                                                        config=config, max_workers=max_workers,
+                                                        deadline=deadline)]
+    return '\n'.join(line for line in lines if line)
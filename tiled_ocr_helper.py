@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+タイル分割OCRヘルパー
+フラットベッドスキャンや高画素の写真を余白の位置で重なりのあるタイルに分割し、
+タイルごとに並列でOCRして行単位で結合する（重なり部分の重複行は取り除く）
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from preprocess_helper import preprocess_image
+from tesseract_helper import recognize_data
+
+# これ以上の画素数の画像はタイル分割する
+TILED_MIN_PIXELS = 12_000_000
+# タイルの一辺の目安（ピクセル）
+TILE_SIZE = 2000
+# 隣接タイルとの重なり幅（ピクセル）
+TILE_OVERLAP = 64
+
+# タイル分割で読み込む画像の画素数の上限
+# PILの巨大画像の上限（DecompressionBomb）はプロセス全体の設定のため、
+# この上限はタイル分割の読み込み中だけ一時的に適用する
+TILED_MAX_PIXELS = 300_000_000
+
+_pixel_limit_lock = threading.Lock()
+
+
+@contextmanager
+def _allow_large_images(max_pixels=TILED_MAX_PIXELS):
+    """PILの巨大画像の上限をmax_pixelsまで一時的に引き上げ、終了後に元へ戻す"""
+    with _pixel_limit_lock:
+        previous = Image.MAX_IMAGE_PIXELS
+        if previous is not None:
+            Image.MAX_IMAGE_PIXELS = max(previous, max_pixels)
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = previous
+
+
+def image_pixel_count(image_path):
+    """画像をデコードせずにヘッダーから画素数を取得する"""
+    with _allow_large_images():
+        with Image.open(image_path) as img:
+            width, height = img.size
+    return width * height
+
+
+def is_large_image(image_path, min_pixels=TILED_MIN_PIXELS):
+    """タイル分割の対象となる大きさの画像か"""
+    try:
+        return image_pixel_count(image_path) >= min_pixels
+    except Exception:
+        return False
+
+
+def load_grayscale(image_path):
+    """
+    画像をグレースケールで読み込む
+    JPEGはデコーダーで直接グレースケールにしてRGBの中間画像を作らない（1画素1バイト）
+    """
+    with _allow_large_images():
+        with Image.open(image_path) as img:
+            if img.format == 'JPEG':
+                img.draft('L', img.size)
+            return np.asarray(img.convert('L'))
+
+
+def find_gutter_cuts(ink_profile, length, tile_size, search):
+    """
+    タイルの区切り位置を余白（インクの少ない行・列）から選ぶ
+
+    Args:
+        ink_profile (numpy.ndarray): 行（列）ごとのインク量（縮小座標）
+        length (int): 元画像での長さ
+        tile_size (int): タイルの一辺の目安
+        search (int): 目安位置から前後に探索する幅
+
+    Returns:
+        list: 区切り位置（元画像の座標、両端を含む）
+    """
+    step = length / max(1, len(ink_profile))
+    cuts = [0]
+    target = tile_size
+    while length - cuts[-1] > tile_size * 1.25:
+        lo = max(cuts[-1] + tile_size // 2, target - search)
+        hi = min(length - tile_size // 4, target + search)
+        lo_i, hi_i = int(lo / step), max(int(lo / step) + 1, int(hi / step))
+        window = ink_profile[lo_i:hi_i]
+        if len(window) == 0:
+            cut = int(target)
+        else:
+            # インクが最小の位置のうち目安に最も近いものを選ぶ
+            candidates = np.flatnonzero(window == window.min()) + lo_i
+            best = candidates[np.argmin(np.abs(candidates * step - target))]
+            cut = int(best * step)
+        cuts.append(cut)
+        target = cut + tile_size
+    cuts.append(length)
+    return cuts
+
+
+def plan_tiles(gray, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, sample_step=4):
+    """
+    余白で区切ったタイルの一覧を作成する
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+        tile_size (int): タイルの一辺の目安
+        overlap (int): 隣接タイルとの重なり幅
+        sample_step (int): 余白解析で間引く間隔
+
+    Returns:
+        list: (x0, y0, x1, y1) のリスト（読み順）
+    """
+    height, width = gray.shape[:2]
+    # 間引いたビューで解析する（コピーは縮小サイズのみ）
+    sample = gray[::sample_step, ::sample_step]
+    threshold = min(200, int(sample.mean()) - 30)
+    ink = sample < threshold
+    search = tile_size // 4
+
+    row_cuts = find_gutter_cuts(ink.sum(axis=1), height, tile_size, search)
+    tiles = []
+    for top, bottom in zip(row_cuts[:-1], row_cuts[1:]):
+        band = ink[top // sample_step:max(top // sample_step + 1, bottom // sample_step)]
+        col_cuts = find_gutter_cuts(band.sum(axis=0), width, tile_size, search)
+        for left, right in zip(col_cuts[:-1], col_cuts[1:]):
+            tiles.append((max(0, left - overlap), max(0, top - overlap),
+                          min(width, right + overlap), min(height, bottom + overlap)))
+    return tiles
+
+
+def ocr_tile(gray, tile, image_class='document', lang='jpn', config=''):
+    """
+    1タイルをOCRし、元画像の座標に変換した行の一覧を返す
+
+    Returns:
+        list: text, conf, box (x0, y0, x1, y1), tile, edge を持つ辞書のリスト
+    """
+    x0, y0, x1, y1 = tile
+    processed = preprocess_image(gray[y0:y1, x0:x1], image_class)
+    data = recognize_data(processed, lang=lang, config=config)
+
+    lines = {}
+    for i, word in enumerate(data['text']):
+        if data['level'][i] != 5 or not word or not word.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        left, top = data['left'][i], data['top'][i]
+        right, bottom = left + data['width'][i], top + data['height'][i]
+        line = lines.setdefault(key, {'words': [], 'confs': [],
+                                      'box': [left, top, right, bottom]})
+        line['words'].append(word.strip())
+        line['confs'].append(float(data['conf'][i]))
+        box = line['box']
+        box[0], box[1] = min(box[0], left), min(box[1], top)
+        box[2], box[3] = max(box[2], right), max(box[3], bottom)
+
+    tile_h, tile_w = y1 - y0, x1 - x0
+    results = []
+    for key, line in lines.items():
+        left, top, right, bottom = line['box']
+        confs = [c for c in line['confs'] if c > 0]
+        results.append({
+            'text': ' '.join(line['words']),
+            'conf': sum(confs) / len(confs) if confs else 0.0,
+            'box': (left + x0, top + y0, right + x0, bottom + y0),
+            'tile': tile,
+            # タイルの端に接している行は切れている可能性がある
+            'edge': top <= 1 or left <= 1 or bottom >= tile_h - 1 or right >= tile_w - 1,
+            'paragraph': key[:2],
+        })
+    return results
+
+
+def _overlap_ratio(a, b):
+    """2つの矩形の重なり面積を小さい方の面積で割った値"""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (w * h) / float(max(1, smaller))
+
+
+def _line_height(line):
+    """行の高さ（ピクセル）"""
+    return max(1, line['box'][3] - line['box'][1])
+
+
+def _tiles_side_by_side(left_tile, right_tile):
+    """right_tileがleft_tileの右隣（重なり幅を含めて接している）のタイルか"""
+    return (left_tile[0] < right_tile[0] <= left_tile[2]
+            and min(left_tile[3], right_tile[3]) > max(left_tile[1], right_tile[1]))
+
+
+def _continues(left, right, max_gap=1.0, baseline_tolerance=0.3, row_tolerance=0.5):
+    """
+    rightがleftの右隣のタイルで切れた同じ行の続きか
+    下端（ベースライン）と縦の中心がそろい、間隔が行の高さ程度以内のものを続きとみなす
+    """
+    if not _tiles_side_by_side(left['last_tile'], right['tile']) or right['box'][0] <= left['box'][0]:
+        return False
+    height = max(_line_height(left), _line_height(right))
+    left_center = (left['box'][1] + left['box'][3]) / 2.0
+    right_center = (right['box'][1] + right['box'][3]) / 2.0
+    return (right['box'][0] - left['box'][2] <= max_gap * height
+            and abs(right['box'][3] - left['box'][3]) <= baseline_tolerance * height
+            and abs(right_center - left_center) <= row_tolerance * min(_line_height(left), _line_height(right)))
+
+
+def join_tile_fragments(lines):
+    """
+    タイルの境界で左右に分かれた1行の断片をつなげる（読み順は変えない）
+    右側の断片は左側の断片の位置に取り込まれ、元の位置からは取り除かれる
+
+    Args:
+        lines (list): 読み順に並んだ行（元画像の座標）
+
+    Returns:
+        list: つなげた後の行
+    """
+    by_tile = {}
+    for index, line in enumerate(lines):
+        by_tile.setdefault(line['tile'], []).append(index)
+
+    used = set()
+    joined = []
+    for index, line in enumerate(lines):
+        if index in used:
+            continue
+        current = dict(line, last_tile=line['tile'])
+        while True:
+            # 右隣のタイルの行だけを候補にする
+            candidates = [j for tile, indices in by_tile.items()
+                          if _tiles_side_by_side(current['last_tile'], tile)
+                          for j in indices if j not in used and j != index]
+            following = next((j for j in sorted(candidates) if _continues(current, lines[j])), None)
+            if following is None:
+                break
+            used.add(following)
+            fragment = lines[following]
+            length = len(current['text']) + len(fragment['text'])
+            current['conf'] = (current['conf'] * len(current['text'])
+                               + fragment['conf'] * len(fragment['text'])) / float(max(1, length))
+            current['text'] = current['text'] + ' ' + fragment['text']
+            current['box'] = (min(current['box'][0], fragment['box'][0]),
+                              min(current['box'][1], fragment['box'][1]),
+                              max(current['box'][2], fragment['box'][2]),
+                              max(current['box'][3], fragment['box'][3]))
+            current['last_tile'] = fragment['tile']
+        del current['last_tile']
+        joined.append(current)
+    return joined
+
+
+def merge_tile_lines(tile_results, min_overlap=0.5):
+    """
+    タイルごとの行を結合し、重なり部分で二重に読まれた行を取り除く
+    重複した場合はタイルの端で切れていない行、次に信頼度の高い行を残す
+    行はタイルの読み順、タイルの中ではTesseractのブロック・段落の順のまま並べる
+    （段組みの文書で別の段の行が混ざらないよう、ページ全体のy座標では並べ替えない）
+    隣り合うタイルに分かれた同じ行の断片は1行につなげる
+
+    Args:
+        tile_results (list): タイルごとのocr_tileの結果（plan_tilesの読み順）
+        min_overlap (float): 重複とみなす重なりの割合
+
+    Returns:
+        list: 採用した行（元画像での読み順）
+    """
+    order = [line for lines in tile_results for line in lines]
+
+    # 重複の判定だけは、残す行を決めるため端で切れていない順・信頼度の高い順に行う
+    accepted = []
+    for line in sorted(order, key=lambda l: (l['edge'], -l['conf'])):
+        duplicate = any(other['tile'] != line['tile'] and
+                        _overlap_ratio(other['box'], line['box']) >= min_overlap
+                        for other in accepted)
+        if not duplicate:
+            accepted.append(line)
+
+    accepted_ids = {id(line) for line in accepted}
+    return join_tile_fragments([line for line in order if id(line) in accepted_ids])
+
+
+def _starts_paragraph(previous, line):
+    """lineの前に空行（段落の区切り）を入れるか"""
+    if previous['tile'] == line['tile']:
+        return line['paragraph'] != previous['paragraph']
+    # タイルが変わる場合は、次の段へ移った（上に戻った）か行の高さ以上空いている箇所を区切りとする
+    return (line['box'][1] < previous['box'][1]
+            or line['box'][1] - previous['box'][3] > _line_height(line))
+
+
+def ocr_image_tiled(image_path, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_workers=None,
+                    lang='jpn', config='', image_class='document'):
+    """
+    大きな画像をタイルに分割して並列にOCRする
+
+    画像は1画素1バイトのグレースケールで一度だけデコードし、タイルはその部分ビューとして扱う
+    前処理とTesseractの作業領域はタイルの大きさに収まる
+
+    Args:
+        image_path (str): 画像ファイルのパス
+        tile_size (int): タイルの一辺の目安
+        overlap (int): 隣接タイルとの重なり幅
+        max_workers (int): 並列数（Noneの場合はCPU数）
+        lang (str): 言語
+        config (str): Tesseract設定
+        image_class (str): タイルに適用する前処理の画像種類
+
+    Returns:
+        dict: text, confidence, tiles, lines, timings
+    """
+    timings = {}
+    start = time.perf_counter()
+    gray = load_grayscale(image_path)
+    timings['decode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    tiles = plan_tiles(gray, tile_size=tile_size, overlap=overlap)
+    timings['plan_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    workers = max_workers or min(len(tiles), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tile_results = list(executor.map(
+            lambda tile: ocr_tile(gray, tile, image_class=image_class, lang=lang, config=config),
+            tiles))
+    timings['ocr_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    lines = merge_tile_lines(tile_results)
+
+    # 段落の区切りには空行を入れる
+    output = []
+    previous = None
+    for line in lines:
+        if previous is not None and _starts_paragraph(previous, line):
+            output.append('')
+        output.append(line['text'])
+        previous = line
+
+    confs = [line['conf'] for line in lines if line['conf'] > 0]
+    return {
+        'text': '\n'.join(output),
+        'confidence': round(sum(confs) / len(confs), 1) if confs else 0.0,
+        'tiles': len(tiles),
+        'lines': len(lines),
+        'timings': timings,
+    }